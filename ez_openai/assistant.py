@@ -0,0 +1,1568 @@
+import asyncio
+import hashlib
+import inspect
+import json
+import os
+import time
+from contextlib import nullcontext
+from typing import TYPE_CHECKING
+from typing import Any
+from typing import AsyncGenerator
+from typing import AsyncIterator
+from typing import Callable
+from typing import Generator
+from typing import Iterable
+from typing import Iterator
+
+import openai
+from openai import NOT_GIVEN
+
+if TYPE_CHECKING:
+    from openai.lib.streaming import AssistantEventHandler
+    from openai.lib.streaming import AssistantStreamManager
+    from openai.types.beta.threads import Message as openaiMessage
+    from openai.types.beta.threads import MessageDelta as openaiMessageDelta
+
+try:
+    # Reads from a stream that time out raise httpx's errors, not OpenAI's.
+    import httpx
+except ImportError:  # pragma: no cover
+    httpx = None  # type: ignore
+
+from .batch import BatchResult
+from .batch import ask_many
+from .batch import async_ask_many
+from .cache import _MISSING
+from .cache import TTLCache
+from .client import DEFAULT_CLIENT_REGISTRY
+from .client import ClientRegistry
+from .client import _ClientProxy
+from .history import HISTORY_CACHE
+from .history import PAGE_SIZE
+from .history import thread_history
+from .polling import ACTIVE_STATUSES
+from .polling import DEFAULT_POLL_STRATEGY
+from .polling import PollStrategy
+from .polling import RunError
+from .polling import RunStats
+from .polling import RunTimeoutError
+from .polling import StatsHook
+from .pool import WarmThreadPool
+from .ratelimit import RateLimiter
+from .runqueue import DEFAULT_RUN_QUEUE
+from .runqueue import RunQueue
+from .streaming import EZDelta
+from .streaming import StreamMode
+from .streaming import _delta_text
+from .streaming import _StreamState
+from .tools import ToolCall
+from .tools import ToolExecutor
+from .tools import _error_output
+from .tools import _output
+from .tools import _run_sync
+from .tracing import Instrumentation
+from .uploads import UploadCache
+
+DEFAULT_MODEL = "gpt-4o"
+
+
+class EZGenerator:
+    def __init__(self, gen, state: _StreamState | None = None):
+        self.gen = gen
+        self.value = None
+        self._state = state or _StreamState()
+
+    def __iter__(self):
+        self.value = yield from self.gen
+        return self.value
+
+    @property
+    def text_so_far(self) -> str:
+        """All the text that has been streamed so far."""
+        return self._state.buffer.text
+
+    @property
+    def run_id(self) -> str | None:
+        """The ID of the run producing the stream, once it has started."""
+        return self._state.run_id
+
+    @property
+    def stats(self) -> RunStats:
+        """Timing and usage statistics for the stream so far."""
+        return self._state.stats
+
+
+class EZMessage:
+    id: str
+    raw: "openaiMessage | openaiMessageDelta"
+    text: str
+    stats: RunStats | None
+
+    def __init__(
+        self,
+        id: str,
+        raw: "openaiMessage | openaiMessageDelta",
+        stats: RunStats | None = None,
+    ):
+        self.id = id
+        self.raw = raw
+        self.text = _gather_text(raw)
+        self.stats = stats
+
+    def __str__(self):
+        return self.text
+
+
+def _gather_text(raw: "openaiMessage | openaiMessageDelta"):
+    """Gather the text from a message."""
+    if raw.content is None or isinstance(raw.content, str):
+        # Chat completion messages can have plain text content.
+        return raw.content or ""
+
+    for content in raw.content:
+        if isinstance(content, dict):
+            if content["type"] == "text":
+                return content["text"]
+        elif content.type == "text":
+            return content.text.value  # type: ignore[union-attr]
+
+    return ""
+
+
+class _ThreadRef:
+    """Stands in for a thread we only know the ID of, e.g. from a run that created it."""
+
+    def __init__(self, id: str) -> None:
+        self.id = id
+
+
+def _user_message(content) -> dict[str, Any]:
+    return {"role": "user", "content": content}
+
+
+class _BaseConversation:
+    """The parts of a conversation that are the same for the sync and async APIs."""
+
+    def __init__(
+        self,
+        assistant: "_BaseAssistant",
+        functions: dict[str, Callable],
+        poll_strategy: PollStrategy | None = None,
+        tool_executor: ToolExecutor | None = None,
+    ) -> None:
+        self._assistant = assistant
+        self._functions = functions
+        self.poll_strategy = poll_strategy or assistant.poll_strategy
+        self.tool_executor = tool_executor or assistant.tool_executor
+        self.__thread = None
+        self._lazy = False
+
+    @property
+    def _client(self):
+        return self._assistant._client
+
+    def _client_for(self, deadline: float | None):
+        """The client to make requests that have to be done by the deadline with."""
+        if deadline is None:
+            return self._client
+        return self._assistant._timed_client
+
+    def _record_usage(self, usage) -> None:
+        """
+        Take a stream's usage out of the token budget.
+
+        The limiter does this itself for other requests, but a stream's usage only
+        arrives with its last event.
+        """
+        limiter = self._assistant.rate_limiter
+        if limiter is not None and usage is not None:
+            limiter.record_usage(usage.total_tokens)
+
+    @property
+    def _pending(self) -> bool:
+        """Whether the thread will only be created along with the first run."""
+        return self._lazy and self.__thread is None
+
+    @property
+    def _thread(self):
+        if self._pending:
+            raise ValueError(
+                "This conversation was created lazily, so it doesn't exist until you "
+                "ask it something."
+            )
+        if self.__thread is None:
+            raise ValueError(
+                "Cannot work with an uninitialized conversation. Either specify a "
+                "conversation ID or call .create()."
+            )
+        return self.__thread
+
+    @_thread.setter
+    def _thread(self, thread):
+        self.__thread = thread
+
+    @property
+    def id(self) -> str:
+        return self._thread.id
+
+    def _tool_calls(self, tool_calls) -> tuple[list[ToolCall], list[dict[str, str]]]:
+        """
+        Gather the functions the AI wants to call, along with their arguments.
+
+        Calls that can't be made, because the function doesn't exist or the arguments
+        are invalid, aren't returned as calls but as error outputs, so the AI can see
+        what it got wrong. Calls whose result is cached are returned as outputs too.
+        """
+        calls: list[ToolCall] = []
+        outputs = []
+        for fn_call in tool_calls:
+            function = self._functions.get(fn_call.function.name)
+            if function is None:
+                outputs.append(
+                    _error_output(
+                        fn_call.id, f"There is no function {fn_call.function.name}."
+                    )
+                )
+                continue
+
+            arguments, error = function._openai_decoder.decode(  # type: ignore[attr-defined]
+                fn_call.function.arguments
+            )
+            if error is not None:
+                outputs.append(_error_output(fn_call.id, error))
+                continue
+
+            cache = function._openai_cache  # type: ignore[attr-defined]
+            if cache is not None:
+                key = function._openai_cache_key((), arguments)  # type: ignore[attr-defined]
+                value = cache.lookup(key)
+                if value is not _MISSING:
+                    outputs.append(_output(fn_call.id, value))
+                    continue
+
+            calls.append((fn_call.id, function, arguments))
+        return calls, outputs
+
+
+def _in_order(tool_calls, tool_outputs: list[dict[str, str]]) -> list[dict[str, str]]:
+    """Put the outputs in the same order as the calls they're for."""
+    index = {fn_call.id: i for i, fn_call in enumerate(tool_calls)}
+    return sorted(tool_outputs, key=lambda output: index[output["tool_call_id"]])
+
+
+def _remaining(deadline: float | None):
+    """Return the time left until the deadline, to use as a request's timeout."""
+    if deadline is None:
+        return NOT_GIVEN
+    return max(deadline - time.monotonic(), 0.001)
+
+
+# What a request (or a read from a stream) that took too long raises.
+_TIMEOUT_ERRORS: tuple[type[Exception], ...] = (openai.APITimeoutError,)
+if httpx is not None:
+    _TIMEOUT_ERRORS += (httpx.TimeoutException,)
+
+
+def _gather_content(message, image_url, file_id) -> list[dict[str, Any]]:
+    """Gather the content for a message to send to the OpenAI assistant."""
+    content: list[dict[str, Any]] = []
+    if message is not None:
+        content.append({"type": "text", "text": message})
+    if image_url is not None:
+        content.append({"type": "image_url", "image_url": {"url": image_url}})
+    if file_id is not None:
+        content.append({"type": "image_file", "image_file": {"file_id": file_id}})
+    return content
+
+
+class Conversation(_BaseConversation):
+    """
+    A conversation, with multiple messages.
+
+    This is roughly what OpenAI calls a thread.
+    """
+
+    def get(self, id) -> "Conversation":
+        self._thread = self._assistant._client.beta.threads.retrieve(id)
+        return self
+
+    def create(self, lazy: bool = False) -> "Conversation":
+        """
+        Create a new conversation.
+
+        If the assistant has a `WarmThreadPool`, the thread comes from that, without
+        waiting for a request. If `lazy` is true, the thread isn't created until the
+        first `ask()`, which then creates it along with the message and the run in a
+        single request. Until then, the conversation has no ID.
+        """
+        if lazy:
+            self._lazy = True
+            return self
+
+        pool = self._assistant.thread_pool
+        thread = pool.acquire(self._client) if pool is not None else None
+        self._thread = thread or self._client.beta.threads.create()
+        return self
+
+    def delete(self) -> None:
+        self._assistant._client.beta.threads.delete(self.id)
+        HISTORY_CACHE.pop(self.id)
+
+    def history(self) -> Iterator[EZMessage]:
+        """
+        Iterate over the messages in the conversation, oldest first.
+
+        Messages are fetched lazily, a page at a time, and cached, so that later calls
+        only need to fetch the messages that were added since.
+        """
+        cached = thread_history(self.id)
+        previous_id = None
+        for message in cached.snapshot():
+            yield EZMessage(message.id, message)
+            previous_id = message.id
+
+        while True:
+            page = self._client.beta.threads.messages.list(
+                self.id,
+                order="asc",
+                after=previous_id or NOT_GIVEN,
+                limit=PAGE_SIZE,
+            )
+            for message in page.data:
+                cached.add(message, previous_id)
+                yield EZMessage(message.id, message)
+                previous_id = message.id
+            if not page.has_more or not page.data:
+                return
+
+    def _gather_content(self, message, image_url, image_file):
+        """Gather the content for a message, uploading the image file if needed."""
+        file_id = None
+        if image_file is not None:
+            upload_cache = self._assistant.upload_cache
+            if upload_cache is not None:
+                file_id = upload_cache.file_id(self._client, image_file)
+            else:
+                with open(image_file, "rb") as f:
+                    file = self._client.files.create(file=f, purpose="assistants")
+                file_id = file.id
+        return _gather_content(message, image_url, file_id)
+
+    def _call_tools(self, tool_calls):
+        """Go through the tool calls requested by the AI, call the relevant functions, and return the results."""
+        calls, tool_outputs = self._tool_calls(tool_calls)
+        if self.tool_executor is not None:
+            return _in_order(tool_calls, tool_outputs + self.tool_executor.run(calls))
+
+        for tool_call_id, function, arguments in calls:
+            # Run the functions, one by one, and collect the results.
+            try:
+                r = _run_sync(function, arguments)
+            except TimeoutError as e:
+                # E.g. from a `ProcessToolPool`, so tell the AI, like `ToolExecutor`
+                # does, rather than leave the run waiting for the outputs.
+                tool_outputs.append(_error_output(tool_call_id, e))
+                continue
+            tool_outputs.append(_output(tool_call_id, r))
+        return _in_order(tool_calls, tool_outputs)
+
+    def _start_run(
+        self,
+        contents: list,
+        additional_instructions: str | None,
+        deadline: float | None,
+        stats: RunStats,
+        stream: bool,
+    ):
+        """
+        Add the user's messages to the thread and start a run, in as few requests as we can.
+
+        The messages are added by the run itself, and if the conversation was created
+        lazily, the thread is created in the same request. The exception is additional
+        instructions, which `create_and_run` doesn't support, so then the thread is
+        created (with the messages) first. Streams return the stream manager.
+        """
+        threads = self._client_for(deadline).beta.threads
+        messages = [_user_message(content) for content in contents]
+        if self._pending and not additional_instructions:
+            stats.requests += 1
+            if stream:
+                return threads.create_and_run_stream(
+                    assistant_id=self._assistant.id,
+                    thread={"messages": messages},
+                    timeout=_remaining(deadline),
+                )
+            run = threads.create_and_run(
+                assistant_id=self._assistant.id,
+                thread={"messages": messages},
+                timeout=_remaining(deadline),
+            )
+            self._thread = _ThreadRef(run.thread_id)
+            return run
+
+        additional_messages: Any = messages
+        if self._pending:
+            stats.requests += 1
+            self._thread = threads.create(
+                messages=messages, timeout=_remaining(deadline)
+            )
+            additional_messages = NOT_GIVEN
+
+        stats.requests += 1
+        params = dict(
+            thread_id=self.id,
+            assistant_id=self._assistant.id,
+            additional_instructions=additional_instructions or NOT_GIVEN,
+            additional_messages=additional_messages,
+            timeout=_remaining(deadline),
+        )
+        if stream:
+            return threads.runs.stream(**params)
+        return threads.runs.create(**params)
+
+    def _cancel_run(self, run_id: str | None) -> None:
+        """Cancel a run, if it's still going."""
+        if run_id is None:
+            return
+        try:
+            self._client.beta.threads.runs.cancel(run_id, thread_id=self.id)
+        except openai.APIError:
+            # The run probably finished on its own in the meantime.
+            pass
+
+    def _wait_for_run(self, run, deadline: float | None, stats: RunStats):
+        """Poll a run until it's no longer queued or in progress."""
+        delays = self.poll_strategy.delays(deadline)
+        while run.status in ACTIVE_STATUSES:
+            delay = next(delays, None)
+            if delay is None:
+                self._cancel_run(run.id)
+                raise RunTimeoutError(run.id)
+            time.sleep(delay)
+            stats.poll_wait += delay
+            stats.polls += 1
+            stats.requests += 1
+            run = self._client_for(deadline).beta.threads.runs.retrieve(
+                thread_id=self.id, run_id=run.id, timeout=_remaining(deadline)
+            )
+            if run.status != "queued":
+                stats._run_started()
+        return run
+
+    def ask(
+        self,
+        message: str | None,
+        image_url: str | None = None,
+        image_file: bytes | None = None,
+        additional_instructions: str | None = None,
+        timeout: float | None = None,
+    ) -> EZMessage:
+        """
+        Ask something, and return the reply.
+
+        If the run doesn't finish within `timeout` seconds (or the poll strategy's
+        timeout, if not given), it's cancelled, and `RunTimeoutError` is raised. If it
+        ends any other way than completing, `RunError` is raised.
+        """
+        messages = self.ask_all(
+            message, image_url, image_file, additional_instructions, timeout
+        )
+        return messages[-1]
+
+    def _run_messages(self, run, deadline: float | None, stats: RunStats):
+        """Fetch the messages a run added to the thread, oldest first."""
+        stats.requests += 1
+        messages = self._client_for(deadline).beta.threads.messages.list(
+            self.id,
+            run_id=run.id,
+            order="asc",
+            limit=PAGE_SIZE,
+            timeout=_remaining(deadline),
+        )
+        # The user's message may have been added by the run, so skip it.
+        replies = [m for m in messages.data if m.role != "user"]
+        if not replies:
+            raise ValueError(f"ERROR: Run {run.id} completed without any messages.")
+        return [EZMessage(m.id, m, stats=stats) for m in replies]
+
+    def ask_all(
+        self,
+        message: str | None,
+        image_url: str | None = None,
+        image_file: bytes | None = None,
+        additional_instructions: str | None = None,
+        timeout: float | None = None,
+    ) -> list[EZMessage]:
+        """
+        Ask something, and return all the messages the run produced, oldest first.
+
+        Only the messages this run created are fetched, so this is correct even if
+        something else is adding messages to the thread at the same time. If another
+        run on the thread is active, this waits for it to finish, in the assistant's
+        `RunQueue`, and messages asked in the meantime may be put into the same run.
+        """
+        deadline = self.poll_strategy.deadline(timeout)
+        stats = RunStats()
+        content = self._gather_content(message, image_url, image_file)
+        if self._pending:
+            return self._run([content], additional_instructions, deadline, stats)
+        return self._assistant.run_queue.run(
+            self.id,
+            content,
+            deadline,
+            lambda contents: self._run(
+                contents, additional_instructions, deadline, stats
+            ),
+            key=(self._assistant.id, additional_instructions),
+        )
+
+    def _run(
+        self,
+        contents: list,
+        additional_instructions: str | None,
+        deadline: float | None,
+        stats: RunStats,
+    ) -> list[EZMessage]:
+        """
+        Start a run with the messages, and see it through to the end.
+
+        If a request takes us past the deadline, the run is cancelled, and
+        `RunTimeoutError` is raised, as it is when polling runs out of time.
+        """
+        last_run = None
+        try:
+            last_run = self._start_run(
+                contents, additional_instructions, deadline, stats, stream=False
+            )
+
+            while True:
+                last_run = self._wait_for_run(last_run, deadline, stats)
+
+                if last_run.status == "requires_action":  # type: ignore[attr-defined]
+                    round_started = time.monotonic()
+                    tool_outputs = self._call_tools(
+                        last_run.required_action.submit_tool_outputs.tool_calls  # type: ignore[union-attr]
+                    )
+
+                    stats.requests += 1
+                    last_run = self._client_for(
+                        deadline
+                    ).beta.threads.runs.submit_tool_outputs(
+                        thread_id=self.id,
+                        run_id=last_run.id,
+                        tool_outputs=tool_outputs,
+                        timeout=_remaining(deadline),
+                    )
+                    stats.tool_rounds.append(time.monotonic() - round_started)
+
+                elif last_run.status == "completed":  # type: ignore[attr-defined]
+                    messages = self._run_messages(last_run, deadline, stats)
+                    stats._usage(last_run.usage)
+                    stats._finish(self._assistant.stats_hook)
+                    return messages
+                else:
+                    # The run failed, was cancelled, expired, or is incomplete.
+                    raise RunError(last_run)
+        except _TIMEOUT_ERRORS as e:
+            run_id = last_run.id if last_run is not None else None
+            self._cancel_run(run_id)
+            raise RunTimeoutError(run_id) from e
+
+    def _ask_stream_generator(
+        self,
+        message: str | None,
+        image_url: str | None,
+        image_file: bytes | None,
+        additional_instructions: str | None,
+        mode: StreamMode,
+        state: _StreamState,
+        deadline: float | None,
+    ) -> Generator[EZMessage | EZDelta | str, None, EZMessage | None]:
+        stats = state.stats
+        content = self._gather_content(message, image_url, image_file)
+        stream_manager: AssistantStreamManager[AssistantEventHandler] = self._start_run(
+            [content], additional_instructions, deadline, stats, stream=True
+        )
+
+        final = None
+        round_started = None
+        while True:
+            tool_outputs = []
+            with stream_manager as stream:
+                if round_started is not None:
+                    stats.tool_rounds.append(time.monotonic() - round_started)
+                for event in stream:
+                    if deadline is not None and time.monotonic() > deadline:
+                        self._cancel_run(state.run_id)
+                        raise RunTimeoutError(state.run_id)
+                    match event.event:
+                        case "thread.message.delta":
+                            stats._delta()
+                            chunk = _delta_text(event.data.delta)
+                            state.buffer.append(chunk)
+                            if mode == "text":
+                                yield chunk
+                            elif mode == "delta":
+                                yield EZDelta(event.data.id, chunk)
+                            else:
+                                yield EZMessage(event.data.id, event.data.delta)
+                        case "thread.run.created":
+                            state.run_id = event.data.id
+                            if self._pending:
+                                self._thread = _ThreadRef(event.data.thread_id)
+                        case "thread.run.in_progress":
+                            stats._run_started()
+                        case "thread.message.completed":
+                            final = EZMessage(event.data.id, event.data, stats=stats)
+                        case "thread.run.completed":
+                            stats._usage(event.data.usage)
+                            self._record_usage(event.data.usage)
+                        case (
+                            "thread.run.failed"
+                            | "thread.run.cancelled"
+                            | "thread.run.expired"
+                            | "thread.run.incomplete"
+                        ):
+                            raise RunError(event.data)
+                        case "thread.run.requires_action":
+                            # If the thread run requires action, call the functions,
+                            # and gather the tool outputs so we can submit them.
+                            round_started = time.monotonic()
+                            tool_outputs = self._call_tools(
+                                event.data.required_action.submit_tool_outputs.tool_calls  # type: ignore[union-attr]
+                            )
+                            run_id = event.data.id
+                            # We assume that this is the final event for this thread
+                            # run, so we break the loop.
+                            break
+
+            # If we don't have anything to run for the tool outputs, we're done.
+            if not tool_outputs:
+                stats._finish(self._assistant.stats_hook)
+                return final
+
+            # Submit the tool outputs and reset the stream.
+            stats.requests += 1
+            stream_manager = self._client_for(
+                deadline
+            ).beta.threads.runs.submit_tool_outputs_stream(
+                thread_id=self.id,
+                run_id=run_id,
+                tool_outputs=tool_outputs,
+                timeout=_remaining(deadline),
+            )
+
+    def ask_stream(
+        self,
+        message: str | None,
+        image_url: str | None = None,
+        image_file: bytes | None = None,
+        additional_instructions: str | None = None,
+        mode: StreamMode = "message",
+        timeout: float | None = None,
+    ) -> EZGenerator:
+        """
+        Ask something, and stream the reply as it's generated.
+
+        By default, every piece of the reply is yielded as an `EZMessage`. With
+        `mode="delta"`, lighter `EZDelta` objects are yielded instead, and with
+        `mode="text"`, plain strings. Either way, the generator's `text_so_far` has the
+        text received until now, and its `value` the final message once it's done.
+
+        `timeout` works like it does for `ask()`, and covers the whole stream, including
+        waiting for other runs on the thread to finish. Streams always get a run of
+        their own.
+        """
+        state = _StreamState()
+        deadline = self.poll_strategy.deadline(timeout)
+        return EZGenerator(
+            self._timed_stream(
+                self._queued_stream(
+                    self._ask_stream_generator(
+                        message,
+                        image_url,
+                        image_file,
+                        additional_instructions,
+                        mode,
+                        state,
+                        deadline,
+                    ),
+                    deadline,
+                ),
+                state,
+            ),
+            state,
+        )
+
+    def _queued_stream(self, gen, deadline: float | None):
+        """Hold the thread's turn in the run queue for as long as a stream lasts."""
+        turn = (
+            nullcontext()
+            if self._pending
+            else self._assistant.run_queue.turn(self.id, deadline)
+        )
+        with turn:
+            return (yield from gen)
+
+    def _timed_stream(self, gen, state: _StreamState):
+        """Turn a stream's read timing out into cancelling the run."""
+        try:
+            return (yield from gen)
+        except _TIMEOUT_ERRORS as e:
+            self._cancel_run(state.run_id)
+            raise RunTimeoutError(state.run_id) from e
+
+
+def _modify_params(
+    name, instructions, model, temperature, response_format, functions
+) -> dict[str, Any]:
+    """Build the parameters for updating an assistant."""
+    params = {
+        "instructions": instructions,
+        "name": name,
+        "tools": [fn._openai_fn for fn in functions.values()],
+        "model": model,
+    }
+    if response_format:
+        params["response_format"] = response_format
+    if temperature:
+        params["temperature"] = temperature
+    return params
+
+
+def _create_params(
+    name, instructions, model, temperature, response_format, functions
+) -> dict[str, Any]:
+    """Build the parameters for creating an assistant."""
+    params = {
+        "instructions": instructions,
+        "name": name,
+        "model": model,
+        "temperature": temperature,
+        "tools": [fn._openai_fn for fn in functions.values()],
+    }
+    if response_format:
+        params["response_format"] = response_format
+    return params
+
+
+# Assistants we've recently retrieved, created or modified, by ID, so that getting
+# them again doesn't need a round-trip. Change its `ttl` or `clear()` it if the
+# assistants are also modified elsewhere.
+ASSISTANT_CACHE: TTLCache = TTLCache(maxsize=128, ttl=300)
+
+
+class _TrustedAssistant:
+    """Stands in for an assistant we haven't retrieved, when the caller trusts the ID."""
+
+    def __init__(self, id: str) -> None:
+        self.id = id
+
+
+def _lookup_assistant(id: str, cache: bool, trusted: bool):
+    """Return the assistant from the cache (or a stand-in), or None if we must fetch it."""
+    assistant = ASSISTANT_CACHE.get(id) if cache else None
+    if assistant is None and trusted:
+        assistant = _TrustedAssistant(id)
+    return assistant
+
+
+def _tool_config(tool):
+    """Leave out the `strict: false` the API adds to functions that don't set it."""
+    function = tool.get("function") if isinstance(tool, dict) else None
+    if not isinstance(function, dict) or function.get("strict") is not False:
+        return tool
+    return {**tool, "function": {k: v for k, v in function.items() if k != "strict"}}
+
+
+def _config_hash(params: dict[str, Any]) -> str:
+    def plain(value):
+        if hasattr(value, "model_dump"):
+            return value.model_dump(exclude_none=True)
+        if isinstance(value, list):
+            return [plain(v) for v in value]
+        return value
+
+    config = {k: plain(v) for k, v in params.items()}
+    # The API's defaults for what we didn't set don't count as differences.
+    if "instructions" in config:
+        config["instructions"] = config["instructions"] or ""
+    if "tools" in config:
+        config["tools"] = [_tool_config(tool) for tool in config["tools"] or []]
+    dumped = json.dumps(config, sort_keys=True, default=str)
+    return hashlib.sha256(dumped.encode()).hexdigest()
+
+
+def _needs_update(assistant, params: dict[str, Any]) -> bool:
+    """Check whether an assistant's configuration differs from the given parameters."""
+    if isinstance(assistant, _TrustedAssistant):
+        return True
+    current = {key: getattr(assistant, key, None) for key in params}
+    return _config_hash(current) != _config_hash(params)
+
+
+class _BaseAssistant:
+    """The parts of an assistant that are the same for the sync and async APIs."""
+
+    _client_class: type[openai.OpenAI] | type[openai.AsyncOpenAI] = openai.OpenAI
+
+    def __init__(
+        self,
+        api_key: str = "",
+        functions: None | list[Callable] = None,
+        poll_strategy: PollStrategy | None = None,
+        tool_executor: ToolExecutor | None = None,
+        rate_limiter: RateLimiter | None = None,
+        base_url: str | None = None,
+        client: Any = None,
+        http_client: Any = None,
+        client_registry: ClientRegistry | None = None,
+        upload_cache: UploadCache | None = None,
+        stats_hook: StatsHook | None = None,
+        instrumentation: Instrumentation | None = None,
+        thread_pool: WarmThreadPool | None = None,
+        run_queue: RunQueue | None = None,
+    ) -> None:
+        """
+        Initialize the assistant.
+
+        By default, the OpenAI client comes from a registry that shares clients between
+        all assistants with the same API key and base URL. You can pass your own
+        `client`, an `http_client` to build one with, or a different `client_registry`.
+
+        If given, `stats_hook` is called with the `RunStats` of every completed run,
+        `instrumentation` is told about every API call the assistant makes, and new
+        conversations get their threads from `thread_pool`, which starts filling up
+        right away. Runs on the same thread take turns in `run_queue`, which is shared
+        by all assistants by default.
+        """
+        if client is None:
+            if not api_key:
+                api_key = os.getenv("OPENAI_API_KEY", "")
+            if not api_key:
+                raise AssertionError(
+                    "ERROR: api_key parameter or OPENAI_API_KEY environment variable not "
+                    "provided, cannot continue without an API key."
+                )
+
+            if http_client is not None:
+                client = self._client_class(
+                    api_key=api_key, base_url=base_url, http_client=http_client
+                )
+            else:
+                registry = client_registry or DEFAULT_CLIENT_REGISTRY
+                client = registry.get(self._client_class, api_key, base_url)
+
+        self._client = client
+        self.rate_limiter = rate_limiter
+        if rate_limiter is not None or instrumentation is not None:
+            self._client = _ClientProxy(self._client, rate_limiter, instrumentation)
+        self.__timed_client = None
+        self.__assistant = None
+        self.poll_strategy = poll_strategy or DEFAULT_POLL_STRATEGY
+        self.tool_executor = tool_executor
+        self.upload_cache = upload_cache
+        self.stats_hook = stats_hook
+        self.thread_pool = thread_pool
+        self.run_queue = run_queue or DEFAULT_RUN_QUEUE
+        if thread_pool is not None:
+            if issubclass(self._client_class, openai.AsyncOpenAI):
+                thread_pool.afill(self._client)
+            else:
+                thread_pool.fill(self._client)
+
+        if not functions:
+            functions = []
+        self._functions = {fn.__name__: fn for fn in functions}
+
+    @property
+    def id(self) -> str:
+        return self._assistant.id
+
+    @property
+    def _assistant(self):
+        if self.__assistant is None:
+            raise ValueError(
+                "Cannot work with an uninitialized assistant. Either specify an "
+                "assistant ID or call .create()."
+            )
+        return self.__assistant
+
+    @_assistant.setter
+    def _assistant(self, assistant):
+        self.__assistant = assistant
+
+    @property
+    def _timed_client(self):
+        """
+        The client for requests with a deadline.
+
+        The SDK's retries would carry on past the deadline, so this one doesn't retry.
+        """
+        if self.__timed_client is None:
+            self.__timed_client = self._client.with_options(max_retries=0)
+        return self.__timed_client
+
+
+class Assistant(_BaseAssistant):
+    @property
+    def conversation(self) -> Conversation:
+        return Conversation(assistant=self, functions=self._functions)
+
+    @classmethod
+    def get(
+        cls,
+        id: str,
+        functions: None | list[Callable] = None,
+        api_key: str = "",
+        cache: bool = True,
+        trusted: bool = False,
+        **kwargs,
+    ) -> "Assistant":
+        """
+        Retrieve a previously-created assistant by ID.
+
+        Recently-seen assistants are served from `ASSISTANT_CACHE` unless `cache` is
+        false. If `trusted` is true, the ID is assumed to exist and isn't retrieved at
+        all.
+        """
+        assistant = cls(api_key=api_key, functions=functions, **kwargs)
+        existing = _lookup_assistant(id, cache, trusted)
+        if existing is None:
+            existing = assistant._client.beta.assistants.retrieve(id)
+            ASSISTANT_CACHE.set(id, existing)
+        assistant._assistant = existing
+        return assistant
+
+    @classmethod
+    def get_and_modify(
+        cls,
+        id: str,
+        name: str,
+        instructions: str = "",
+        model=DEFAULT_MODEL,
+        temperature: float | None = None,
+        response_format: Any = None,
+        functions: None | list[Callable] = None,
+        api_key: str = "",
+        **kwargs,
+    ) -> "Assistant":
+        """
+        Retrieve a previously-created assistant, and modify it to the parameters.
+
+        The assistant is only updated if its configuration actually differs.
+        """
+        assistant = cls.get(id, functions=functions, api_key=api_key, **kwargs)
+        params = _modify_params(
+            name,
+            instructions,
+            model,
+            temperature,
+            response_format,
+            assistant._functions,
+        )
+        if _needs_update(assistant._assistant, params):
+            assistant._assistant = assistant._client.beta.assistants.update(
+                id, **params
+            )
+            ASSISTANT_CACHE.set(id, assistant._assistant)
+        return assistant
+
+    @classmethod
+    def create(
+        cls,
+        name: str,
+        instructions: str = "",
+        model=DEFAULT_MODEL,
+        temperature: float = 1.0,
+        response_format: Any = None,
+        functions: None | list[Callable] = None,
+        api_key: str = "",
+        **kwargs,
+    ) -> "Assistant":
+        """Create an assistant."""
+        assistant = cls(api_key=api_key, functions=functions, **kwargs)
+        params = _create_params(
+            name,
+            instructions,
+            model,
+            temperature,
+            response_format,
+            assistant._functions,
+        )
+        assistant._assistant = assistant._client.beta.assistants.create(**params)
+        ASSISTANT_CACHE.set(assistant.id, assistant._assistant)
+        return assistant
+
+    def delete(self):
+        ASSISTANT_CACHE.pop(self.id)
+        self._client.beta.assistants.delete(self.id)
+
+    def ask_many(
+        self,
+        prompts: Iterable[str],
+        concurrency: int = 8,
+        retries: int = 2,
+        retry_delay: float = 1.0,
+        ordered: bool = True,
+        **kwargs,
+    ) -> Iterator[BatchResult]:
+        """
+        Ask every prompt in its own conversation, running `concurrency` of them at once.
+
+        Results are yielded as `BatchResult`s, in the same order as the prompts if
+        `ordered` is true, or as soon as they finish otherwise. Failed asks are retried
+        up to `retries` times, and if they still fail, the exception is returned in the
+        result's `error`. Any extra keyword arguments are passed to `ask()`.
+        """
+        return ask_many(
+            self, prompts, concurrency, retries, retry_delay, ordered, kwargs
+        )
+
+
+class EZAsyncGenerator:
+    """
+    An async iterator over streamed message deltas.
+
+    Once it's exhausted, the final message is available in `value`.
+    """
+
+    def __init__(self, gen, state: _StreamState | None = None):
+        self.gen = gen
+        self.value = None
+        self._state = state or _StreamState()
+
+    @property
+    def text_so_far(self) -> str:
+        """All the text that has been streamed so far."""
+        return self._state.buffer.text
+
+    @property
+    def run_id(self) -> str | None:
+        """The ID of the run producing the stream, once it has started."""
+        return self._state.run_id
+
+    @property
+    def stats(self) -> RunStats:
+        """Timing and usage statistics for the stream so far."""
+        return self._state.stats
+
+    async def __aiter__(self):
+        try:
+            async for message in self.gen:
+                if isinstance(message, _StreamResult):
+                    self.value = message.message
+                    return
+                yield message
+        finally:
+            # Don't leave the generators suspended, holding the thread's turn.
+            await self.gen.aclose()
+
+
+class _StreamResult:
+    """Marks the final message of an async stream."""
+
+    def __init__(self, message: EZMessage | None):
+        self.message = message
+
+
+class AsyncConversation(_BaseConversation):
+    """
+    A conversation, with multiple messages, using the asyncio OpenAI client.
+
+    Functions can be regular or `async def`. Regular functions are run in a worker
+    thread so they don't block the event loop.
+    """
+
+    async def get(self, id) -> "AsyncConversation":
+        self._thread = await self._client.beta.threads.retrieve(id)
+        return self
+
+    async def create(self, lazy: bool = False) -> "AsyncConversation":
+        """Create a new conversation, like `Conversation.create()`."""
+        if lazy:
+            self._lazy = True
+            return self
+
+        pool = self._assistant.thread_pool
+        thread = await pool.aacquire(self._client) if pool is not None else None
+        self._thread = thread or await self._client.beta.threads.create()
+        return self
+
+    async def delete(self) -> None:
+        await self._client.beta.threads.delete(self.id)
+        HISTORY_CACHE.pop(self.id)
+
+    async def history(self) -> AsyncIterator[EZMessage]:
+        """Iterate over the messages in the conversation, oldest first."""
+        cached = thread_history(self.id)
+        previous_id = None
+        for message in cached.snapshot():
+            yield EZMessage(message.id, message)
+            previous_id = message.id
+
+        while True:
+            page = await self._client.beta.threads.messages.list(
+                self.id,
+                order="asc",
+                after=previous_id or NOT_GIVEN,
+                limit=PAGE_SIZE,
+            )
+            for message in page.data:
+                cached.add(message, previous_id)
+                yield EZMessage(message.id, message)
+                previous_id = message.id
+            if not page.has_more or not page.data:
+                return
+
+    async def _gather_content(self, message, image_url, image_file):
+        """Gather the content for a message, uploading the image file if needed."""
+        file_id = None
+        if image_file is not None:
+            upload_cache = self._assistant.upload_cache
+            if upload_cache is not None:
+                file_id = await upload_cache.afile_id(self._client, image_file)
+            else:
+                with open(image_file, "rb") as f:
+                    file = await self._client.files.create(file=f, purpose="assistants")
+                file_id = file.id
+        return _gather_content(message, image_url, file_id)
+
+    async def _call_tools(self, tool_calls):
+        """Go through the tool calls requested by the AI, call the relevant functions, and return the results."""
+        calls, tool_outputs = self._tool_calls(tool_calls)
+        if self.tool_executor is not None:
+            return _in_order(
+                tool_calls, tool_outputs + await self.tool_executor.arun(calls)
+            )
+
+        for tool_call_id, function, arguments in calls:
+            try:
+                if inspect.iscoroutinefunction(function):
+                    r = await function(**arguments)
+                else:
+                    r = await asyncio.to_thread(function, **arguments)
+            except TimeoutError as e:
+                tool_outputs.append(_error_output(tool_call_id, e))
+                continue
+            tool_outputs.append(_output(tool_call_id, r))
+        return _in_order(tool_calls, tool_outputs)
+
+    async def _start_run(
+        self,
+        contents: list,
+        additional_instructions: str | None,
+        deadline: float | None,
+        stats: RunStats,
+        stream: bool,
+    ):
+        """Start a run with the user's messages, like `Conversation._start_run()`."""
+        threads = self._client_for(deadline).beta.threads
+        messages = [_user_message(content) for content in contents]
+        if self._pending and not additional_instructions:
+            stats.requests += 1
+            if stream:
+                return threads.create_and_run_stream(
+                    assistant_id=self._assistant.id,
+                    thread={"messages": messages},
+                    timeout=_remaining(deadline),
+                )
+            run = await threads.create_and_run(
+                assistant_id=self._assistant.id,
+                thread={"messages": messages},
+                timeout=_remaining(deadline),
+            )
+            self._thread = _ThreadRef(run.thread_id)
+            return run
+
+        additional_messages: Any = messages
+        if self._pending:
+            stats.requests += 1
+            self._thread = await threads.create(
+                messages=messages, timeout=_remaining(deadline)
+            )
+            additional_messages = NOT_GIVEN
+
+        stats.requests += 1
+        params = dict(
+            thread_id=self.id,
+            assistant_id=self._assistant.id,
+            additional_instructions=additional_instructions or NOT_GIVEN,
+            additional_messages=additional_messages,
+            timeout=_remaining(deadline),
+        )
+        if stream:
+            return threads.runs.stream(**params)
+        return await threads.runs.create(**params)
+
+    async def _cancel_run(self, run_id: str | None) -> None:
+        """Cancel a run, if it's still going."""
+        if run_id is None:
+            return
+        try:
+            await self._client.beta.threads.runs.cancel(run_id, thread_id=self.id)
+        except openai.APIError:
+            # The run probably finished on its own in the meantime.
+            pass
+
+    async def _wait_for_run(self, run, deadline: float | None, stats: RunStats):
+        """Poll a run until it's no longer queued or in progress."""
+        delays = self.poll_strategy.delays(deadline)
+        while run.status in ACTIVE_STATUSES:
+            delay = next(delays, None)
+            if delay is None:
+                await self._cancel_run(run.id)
+                raise RunTimeoutError(run.id)
+            await asyncio.sleep(delay)
+            stats.poll_wait += delay
+            stats.polls += 1
+            stats.requests += 1
+            run = await self._client_for(deadline).beta.threads.runs.retrieve(
+                thread_id=self.id, run_id=run.id, timeout=_remaining(deadline)
+            )
+            if run.status != "queued":
+                stats._run_started()
+        return run
+
+    async def ask(
+        self,
+        message: str | None,
+        image_url: str | None = None,
+        image_file: bytes | None = None,
+        additional_instructions: str | None = None,
+        timeout: float | None = None,
+    ) -> EZMessage:
+        """Ask something, and return the reply, like `Conversation.ask()`."""
+        messages = await self.ask_all(
+            message, image_url, image_file, additional_instructions, timeout
+        )
+        return messages[-1]
+
+    async def _run_messages(self, run, deadline: float | None, stats: RunStats):
+        """Fetch the messages a run added to the thread, oldest first."""
+        stats.requests += 1
+        messages = await self._client_for(deadline).beta.threads.messages.list(
+            self.id,
+            run_id=run.id,
+            order="asc",
+            limit=PAGE_SIZE,
+            timeout=_remaining(deadline),
+        )
+        # The user's message may have been added by the run, so skip it.
+        replies = [m for m in messages.data if m.role != "user"]
+        if not replies:
+            raise ValueError(f"ERROR: Run {run.id} completed without any messages.")
+        return [EZMessage(m.id, m, stats=stats) for m in replies]
+
+    async def ask_all(
+        self,
+        message: str | None,
+        image_url: str | None = None,
+        image_file: bytes | None = None,
+        additional_instructions: str | None = None,
+        timeout: float | None = None,
+    ) -> list[EZMessage]:
+        """
+        Ask something, and return all the messages the run produced, oldest first.
+
+        Runs on the thread take turns, like they do for `Conversation.ask_all()`.
+        """
+        deadline = self.poll_strategy.deadline(timeout)
+        stats = RunStats()
+        content = await self._gather_content(message, image_url, image_file)
+        if self._pending:
+            return await self._run([content], additional_instructions, deadline, stats)
+        return await self._assistant.run_queue.arun(
+            self.id,
+            content,
+            deadline,
+            lambda contents: self._run(
+                contents, additional_instructions, deadline, stats
+            ),
+            key=(self._assistant.id, additional_instructions),
+        )
+
+    async def _run(
+        self,
+        contents: list,
+        additional_instructions: str | None,
+        deadline: float | None,
+        stats: RunStats,
+    ) -> list[EZMessage]:
+        """See a run through to the end, like `Conversation._run()`."""
+        last_run = None
+        try:
+            last_run = await self._start_run(
+                contents, additional_instructions, deadline, stats, stream=False
+            )
+
+            while True:
+                last_run = await self._wait_for_run(last_run, deadline, stats)
+
+                if last_run.status == "requires_action":
+                    round_started = time.monotonic()
+                    tool_outputs = await self._call_tools(
+                        last_run.required_action.submit_tool_outputs.tool_calls  # type: ignore[union-attr]
+                    )
+
+                    stats.requests += 1
+                    last_run = await self._client_for(
+                        deadline
+                    ).beta.threads.runs.submit_tool_outputs(
+                        thread_id=self.id,
+                        run_id=last_run.id,
+                        tool_outputs=tool_outputs,
+                        timeout=_remaining(deadline),
+                    )
+                    stats.tool_rounds.append(time.monotonic() - round_started)
+
+                elif last_run.status == "completed":
+                    messages = await self._run_messages(last_run, deadline, stats)
+                    stats._usage(last_run.usage)
+                    stats._finish(self._assistant.stats_hook)
+                    return messages
+                else:
+                    # The run failed, was cancelled, expired, or is incomplete.
+                    raise RunError(last_run)
+        except _TIMEOUT_ERRORS as e:
+            run_id = last_run.id if last_run is not None else None
+            await self._cancel_run(run_id)
+            raise RunTimeoutError(run_id) from e
+
+    async def _ask_stream_generator(
+        self,
+        message: str | None,
+        image_url: str | None,
+        image_file: bytes | None,
+        additional_instructions: str | None,
+        mode: StreamMode,
+        state: _StreamState,
+        deadline: float | None,
+    ) -> AsyncGenerator[EZMessage | EZDelta | str | _StreamResult, None]:
+        stats = state.stats
+        content = await self._gather_content(message, image_url, image_file)
+        stream_manager = await self._start_run(
+            [content], additional_instructions, deadline, stats, stream=True
+        )
+
+        final = None
+        round_started = None
+        while True:
+            tool_outputs = []
+            async with stream_manager as stream:
+                if round_started is not None:
+                    stats.tool_rounds.append(time.monotonic() - round_started)
+                async for event in stream:
+                    if deadline is not None and time.monotonic() > deadline:
+                        await self._cancel_run(state.run_id)
+                        raise RunTimeoutError(state.run_id)
+                    match event.event:
+                        case "thread.message.delta":
+                            stats._delta()
+                            chunk = _delta_text(event.data.delta)
+                            state.buffer.append(chunk)
+                            if mode == "text":
+                                yield chunk
+                            elif mode == "delta":
+                                yield EZDelta(event.data.id, chunk)
+                            else:
+                                yield EZMessage(event.data.id, event.data.delta)
+                        case "thread.run.created":
+                            state.run_id = event.data.id
+                            if self._pending:
+                                self._thread = _ThreadRef(event.data.thread_id)
+                        case "thread.run.in_progress":
+                            stats._run_started()
+                        case "thread.message.completed":
+                            final = EZMessage(event.data.id, event.data, stats=stats)
+                        case "thread.run.completed":
+                            stats._usage(event.data.usage)
+                            self._record_usage(event.data.usage)
+                        case (
+                            "thread.run.failed"
+                            | "thread.run.cancelled"
+                            | "thread.run.expired"
+                            | "thread.run.incomplete"
+                        ):
+                            raise RunError(event.data)
+                        case "thread.run.requires_action":
+                            round_started = time.monotonic()
+                            tool_outputs = await self._call_tools(
+                                event.data.required_action.submit_tool_outputs.tool_calls
+                            )
+                            run_id = event.data.id
+                            break
+
+            if not tool_outputs:
+                stats._finish(self._assistant.stats_hook)
+                yield _StreamResult(final)
+                return
+
+            stats.requests += 1
+            stream_manager = self._client_for(
+                deadline
+            ).beta.threads.runs.submit_tool_outputs_stream(
+                thread_id=self.id,
+                run_id=run_id,
+                tool_outputs=tool_outputs,
+                timeout=_remaining(deadline),
+            )
+
+    def ask_stream(
+        self,
+        message: str | None,
+        image_url: str | None = None,
+        image_file: bytes | None = None,
+        additional_instructions: str | None = None,
+        mode: StreamMode = "message",
+        timeout: float | None = None,
+    ) -> EZAsyncGenerator:
+        """Ask something, and stream the reply as it's generated."""
+        state = _StreamState()
+        deadline = self.poll_strategy.deadline(timeout)
+        return EZAsyncGenerator(
+            self._timed_stream(
+                self._queued_stream(
+                    self._ask_stream_generator(
+                        message,
+                        image_url,
+                        image_file,
+                        additional_instructions,
+                        mode,
+                        state,
+                        deadline,
+                    ),
+                    deadline,
+                ),
+                state,
+            ),
+            state,
+        )
+
+    async def _queued_stream(self, gen, deadline: float | None):
+        """Hold the thread's turn in the run queue for as long as a stream lasts."""
+        turn = (
+            nullcontext()
+            if self._pending
+            else self._assistant.run_queue.aturn(self.id, deadline)
+        )
+        try:
+            async with turn:
+                async for item in gen:
+                    yield item
+        finally:
+            await gen.aclose()
+
+    async def _timed_stream(self, gen, state: _StreamState):
+        """Turn a stream's read timing out into cancelling the run."""
+        try:
+            async for item in gen:
+                yield item
+        except _TIMEOUT_ERRORS as e:
+            await self._cancel_run(state.run_id)
+            raise RunTimeoutError(state.run_id) from e
+        finally:
+            await gen.aclose()
+
+
+class AsyncAssistant(_BaseAssistant):
+    """An assistant that uses the asyncio OpenAI client."""
+
+    _client_class = openai.AsyncOpenAI
+
+    @property
+    def conversation(self) -> AsyncConversation:
+        return AsyncConversation(assistant=self, functions=self._functions)
+
+    @classmethod
+    async def get(
+        cls,
+        id: str,
+        functions: None | list[Callable] = None,
+        api_key: str = "",
+        cache: bool = True,
+        trusted: bool = False,
+        **kwargs,
+    ) -> "AsyncAssistant":
+        """Retrieve a previously-created assistant by ID."""
+        assistant = cls(api_key=api_key, functions=functions, **kwargs)
+        existing = _lookup_assistant(id, cache, trusted)
+        if existing is None:
+            existing = await assistant._client.beta.assistants.retrieve(id)
+            ASSISTANT_CACHE.set(id, existing)
+        assistant._assistant = existing
+        return assistant
+
+    @classmethod
+    async def get_and_modify(
+        cls,
+        id: str,
+        name: str,
+        instructions: str = "",
+        model=DEFAULT_MODEL,
+        temperature: float | None = None,
+        response_format: Any = None,
+        functions: None | list[Callable] = None,
+        api_key: str = "",
+        **kwargs,
+    ) -> "AsyncAssistant":
+        """Retrieve a previously-created assistant, and modify it to the parameters."""
+        assistant = await cls.get(id, functions=functions, api_key=api_key, **kwargs)
+        params = _modify_params(
+            name,
+            instructions,
+            model,
+            temperature,
+            response_format,
+            assistant._functions,
+        )
+        if _needs_update(assistant._assistant, params):
+            assistant._assistant = await assistant._client.beta.assistants.update(
+                id, **params
+            )
+            ASSISTANT_CACHE.set(id, assistant._assistant)
+        return assistant
+
+    @classmethod
+    async def create(
+        cls,
+        name: str,
+        instructions: str = "",
+        model=DEFAULT_MODEL,
+        temperature: float = 1.0,
+        response_format: Any = None,
+        functions: None | list[Callable] = None,
+        api_key: str = "",
+        **kwargs,
+    ) -> "AsyncAssistant":
+        """Create an assistant."""
+        assistant = cls(api_key=api_key, functions=functions, **kwargs)
+        params = _create_params(
+            name,
+            instructions,
+            model,
+            temperature,
+            response_format,
+            assistant._functions,
+        )
+        assistant._assistant = await assistant._client.beta.assistants.create(**params)
+        ASSISTANT_CACHE.set(assistant.id, assistant._assistant)
+        return assistant
+
+    async def delete(self):
+        ASSISTANT_CACHE.pop(self.id)
+        await self._client.beta.assistants.delete(self.id)
+
+    def ask_many(
+        self,
+        prompts: Iterable[str],
+        concurrency: int = 8,
+        retries: int = 2,
+        retry_delay: float = 1.0,
+        ordered: bool = True,
+        **kwargs,
+    ) -> AsyncIterator[BatchResult]:
+        """The async version of `Assistant.ask_many()`."""
+        return async_ask_many(
+            self, prompts, concurrency, retries, retry_delay, ordered, kwargs
+        )
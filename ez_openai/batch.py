@@ -0,0 +1,151 @@
+import asyncio
+import time
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+from typing import Any
+from typing import AsyncIterator
+from typing import Iterable
+from typing import Iterator
+
+if TYPE_CHECKING:
+    from .assistant import Assistant
+    from .assistant import AsyncAssistant
+    from .assistant import EZMessage
+
+
+@dataclass
+class BatchResult:
+    """The outcome of one prompt in a batch: either a message or an error."""
+
+    index: int
+    prompt: str
+    message: "EZMessage | None" = None
+    error: Exception | None = None
+    attempts: int = 0
+
+
+class _Reorderer:
+    """Hold results back until all the ones before them have been yielded."""
+
+    def __init__(self) -> None:
+        self.next_index = 0
+        self.buffered: dict[int, BatchResult] = {}
+
+    def add(self, result: BatchResult) -> Iterator[BatchResult]:
+        self.buffered[result.index] = result
+        while self.next_index in self.buffered:
+            yield self.buffered.pop(self.next_index)
+            self.next_index += 1
+
+
+def ask_many(
+    assistant: "Assistant",
+    prompts: Iterable[str],
+    concurrency: int,
+    retries: int,
+    retry_delay: float,
+    ordered: bool,
+    ask_kwargs: dict[str, Any],
+) -> Iterator[BatchResult]:
+    """Ask each prompt in a new conversation, `concurrency` at a time."""
+
+    def ask_one(index: int, prompt: str) -> BatchResult:
+        result = BatchResult(index, prompt)
+        for attempt in range(retries + 1):
+            result.attempts += 1
+            try:
+                conversation = assistant.conversation.create(lazy=True)
+                result.message = conversation.ask(prompt, **ask_kwargs)
+                result.error = None
+                break
+            except Exception as e:
+                result.error = e
+                if attempt < retries:
+                    time.sleep(retry_delay * 2**attempt)
+        return result
+
+    reorderer = _Reorderer()
+    numbered = enumerate(prompts)
+    pool = ThreadPoolExecutor(
+        max_workers=concurrency, thread_name_prefix="ez_openai_batch"
+    )
+    pending: set[Future] = set()
+
+    def fill() -> None:
+        # Only pull prompts from the iterable as slots free up, so huge (or lazy)
+        # inputs don't all get queued up front.
+        for index, prompt in numbered:
+            pending.add(pool.submit(ask_one, index, prompt))
+            if len(pending) >= concurrency:
+                break
+
+    try:
+        fill()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.remove(future)
+                if ordered:
+                    yield from reorderer.add(future.result())
+                else:
+                    yield future.result()
+            fill()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def async_ask_many(
+    assistant: "AsyncAssistant",
+    prompts: Iterable[str],
+    concurrency: int,
+    retries: int,
+    retry_delay: float,
+    ordered: bool,
+    ask_kwargs: dict[str, Any],
+) -> AsyncIterator[BatchResult]:
+    """Ask each prompt in a new conversation, `concurrency` at a time."""
+
+    async def ask_one(index: int, prompt: str) -> BatchResult:
+        result = BatchResult(index, prompt)
+        for attempt in range(retries + 1):
+            result.attempts += 1
+            try:
+                conversation = await assistant.conversation.create(lazy=True)
+                result.message = await conversation.ask(prompt, **ask_kwargs)
+                result.error = None
+                break
+            except Exception as e:
+                result.error = e
+                if attempt < retries:
+                    await asyncio.sleep(retry_delay * 2**attempt)
+        return result
+
+    reorderer = _Reorderer()
+    numbered = enumerate(prompts)
+    pending: set[asyncio.Task] = set()
+
+    def fill() -> None:
+        for index, prompt in numbered:
+            pending.add(asyncio.ensure_future(ask_one(index, prompt)))
+            if len(pending) >= concurrency:
+                break
+
+    try:
+        fill()
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                pending.remove(task)
+                if ordered:
+                    for result in reorderer.add(task.result()):
+                        yield result
+                else:
+                    yield task.result()
+            fill()
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,108 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+from typing import Callable
+from typing import Generic
+from typing import Hashable
+from typing import TypeVar
+
+V = TypeVar("V")
+
+_MISSING = object()
+
+
+class TTLCache(Generic[V]):
+    """
+    A thread-safe LRU cache whose entries also expire after `ttl` seconds.
+
+    If given, `on_evict` is called with the key and value of every entry that gets
+    dropped, whether because it expired, the cache was full, or it was removed.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 128,
+        ttl: float | None = None,
+        on_evict: Callable[[Any, V], None] | None = None,
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self._data: OrderedDict[Hashable, tuple[float, V]] = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            try:
+                expires, value = self._data[key]
+            except KeyError:
+                return default
+            if expires < time.monotonic():
+                del self._data[key]
+                evicted = (key, value)
+            else:
+                self._data.move_to_end(key)
+                return value
+        self._evicted([evicted])
+        return default
+
+    def set(self, key: Hashable, value: V, ttl: float | None = None) -> None:
+        """Add an entry, optionally with a different time-to-live than the default."""
+        if ttl is None:
+            ttl = self.ttl
+        expires = time.monotonic() + ttl if ttl is not None else float("inf")
+        evicted = []
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None and old[1] is not value:
+                evicted.append((key, old[1]))
+            self._data[key] = (expires, value)
+            while len(self._data) > self.maxsize:
+                old_key, (_, old_value) = self._data.popitem(last=False)
+                evicted.append((old_key, old_value))
+        self._evicted(evicted)
+
+    def items(self) -> list[tuple[Hashable, V]]:
+        """Return the entries that haven't expired yet."""
+        now = time.monotonic()
+        with self._lock:
+            return [(k, v) for k, (expires, v) in self._data.items() if expires >= now]
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, None)
+        if entry is None:
+            return default
+        self._evicted([(key, entry[1])])
+        return entry[1]
+
+    def expire(self) -> None:
+        """Drop all the entries that have expired."""
+        now = time.monotonic()
+        with self._lock:
+            evicted = [
+                (k, v) for k, (expires, v) in self._data.items() if expires < now
+            ]
+            for key, _ in evicted:
+                del self._data[key]
+        self._evicted(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            evicted = [(k, v) for k, (_, v) in self._data.items()]
+            self._data.clear()
+        self._evicted(evicted)
+
+    def _evicted(self, entries) -> None:
+        # Call the callback outside the lock, as it might be slow (or use the cache).
+        if self.on_evict is None:
+            return
+        for key, value in entries:
+            self.on_evict(key, value)
@@ -0,0 +1,664 @@
+import asyncio
+import base64
+import mimetypes
+import time
+import uuid
+from typing import Any
+from typing import AsyncGenerator
+from typing import AsyncIterator
+from typing import Callable
+from typing import Generator
+from typing import Iterable
+from typing import Iterator
+
+import openai
+from openai.types.chat import ChatCompletionMessageToolCall
+
+from .assistant import _TIMEOUT_ERRORS
+from .assistant import DEFAULT_MODEL
+from .assistant import AsyncConversation
+from .assistant import Conversation
+from .assistant import EZMessage
+from .assistant import _BaseAssistant
+from .assistant import _BaseConversation
+from .assistant import _remaining
+from .assistant import _StreamResult
+from .assistant import _TrustedAssistant
+from .batch import BatchResult
+from .batch import ask_many
+from .batch import async_ask_many
+from .polling import RunStats
+from .polling import RunTimeoutError
+from .store import ChatMessage
+from .store import ConversationStore
+from .store import MemoryStore
+from .store import truncate_history
+from .streaming import EZDelta
+from .streaming import StreamMode
+from .streaming import _StreamState
+
+
+class ChatThread:
+    """The local equivalent of a thread: an ID and the conversation's messages."""
+
+    def __init__(self, id: str, messages: list[ChatMessage]) -> None:
+        self.id = id
+        self.messages = messages
+
+
+# Where chat conversations are kept, unless the assistant is given a different store.
+DEFAULT_STORE = MemoryStore()
+
+
+def _message_id() -> str:
+    return f"msg_{uuid.uuid4().hex}"
+
+
+def _data_url(path) -> str:
+    """Read an image file into a data URL, since chat completions can't use uploads."""
+    mime_type = mimetypes.guess_type(str(path))[0] or "image/jpeg"
+    with open(path, "rb") as f:
+        data = base64.b64encode(f.read()).decode()
+    return f"data:{mime_type};base64,{data}"
+
+
+def _chat_content(message, image_url, data_url) -> str | list[dict[str, Any]]:
+    """Gather the content of a user message, as plain text if possible."""
+    if image_url is None and data_url is None:
+        return message or ""
+    content: list[dict[str, Any]] = []
+    if message is not None:
+        content.append({"type": "text", "text": message})
+    for url in (image_url, data_url):
+        if url is not None:
+            content.append({"type": "image_url", "image_url": {"url": url}})
+    return content
+
+
+class _ToolCallAccumulator:
+    """Put together the tool calls of a streamed completion from their pieces."""
+
+    def __init__(self) -> None:
+        self.calls: dict[int, dict[str, Any]] = {}
+
+    def add(self, deltas) -> None:
+        for delta in deltas or ():
+            call = self.calls.setdefault(
+                delta.index,
+                {
+                    "id": "",
+                    "type": "function",
+                    "function": {"name": "", "arguments": ""},
+                },
+            )
+            if delta.id:
+                call["id"] = delta.id
+            if delta.function is not None:
+                if delta.function.name:
+                    call["function"]["name"] += delta.function.name
+                if delta.function.arguments:
+                    call["function"]["arguments"] += delta.function.arguments
+
+    def result(self) -> list[dict[str, Any]] | None:
+        return [self.calls[i] for i in sorted(self.calls)] or None
+
+
+def _tool_call_objects(tool_calls: list[dict[str, Any]]):
+    return [ChatCompletionMessageToolCall.model_validate(c) for c in tool_calls]
+
+
+class _BaseChatConversation(_BaseConversation):
+    """The parts of a chat conversation that are the same for the sync and async APIs."""
+
+    @property
+    def _store(self) -> ConversationStore:
+        return self._assistant.store  # type: ignore[attr-defined]
+
+    def _new_thread(self) -> ChatThread:
+        return ChatThread(f"chat_{uuid.uuid4().hex}", [])
+
+    def _loaded_thread(self, id, messages: list[ChatMessage] | None) -> ChatThread:
+        if messages is None:
+            raise ValueError(f"ERROR: There is no chat conversation with ID {id}.")
+        return ChatThread(id, messages)
+
+    def _params(self, additional_instructions: str | None) -> dict[str, Any]:
+        """Build the parameters of a completion request for the conversation so far."""
+        assistant: _BaseChatAssistant = self._assistant  # type: ignore[assignment]
+        instructions = "\n\n".join(
+            filter(None, [assistant.instructions, additional_instructions])
+        )
+        messages = [{"role": "system", "content": instructions}] if instructions else []
+        history = truncate_history(self._thread.messages, assistant.max_history_tokens)
+        messages += [m.to_param() for m in history]
+
+        params: dict[str, Any] = {"model": assistant.model, "messages": messages}
+        if assistant._functions:
+            params["tools"] = [
+                fn._openai_fn  # type: ignore[attr-defined]
+                for fn in assistant._functions.values()
+            ]
+        if assistant.temperature is not None:
+            params["temperature"] = assistant.temperature
+        if assistant.response_format:
+            params["response_format"] = assistant.response_format
+        return params
+
+    def _add_tool_outputs(self, tool_outputs: list[dict[str, str]]) -> None:
+        for output in tool_outputs:
+            self._thread.messages.append(
+                ChatMessage(
+                    _message_id(),
+                    "tool",
+                    output["output"],
+                    tool_call_id=output["tool_call_id"],
+                )
+            )
+
+    def _replies(self, start: int, stats: RunStats) -> list[EZMessage]:
+        return [
+            EZMessage(m.id, m, stats=stats)  # type: ignore[arg-type]
+            for m in self._thread.messages[start:]
+            if m.role == "assistant" and m.content
+        ]
+
+
+class ChatConversation(_BaseChatConversation, Conversation):
+    """
+    A conversation over the Chat Completions API.
+
+    It works like a regular `Conversation`, but the history is kept locally, so asking
+    something takes a single request (plus one per round of function calls).
+    """
+
+    def get(self, id) -> "ChatConversation":
+        self._thread = self._loaded_thread(id, self._store.load(id))
+        return self
+
+    def create(self, lazy: bool = False) -> "ChatConversation":
+        # Creating a chat conversation doesn't make any requests, so `lazy` is moot.
+        self._thread = self._new_thread()
+        self._store.create(self._thread.id)
+        return self
+
+    def delete(self) -> None:
+        self._store.delete(self.id)
+
+    def history(self) -> Iterator[EZMessage]:
+        """Iterate over the user and assistant messages in the conversation."""
+        for message in list(self._thread.messages):
+            if message.role in ("user", "assistant") and message.content:
+                yield EZMessage(message.id, message)  # type: ignore[arg-type]
+
+    def _gather_content(self, message, image_url, image_file):
+        data_url = _data_url(image_file) if image_file is not None else None
+        return _chat_content(message, image_url, data_url)
+
+    def ask_all(
+        self,
+        message: str | None,
+        image_url: str | None = None,
+        image_file: bytes | None = None,
+        additional_instructions: str | None = None,
+        timeout: float | None = None,
+    ) -> list[EZMessage]:
+        """
+        Ask something, and return the replies, oldest first.
+
+        Asks on the same conversation take turns in the assistant's `RunQueue`, like
+        runs do, so they don't get mixed up in the history.
+        """
+        deadline = self.poll_strategy.deadline(timeout)
+        content = self._gather_content(message, image_url, image_file)
+        stats = RunStats()
+        return self._assistant.run_queue.run(
+            self.id,
+            content,
+            deadline,
+            lambda contents: self._complete(
+                contents, additional_instructions, deadline, stats
+            ),
+            key=(self._assistant.id, additional_instructions),
+        )
+
+    def _complete(
+        self,
+        contents: list,
+        additional_instructions: str | None,
+        deadline: float | None,
+        stats: RunStats,
+    ) -> list[EZMessage]:
+        """Add the user's messages, and get completions until there's a reply."""
+        thread = self._thread
+        start = len(thread.messages)
+        thread.messages.extend(ChatMessage(_message_id(), "user", c) for c in contents)
+        try:
+            while True:
+                stats.requests += 1
+                completion = self._client_for(deadline).chat.completions.create(
+                    **self._params(additional_instructions),
+                    timeout=_remaining(deadline),
+                )
+                stats._usage(completion.usage)
+                reply = completion.choices[0].message
+                tool_calls = (
+                    [call.model_dump() for call in reply.tool_calls]
+                    if reply.tool_calls
+                    else None
+                )
+                thread.messages.append(
+                    ChatMessage(completion.id, "assistant", reply.content, tool_calls)
+                )
+                if not reply.tool_calls:
+                    break
+
+                round_started = time.monotonic()
+                self._add_tool_outputs(self._call_tools(reply.tool_calls))
+                stats.tool_rounds.append(time.monotonic() - round_started)
+
+            self._store.append(thread.id, thread.messages[start:])
+        except _TIMEOUT_ERRORS as e:
+            del thread.messages[start:]
+            raise RunTimeoutError(None) from e
+        except BaseException:
+            # Don't leave half an exchange in the history.
+            del thread.messages[start:]
+            raise
+
+        stats._finish(self._assistant.stats_hook)
+        return self._replies(start, stats)
+
+    def _ask_stream_generator(
+        self,
+        message: str | None,
+        image_url: str | None,
+        image_file: bytes | None,
+        additional_instructions: str | None,
+        mode: StreamMode,
+        state: _StreamState,
+        deadline: float | None,
+    ) -> Generator[EZMessage | EZDelta | str, None, EZMessage | None]:
+        thread = self._thread
+        content = self._gather_content(message, image_url, image_file)
+        stats = state.stats
+        start = len(thread.messages)
+        thread.messages.append(ChatMessage(_message_id(), "user", content))
+        try:
+            while True:
+                stats.requests += 1
+                stream = self._client_for(deadline).chat.completions.create(
+                    **self._params(additional_instructions),
+                    stream=True,
+                    stream_options={"include_usage": True},
+                    timeout=_remaining(deadline),
+                )
+                chunks = []
+                tool_calls = _ToolCallAccumulator()
+                message_id = ""
+                with stream:
+                    for chunk in stream:
+                        if deadline is not None and time.monotonic() > deadline:
+                            raise RunTimeoutError(None)
+                        message_id = chunk.id
+                        stats._usage(chunk.usage)
+                        self._record_usage(chunk.usage)
+                        if not chunk.choices:
+                            continue
+                        delta = chunk.choices[0].delta
+                        tool_calls.add(delta.tool_calls)
+                        if not delta.content:
+                            continue
+
+                        stats._delta()
+                        state.buffer.append(delta.content)
+                        chunks.append(delta.content)
+                        if mode == "text":
+                            yield delta.content
+                        elif mode == "delta":
+                            yield EZDelta(message_id, delta.content)
+                        else:
+                            yield EZMessage(message_id, delta)  # type: ignore[arg-type]
+
+                reply = ChatMessage(
+                    message_id,
+                    "assistant",
+                    "".join(chunks) or None,
+                    tool_calls.result(),
+                )
+                thread.messages.append(reply)
+                if not reply.tool_calls:
+                    break
+
+                round_started = time.monotonic()
+                self._add_tool_outputs(
+                    self._call_tools(_tool_call_objects(reply.tool_calls))
+                )
+                stats.tool_rounds.append(time.monotonic() - round_started)
+
+            self._store.append(thread.id, thread.messages[start:])
+        except BaseException:
+            del thread.messages[start:]
+            raise
+
+        stats._finish(self._assistant.stats_hook)
+        return EZMessage(reply.id, reply, stats=stats)  # type: ignore[arg-type]
+
+
+class AsyncChatConversation(_BaseChatConversation, AsyncConversation):
+    """The asyncio version of `ChatConversation`."""
+
+    async def get(self, id) -> "AsyncChatConversation":
+        messages = await asyncio.to_thread(self._store.load, id)
+        self._thread = self._loaded_thread(id, messages)
+        return self
+
+    async def create(self, lazy: bool = False) -> "AsyncChatConversation":
+        self._thread = self._new_thread()
+        await asyncio.to_thread(self._store.create, self._thread.id)
+        return self
+
+    async def delete(self) -> None:
+        await asyncio.to_thread(self._store.delete, self.id)
+
+    async def history(self) -> AsyncIterator[EZMessage]:
+        """Iterate over the user and assistant messages in the conversation."""
+        for message in list(self._thread.messages):
+            if message.role in ("user", "assistant") and message.content:
+                yield EZMessage(message.id, message)  # type: ignore[arg-type]
+
+    async def _gather_content(self, message, image_url, image_file):
+        data_url = None
+        if image_file is not None:
+            data_url = await asyncio.to_thread(_data_url, image_file)
+        return _chat_content(message, image_url, data_url)
+
+    async def ask_all(
+        self,
+        message: str | None,
+        image_url: str | None = None,
+        image_file: bytes | None = None,
+        additional_instructions: str | None = None,
+        timeout: float | None = None,
+    ) -> list[EZMessage]:
+        """Ask something, and return the replies, oldest first."""
+        deadline = self.poll_strategy.deadline(timeout)
+        content = await self._gather_content(message, image_url, image_file)
+        stats = RunStats()
+        return await self._assistant.run_queue.arun(
+            self.id,
+            content,
+            deadline,
+            lambda contents: self._complete(
+                contents, additional_instructions, deadline, stats
+            ),
+            key=(self._assistant.id, additional_instructions),
+        )
+
+    async def _complete(
+        self,
+        contents: list,
+        additional_instructions: str | None,
+        deadline: float | None,
+        stats: RunStats,
+    ) -> list[EZMessage]:
+        """The async version of `ChatConversation._complete()`."""
+        thread = self._thread
+        start = len(thread.messages)
+        thread.messages.extend(ChatMessage(_message_id(), "user", c) for c in contents)
+        try:
+            while True:
+                stats.requests += 1
+                completion = await self._client_for(deadline).chat.completions.create(
+                    **self._params(additional_instructions),
+                    timeout=_remaining(deadline),
+                )
+                stats._usage(completion.usage)
+                reply = completion.choices[0].message
+                tool_calls = (
+                    [call.model_dump() for call in reply.tool_calls]
+                    if reply.tool_calls
+                    else None
+                )
+                thread.messages.append(
+                    ChatMessage(completion.id, "assistant", reply.content, tool_calls)
+                )
+                if not reply.tool_calls:
+                    break
+
+                round_started = time.monotonic()
+                self._add_tool_outputs(await self._call_tools(reply.tool_calls))
+                stats.tool_rounds.append(time.monotonic() - round_started)
+
+            await asyncio.to_thread(
+                self._store.append, thread.id, thread.messages[start:]
+            )
+        except _TIMEOUT_ERRORS as e:
+            del thread.messages[start:]
+            raise RunTimeoutError(None) from e
+        except BaseException:
+            del thread.messages[start:]
+            raise
+
+        stats._finish(self._assistant.stats_hook)
+        return self._replies(start, stats)
+
+    async def _ask_stream_generator(
+        self,
+        message: str | None,
+        image_url: str | None,
+        image_file: bytes | None,
+        additional_instructions: str | None,
+        mode: StreamMode,
+        state: _StreamState,
+        deadline: float | None,
+    ) -> AsyncGenerator[EZMessage | EZDelta | str | _StreamResult, None]:
+        thread = self._thread
+        content = await self._gather_content(message, image_url, image_file)
+        stats = state.stats
+        start = len(thread.messages)
+        thread.messages.append(ChatMessage(_message_id(), "user", content))
+        try:
+            while True:
+                stats.requests += 1
+                stream = await self._client_for(deadline).chat.completions.create(
+                    **self._params(additional_instructions),
+                    stream=True,
+                    stream_options={"include_usage": True},
+                    timeout=_remaining(deadline),
+                )
+                chunks = []
+                tool_calls = _ToolCallAccumulator()
+                message_id = ""
+                async with stream:
+                    async for chunk in stream:
+                        if deadline is not None and time.monotonic() > deadline:
+                            raise RunTimeoutError(None)
+                        message_id = chunk.id
+                        stats._usage(chunk.usage)
+                        self._record_usage(chunk.usage)
+                        if not chunk.choices:
+                            continue
+                        delta = chunk.choices[0].delta
+                        tool_calls.add(delta.tool_calls)
+                        if not delta.content:
+                            continue
+
+                        stats._delta()
+                        state.buffer.append(delta.content)
+                        chunks.append(delta.content)
+                        if mode == "text":
+                            yield delta.content
+                        elif mode == "delta":
+                            yield EZDelta(message_id, delta.content)
+                        else:
+                            yield EZMessage(message_id, delta)  # type: ignore[arg-type]
+
+                reply = ChatMessage(
+                    message_id,
+                    "assistant",
+                    "".join(chunks) or None,
+                    tool_calls.result(),
+                )
+                thread.messages.append(reply)
+                if not reply.tool_calls:
+                    break
+
+                round_started = time.monotonic()
+                self._add_tool_outputs(
+                    await self._call_tools(_tool_call_objects(reply.tool_calls))
+                )
+                stats.tool_rounds.append(time.monotonic() - round_started)
+
+            await asyncio.to_thread(
+                self._store.append, thread.id, thread.messages[start:]
+            )
+        except BaseException:
+            del thread.messages[start:]
+            raise
+
+        stats._finish(self._assistant.stats_hook)
+        yield _StreamResult(EZMessage(reply.id, reply, stats=stats))  # type: ignore[arg-type]
+
+
+class _BaseChatAssistant(_BaseAssistant):
+    """
+    An assistant that uses the Chat Completions API instead of the Assistants API.
+
+    Nothing is stored on OpenAI's side: the instructions, model and functions are sent
+    with every request, and conversations keep their history in `store` (by default,
+    in memory in this process). If `max_history_tokens` is given, only as much of the
+    most recent history as fits in it is sent with each request.
+    """
+
+    def __init__(
+        self,
+        instructions: str = "",
+        model: str = DEFAULT_MODEL,
+        temperature: float | None = None,
+        response_format: Any = None,
+        store: ConversationStore | None = None,
+        max_history_tokens: int | None = None,
+        **kwargs,
+    ) -> None:
+        super().__init__(**kwargs)
+        self.store = store or DEFAULT_STORE
+        self.max_history_tokens = max_history_tokens
+        # There's nothing to retrieve, but the assistant still gets an ID to go by.
+        self._assistant = _TrustedAssistant(f"chat_asst_{uuid.uuid4().hex}")
+        self.instructions = instructions
+        self.model = model
+        self.temperature = temperature
+        self.response_format = response_format
+
+
+class ChatAssistant(_BaseChatAssistant):
+    @property
+    def conversation(self) -> ChatConversation:
+        return ChatConversation(assistant=self, functions=self._functions)
+
+    @classmethod
+    def create(
+        cls,
+        name: str = "",
+        instructions: str = "",
+        model=DEFAULT_MODEL,
+        temperature: float | None = None,
+        response_format: Any = None,
+        functions: None | list[Callable] = None,
+        api_key: str = "",
+        **kwargs,
+    ) -> "ChatAssistant":
+        """
+        Create an assistant.
+
+        This takes the same arguments as `Assistant.create()`, but doesn't make any
+        requests. The name is ignored.
+        """
+        return cls(
+            instructions=instructions,
+            model=model,
+            temperature=temperature,
+            response_format=response_format,
+            functions=functions,
+            api_key=api_key,
+            **kwargs,
+        )
+
+    def delete(self):
+        pass
+
+    def ask_many(
+        self,
+        prompts: Iterable[str],
+        concurrency: int = 8,
+        retries: int = 2,
+        retry_delay: float = 1.0,
+        ordered: bool = True,
+        **kwargs,
+    ) -> Iterator[BatchResult]:
+        """Ask every prompt in its own conversation, like `Assistant.ask_many()`."""
+        return ask_many(
+            self,  # type: ignore[arg-type]
+            prompts,
+            concurrency,
+            retries,
+            retry_delay,
+            ordered,
+            kwargs,
+        )
+
+
+class AsyncChatAssistant(_BaseChatAssistant):
+    """The asyncio version of `ChatAssistant`."""
+
+    _client_class = openai.AsyncOpenAI
+
+    @property
+    def conversation(self) -> AsyncChatConversation:
+        return AsyncChatConversation(assistant=self, functions=self._functions)
+
+    @classmethod
+    async def create(
+        cls,
+        name: str = "",
+        instructions: str = "",
+        model=DEFAULT_MODEL,
+        temperature: float | None = None,
+        response_format: Any = None,
+        functions: None | list[Callable] = None,
+        api_key: str = "",
+        **kwargs,
+    ) -> "AsyncChatAssistant":
+        """Create an assistant, like `ChatAssistant.create()`."""
+        return cls(
+            instructions=instructions,
+            model=model,
+            temperature=temperature,
+            response_format=response_format,
+            functions=functions,
+            api_key=api_key,
+            **kwargs,
+        )
+
+    async def delete(self):
+        pass
+
+    def ask_many(
+        self,
+        prompts: Iterable[str],
+        concurrency: int = 8,
+        retries: int = 2,
+        retry_delay: float = 1.0,
+        ordered: bool = True,
+        **kwargs,
+    ) -> AsyncIterator[BatchResult]:
+        """The async version of `ChatAssistant.ask_many()`."""
+        return async_ask_many(
+            self,  # type: ignore[arg-type]
+            prompts,
+            concurrency,
+            retries,
+            retry_delay,
+            ordered,
+            kwargs,
+        )
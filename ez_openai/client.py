@@ -0,0 +1,300 @@
+import asyncio
+import inspect
+import os
+import threading
+import weakref
+from typing import Any
+
+import openai
+
+from .ratelimit import RateLimiter
+from .tracing import Instrumentation
+from .tracing import _atraced_call
+from .tracing import _traced_call
+from .tracing import _TracedStream
+
+
+class ClientRegistry:
+    """
+    Share OpenAI clients, and so their pools of warm connections, between assistants.
+
+    Clients are kept per API key and base URL. Sync clients are shared process-wide,
+    async ones per event loop, since their connections can't be used from another loop.
+    The connection pool settings (and optionally a custom transport) apply to every
+    client the registry creates.
+    """
+
+    def __init__(
+        self,
+        max_connections: int | None = 100,
+        max_keepalive_connections: int | None = 20,
+        keepalive_expiry: float | None = 30.0,
+        transport: Any = None,
+        async_transport: Any = None,
+    ) -> None:
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.transport = transport
+        self.async_transport = async_transport
+
+        self._clients: dict[tuple[str, str | None], openai.OpenAI] = {}
+        self._async_clients: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, dict[tuple[str, str | None], openai.AsyncOpenAI]
+        ] = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _limits(self):
+        # Use whichever Limits class the SDK's HTTP client uses, so we don't have to
+        # depend on it directly.
+        return type(openai.DEFAULT_CONNECTION_LIMITS)(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    def _new_client(
+        self,
+        client_class: type[openai.OpenAI] | type[openai.AsyncOpenAI],
+        api_key: str,
+        base_url: str | None,
+    ):
+        http_client: Any
+        if issubclass(client_class, openai.AsyncOpenAI):
+            http_client = openai.DefaultAsyncHttpxClient(
+                limits=self._limits(), transport=self.async_transport
+            )
+        else:
+            http_client = openai.DefaultHttpxClient(
+                limits=self._limits(), transport=self.transport
+            )
+        return client_class(api_key=api_key, base_url=base_url, http_client=http_client)
+
+    def get(
+        self,
+        client_class: type[openai.OpenAI] | type[openai.AsyncOpenAI],
+        api_key: str,
+        base_url: str | None = None,
+    ):
+        """Return a client of the given class, creating it if needed."""
+        key = (api_key, base_url or os.getenv("OPENAI_BASE_URL"))
+        with self._lock:
+            if not issubclass(client_class, openai.AsyncOpenAI):
+                clients: dict = self._clients
+            else:
+                try:
+                    loop = asyncio.get_running_loop()
+                except RuntimeError:
+                    # There's no loop to tie the client to, so don't share it.
+                    return self._new_client(client_class, *key)
+                clients = self._async_clients.setdefault(loop, {})
+
+            if key not in clients:
+                clients[key] = self._new_client(client_class, *key)
+            return clients[key]
+
+    def close(self) -> None:
+        """
+        Close the sync clients and forget about all the clients.
+
+        Async clients can only be closed from their event loop, so use `aclose()` in
+        each loop to close those.
+        """
+        with self._lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients.clear()
+            self._async_clients.clear()
+
+    async def aclose(self) -> None:
+        """Close the async clients this registry handed out in the running loop."""
+        with self._lock:
+            clients = self._async_clients.pop(asyncio.get_running_loop(), {})
+        for client in clients.values():
+            await client.close()
+
+
+DEFAULT_CLIENT_REGISTRY = ClientRegistry()
+
+
+class _ClientProxy:
+    """
+    Wrap an OpenAI client (or one of its resources) to intercept its API calls.
+
+    Resources like `client.beta.threads` are wrapped in turn, and their methods are
+    replaced by ones that call `RateLimiter.call()` with the dotted name of the
+    endpoint, e.g. `beta.threads.runs.retrieve`, and/or report the call to the
+    instrumentation. Stream methods return stand-ins for their stream managers, which do
+    both when the stream is entered, since that's when the request is made. Where the
+    SDK offers it, rate-limited calls are made through `with_raw_response`, so the
+    limiter can see the response headers.
+    """
+
+    def __init__(
+        self,
+        target: Any,
+        limiter: RateLimiter | None,
+        instrumentation: Instrumentation | None = None,
+        path: str = "",
+        is_async: bool | None = None,
+        max_retries: int = 0,
+    ) -> None:
+        if is_async is None:
+            # The SDK's async methods aren't all coroutine functions, so go by the
+            # client instead.
+            is_async = isinstance(target, openai.AsyncOpenAI)
+            if limiter is not None and hasattr(target, "with_options"):
+                # The limiter retries 429s itself, so it sees all of them and can hold
+                # every caller back, rather than the SDK retrying them behind its back.
+                # It retries the other errors as often as the client would have.
+                max_retries = target.max_retries
+                target = target.with_options(max_retries=0)
+        self._target = target
+        self._limiter = limiter
+        self._instrumentation = instrumentation
+        self._path = path
+        self._is_async = is_async
+        self._max_retries = max_retries
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._target, name)
+        if name.startswith("_") or name == "with_raw_response":
+            return attr
+
+        if inspect.ismethod(attr):
+            return self._wrap(name, attr)
+        if hasattr(attr, "with_raw_response"):
+            return _ClientProxy(
+                attr,
+                self._limiter,
+                self._instrumentation,
+                f"{self._path}{name}.",
+                self._is_async,
+                self._max_retries,
+            )
+        return attr
+
+    def with_options(self, **options: Any) -> "_ClientProxy":
+        """Return a proxy for a copy of the client with different options."""
+        max_retries = options.get("max_retries", self._max_retries)
+        if self._limiter is not None:
+            options["max_retries"] = 0
+        return _ClientProxy(
+            self._target.with_options(**options),
+            self._limiter,
+            self._instrumentation,
+            self._path,
+            self._is_async,
+            max_retries,
+        )
+
+    def _wrap(self, name: str, method):
+        endpoint = f"{self._path}{name}"
+        # The async client's stream methods return a stream manager for `async with`,
+        # rather than a coroutine.
+        is_stream = name.endswith("stream")
+        is_async = self._is_async and not is_stream
+        call = method
+
+        limiter = self._limiter
+        max_retries = self._max_retries
+        if limiter is not None and is_stream:
+
+            def call(*args, **kwargs):
+                return _LimitedStream(
+                    limiter, endpoint, method, args, kwargs, max_retries
+                )
+
+        elif limiter is not None:
+            raw_method = getattr(
+                getattr(self._target, "with_raw_response", None), name, None
+            )
+            if is_async:
+
+                async def call(*args, **kwargs):
+                    return await limiter.acall(
+                        endpoint, method, raw_method, args, kwargs, max_retries
+                    )
+
+            else:
+
+                def call(*args, **kwargs):
+                    return limiter.call(
+                        endpoint, method, raw_method, args, kwargs, max_retries
+                    )
+
+        instrumentation = self._instrumentation
+        if instrumentation is None:
+            return call
+
+        if is_stream:
+
+            def traced_stream(*args, **kwargs):
+                return _TracedStream(
+                    instrumentation, endpoint, call(*args, **kwargs), args, kwargs
+                )
+
+            return traced_stream
+
+        if is_async:
+
+            async def traced_async_call(*args, **kwargs):
+                return await _atraced_call(
+                    instrumentation, endpoint, call, args, kwargs
+                )
+
+            return traced_async_call
+
+        def traced_call(*args, **kwargs):
+            return _traced_call(instrumentation, endpoint, call, args, kwargs)
+
+        return traced_call
+
+
+class _LimitedStream:
+    """
+    Stands in for the stream manager a stream method returns, for a rate limiter.
+
+    The manager only makes its request when it's entered, so that's when this waits for
+    the limiter, and retries the request if it fails. On async clients, the waiting
+    happens on the event loop, with `async with`.
+    """
+
+    def __init__(
+        self,
+        limiter: RateLimiter,
+        endpoint: str,
+        method,
+        args,
+        kwargs,
+        max_retries: int,
+    ) -> None:
+        self._limiter = limiter
+        self._endpoint = endpoint
+        self._method = method
+        self._args = args
+        self._kwargs = kwargs
+        self._max_retries = max_retries
+        self._manager: Any = None
+
+    def _open(self):
+        self._manager = self._method(*self._args, **self._kwargs)
+        return self._manager.__enter__()
+
+    async def _aopen(self):
+        self._manager = self._method(*self._args, **self._kwargs)
+        return await self._manager.__aenter__()
+
+    def __enter__(self):
+        return self._limiter._attempt(self._endpoint, self._open, self._max_retries)
+
+    def __exit__(self, *exc_info):
+        return self._manager.__exit__(*exc_info)
+
+    async def __aenter__(self):
+        return await self._limiter._aattempt(
+            self._endpoint, self._aopen, self._max_retries
+        )
+
+    async def __aexit__(self, *exc_info):
+        return await self._manager.__aexit__(*exc_info)
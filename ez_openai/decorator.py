@@ -1,32 +1,50 @@
-import enum
 import inspect
+import typing
 from functools import wraps
-from typing import Any
 
+from .memo import ToolCache
+from .schema import ArgumentDecoder
+from .schema import _canonical
+from .schema import _schema
+from .tools import DEFAULT_PROCESS_POOL
+from .tools import ProcessToolPool
 
-def _openai_type_for_python_type(param) -> dict[str, Any]:
-    type_map = {
-        "bool": "boolean",
-        "int": "integer",
-        "str": "string",
-    }
 
-    type_dict: dict[str, Any] = {}
-    if isinstance(param.annotation, enum.EnumMeta):
-        type_dict["type"] = "string"
-        type_dict["enum"] = [x.name for x in param.annotation]  # type: ignore
-    else:
-        type_dict["type"] = type_map.get(
-            param.annotation.__name__, param.annotation.__name__
-        )
-    return type_dict
+def openai_function(
+    descriptions=dict[str, str],
+    cache: ToolCache | bool | None = None,
+    executor: ProcessToolPool | str | None = None,
+):
+    """
+    Make a function callable by the AI.
 
+    `descriptions` describes each of the function's parameters to the AI. If the
+    function is a pure lookup, pass `cache=True` (or a `ToolCache`) to reuse its
+    results for identical calls. If it's CPU-heavy, pass `executor="process"` (or a
+    `ProcessToolPool`) to have it run in a worker process whenever it's called.
+    """
+    if cache is True:
+        cache = ToolCache()
+    if executor == "process":
+        executor = DEFAULT_PROCESS_POOL
+    elif executor is not None and not isinstance(executor, ProcessToolPool):
+        raise ValueError('ERROR: executor must be "process" or a ProcessToolPool.')
 
-def openai_function(descriptions=dict[str, str]):
     def outer(f):
+        if executor is not None and "<locals>" in f.__qualname__:
+            raise ValueError(
+                f"ERROR: {f.__name__} must be defined at the top level of a module to "
+                "run in a process."
+            )
+
         arguments = {}
         required_arguments = []
+        annotations = {}
         sig = inspect.signature(f)
+        try:
+            hints = typing.get_type_hints(f)
+        except (NameError, TypeError):
+            hints = {}
 
         for param in sig.parameters.values():
             if param.annotation == inspect.Parameter.empty:
@@ -37,7 +55,8 @@ def openai_function(descriptions=dict[str, str]):
                     f"Parameter has no description: {f.__name__}({param.name})"
                 )
 
-            arguments[param.name] = _openai_type_for_python_type(param)
+            annotations[param.name] = hints.get(param.name, param.annotation)
+            arguments[param.name] = _schema(annotations[param.name])
             if param.name in descriptions:
                 arguments[param.name]["description"] = descriptions[param.name]
             if param.default == inspect.Parameter.empty:
@@ -56,11 +75,53 @@ def openai_function(descriptions=dict[str, str]):
             },
         }
 
-        @wraps(f)
-        def wrapper(*args, **kwargs):
-            return f(*args, **kwargs)
+        def cache_key(args, kwargs):
+            bound = sig.bind(*args, **kwargs)
+            bound.apply_defaults()
+            return f.__name__, _canonical(bound.arguments)
+
+        call = f
+        if executor is not None:
+            # The worker process calls `f` itself, by looking up the wrapper.
+            if inspect.iscoroutinefunction(f):
+
+                async def call(*args, **kwargs):
+                    return await executor.acall(wrapper, args, kwargs)
+
+            else:
+
+                def call(*args, **kwargs):
+                    return executor.call(wrapper, args, kwargs)
+
+        if not cache:
+            if inspect.iscoroutinefunction(f):
+
+                @wraps(f)
+                async def wrapper(*args, **kwargs):
+                    return await call(*args, **kwargs)
+
+            else:
+
+                @wraps(f)
+                def wrapper(*args, **kwargs):
+                    return call(*args, **kwargs)
+
+        elif inspect.iscoroutinefunction(f):
+
+            @wraps(f)
+            async def wrapper(*args, **kwargs):
+                return await cache.acall(cache_key(args, kwargs), call, args, kwargs)
+
+        else:
+
+            @wraps(f)
+            def wrapper(*args, **kwargs):
+                return cache.call(cache_key(args, kwargs), call, args, kwargs)
 
         wrapper._openai_fn = fn_dict
+        wrapper._openai_decoder = ArgumentDecoder(annotations, required_arguments)
+        wrapper._openai_cache = cache or None
+        wrapper._openai_cache_key = cache_key
         return wrapper
 
     return outer
@@ -0,0 +1,52 @@
+import threading
+from typing import Any
+
+from .cache import TTLCache
+
+# How many messages to fetch per request when paging through a thread.
+PAGE_SIZE = 100
+
+
+class ThreadHistory:
+    """
+    The messages of a thread that we've already fetched, oldest first.
+
+    Only messages that are done changing are kept, and only as an unbroken run from the
+    start of the thread, so whatever isn't cached can always be fetched with a single
+    `after=last_id` cursor.
+    """
+
+    def __init__(self) -> None:
+        self.messages: list[Any] = []
+        self._lock = threading.Lock()
+
+    @property
+    def last_id(self) -> str | None:
+        return self.messages[-1].id if self.messages else None
+
+    def snapshot(self) -> list[Any]:
+        with self._lock:
+            return list(self.messages)
+
+    def add(self, message: Any, previous_id: str | None) -> None:
+        """Cache a message, if it directly follows the ones we have and won't change."""
+        if getattr(message, "status", "completed") == "in_progress":
+            return
+        with self._lock:
+            if self.last_id == previous_id:
+                self.messages.append(message)
+
+
+# The histories of recently-read threads, by thread ID.
+HISTORY_CACHE: TTLCache[ThreadHistory] = TTLCache(maxsize=256)
+_lock = threading.Lock()
+
+
+def thread_history(thread_id: str) -> ThreadHistory:
+    """Return the cached history for a thread, creating an empty one if needed."""
+    with _lock:
+        history = HISTORY_CACHE.get(thread_id)
+        if history is None:
+            history = ThreadHistory()
+            HISTORY_CACHE.set(thread_id, history)
+        return history
@@ -0,0 +1,105 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any
+from typing import Callable
+from typing import Hashable
+
+from .cache import _MISSING
+from .cache import TTLCache
+
+
+class ToolCache:
+    """
+    Remember the results of functions the AI calls, for functions that are pure lookups.
+
+    Pass it (or `True`, for the defaults) as `cache=` to `openai_function()`. Results are
+    kept for `ttl` seconds, up to `maxsize` of them, keyed on the function's name and its
+    arguments, so the same instance can be shared by several functions. Exceptions are
+    never cached.
+
+    With `single_flight`, if a call is made while an identical one is still running
+    (e.g. from another conversation), it waits for that one's result instead of running
+    the function again.
+
+    `hits` and `misses` count how many calls were answered from the cache (or by
+    waiting for an identical call) and how many had to run the function.
+    """
+
+    def __init__(
+        self, ttl: float | None = 300, maxsize: int = 1024, single_flight: bool = True
+    ) -> None:
+        self.single_flight = single_flight
+        self.hits = 0
+        self.misses = 0
+        self._results: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._in_flight: dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, key: Hashable) -> Any:
+        """Return the cached result for a call, or `_MISSING` if there isn't one."""
+        value = self._results.get(key, _MISSING)
+        if value is not _MISSING:
+            with self._lock:
+                self.hits += 1
+        return value
+
+    def _start(self, key: Hashable) -> tuple[Future, bool]:
+        """Return the future for a call, and whether the caller should make the call."""
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.hits += 1
+                return future, False
+            self.misses += 1
+            future = Future()
+            if self.single_flight:
+                self._in_flight[key] = future
+            return future, True
+
+    def _finish(self, key: Hashable, future: Future, value: Any, error) -> None:
+        if error is None:
+            self._results.set(key, value)
+            future.set_result(value)
+        else:
+            future.set_exception(error)
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+
+    def call(self, key: Hashable, function: Callable, args, kwargs) -> Any:
+        value = self.lookup(key)
+        if value is not _MISSING:
+            return value
+
+        future, leader = self._start(key)
+        if not leader:
+            return future.result()
+        try:
+            value = function(*args, **kwargs)
+        except BaseException as e:
+            self._finish(key, future, None, e)
+            raise
+        self._finish(key, future, value, None)
+        return value
+
+    async def acall(self, key: Hashable, function: Callable, args, kwargs) -> Any:
+        value = self.lookup(key)
+        if value is not _MISSING:
+            return value
+
+        future, leader = self._start(key)
+        if not leader:
+            return await asyncio.wrap_future(future)
+        try:
+            value = await function(*args, **kwargs)
+        except BaseException as e:
+            self._finish(key, future, None, e)
+            raise
+        self._finish(key, future, value, None)
+        return value
+
+    def clear(self) -> None:
+        self._results.clear()
+        with self._lock:
+            self.hits = self.misses = 0
@@ -0,0 +1,163 @@
+import random
+import time
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Any
+from typing import Callable
+from typing import Iterator
+
+
+@dataclass
+class RunStats:
+    """
+    Statistics about a single `ask()` or `ask_stream()` call.
+
+    All times are in seconds, measured from when the call started. `queue_time` is how
+    long the run waited before it started (as far as we could see, so it's only as
+    precise as the polling), and `tool_rounds` has how long each round of calling the
+    functions and submitting their outputs took. `requests` is how many API requests
+    the call made (including polls, but not uploads). The token counts come from the
+    run, and the rest of the fields are only filled in when streaming.
+    """
+
+    requests: int = 0
+    polls: int = 0
+    poll_wait: float = 0.0
+    queue_time: float | None = None
+    tool_rounds: list[float] = field(default_factory=list)
+    duration: float | None = None
+    prompt_tokens: int | None = None
+    completion_tokens: int | None = None
+    total_tokens: int | None = None
+    time_to_first_token: float | None = None
+    deltas: int = 0
+    max_delta_gap: float = 0.0
+    started: float = field(default_factory=time.monotonic, repr=False)
+    _last_delta: float = field(default=0.0, repr=False)
+
+    def _run_started(self) -> None:
+        if self.queue_time is None:
+            self.queue_time = time.monotonic() - self.started
+
+    def _delta(self) -> None:
+        now = time.monotonic()
+        if self.deltas:
+            self.max_delta_gap = max(self.max_delta_gap, now - self._last_delta)
+        else:
+            self.time_to_first_token = now - self.started
+        self._last_delta = now
+        self.deltas += 1
+
+    def _usage(self, usage: Any) -> None:
+        # Add the usage up, for when a call takes several requests.
+        if usage is None:
+            return
+        self.prompt_tokens = (self.prompt_tokens or 0) + usage.prompt_tokens
+        self.completion_tokens = (self.completion_tokens or 0) + usage.completion_tokens
+        self.total_tokens = (self.total_tokens or 0) + usage.total_tokens
+
+    def _finish(self, hook: "StatsHook | None") -> None:
+        self.duration = time.monotonic() - self.started
+        if hook is not None:
+            hook(self)
+
+
+# The statuses of a run that is still going, and that we should keep waiting on.
+ACTIVE_STATUSES = ("queued", "in_progress", "cancelling")
+
+
+class RunTimeoutError(TimeoutError):
+    """
+    Raised when a run doesn't finish before its deadline.
+
+    By the time this is raised, the run has been cancelled, so it doesn't keep going
+    (and costing tokens) in the background.
+    """
+
+    def __init__(self, run_id: str | None) -> None:
+        self.run_id = run_id
+        run = f"Run {run_id}" if run_id else "The run"
+        super().__init__(f"{run} did not finish in time.")
+
+
+class RunError(ValueError):
+    """Raised when a run ends without completing, e.g. because it failed or expired."""
+
+    def __init__(self, run: Any) -> None:
+        self.run_id = run.id
+        self.status = run.status
+        reason = None
+        if getattr(run, "last_error", None) is not None:
+            reason = run.last_error.message
+        elif getattr(run, "incomplete_details", None) is not None:
+            reason = run.incomplete_details.reason
+        message = f"ERROR: Run {run.id} is {run.status}"
+        super().__init__(f"{message}: {reason}" if reason else f"{message}.")
+
+
+# Called with the stats of every completed run, e.g. to export them as metrics.
+StatsHook = Callable[[RunStats], None]
+
+
+class PollStrategy:
+    """
+    Decide how long to wait between checks on a run's status.
+
+    The first few probes are quick, since short answers tend to be done almost
+    immediately, and after that the interval backs off exponentially (with some jitter,
+    so many conversations don't poll in lockstep) up to `max_interval`. If `timeout` is
+    set, a run that takes longer than that many seconds in total is cancelled, and
+    `RunTimeoutError` is raised.
+    """
+
+    def __init__(
+        self,
+        initial: float = 0.2,
+        fast_polls: int = 3,
+        factor: float = 1.5,
+        max_interval: float = 2.0,
+        jitter: float = 0.1,
+        timeout: float | None = None,
+    ) -> None:
+        self.initial = initial
+        self.fast_polls = fast_polls
+        self.factor = factor
+        self.max_interval = max_interval
+        self.jitter = jitter
+        self.timeout = timeout
+
+    def deadline(self, timeout: float | None = None) -> float | None:
+        """
+        Return the monotonic time after which we should give up, if any.
+
+        A `timeout` given for a single call takes precedence over the strategy's.
+        """
+        if timeout is None:
+            timeout = self.timeout
+        if timeout is None:
+            return None
+        return time.monotonic() + timeout
+
+    def delays(self, deadline: float | None = None) -> Iterator[float]:
+        """
+        Yield the successive delays to sleep for before each poll.
+
+        The iterator stops when the deadline has passed.
+        """
+        delay = self.initial
+        polls = 0
+        while True:
+            if polls >= self.fast_polls:
+                delay = min(delay * self.factor, self.max_interval)
+            polls += 1
+
+            wait = delay * (1 + random.uniform(-self.jitter, self.jitter))
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                wait = min(wait, remaining)
+            yield max(wait, 0.0)
+
+
+DEFAULT_POLL_STRATEGY = PollStrategy()
@@ -0,0 +1,208 @@
+import asyncio
+import atexit
+import threading
+import time
+from collections import deque
+from typing import Any
+
+import openai
+
+
+class WarmThreadPool:
+    """
+    Keep some empty threads ready, so creating a conversation doesn't have to wait.
+
+    Whenever the number of ready threads drops to `low_watermark`, the pool is topped
+    back up to `size` in the background (on a thread for sync clients, or in a task for
+    async ones). Threads are handed out oldest first, and ones that have waited longer
+    than `ttl` seconds are deleted rather than handed out. When the pool is closed (or
+    the program exits, for sync clients), the threads it still holds are deleted.
+
+    Threads belong to an API key/project, so don't share a pool between those.
+    """
+
+    def __init__(
+        self,
+        size: int = 8,
+        low_watermark: int | None = None,
+        ttl: float | None = 24 * 60 * 60,
+    ) -> None:
+        if low_watermark is None:
+            low_watermark = size // 2
+        if not 0 <= low_watermark < size:
+            raise ValueError(
+                "ERROR: low_watermark must be at least zero and less than size."
+            )
+        self.size = size
+        self.low_watermark = low_watermark
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._threads: deque[tuple[float, Any]] = deque()
+        self._client: Any = None
+        self._refilling = False
+        self._closed = False
+        self._lock = threading.Lock()
+        self._task: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return len(self._threads)
+
+    def _take(self, client: Any, take: bool = True) -> tuple[Any, list[Any], bool]:
+        """
+        Take a thread, if there's one ready, under the lock.
+
+        Also return the expired threads that were dropped, and whether the caller
+        should start refilling the pool.
+        """
+        now = time.monotonic()
+        expired = []
+        thread = None
+        with self._lock:
+            if self._client is None:
+                self._client = client
+            while self._threads and (
+                self.ttl is not None and now - self._threads[0][0] > self.ttl
+            ):
+                expired.append(self._threads.popleft()[1])
+            if take:
+                if self._threads:
+                    thread = self._threads.popleft()[1]
+                    self.hits += 1
+                else:
+                    self.misses += 1
+            refill = (
+                not self._refilling
+                and not self._closed
+                and len(self._threads) <= self.low_watermark
+            )
+            if refill:
+                self._refilling = True
+        return thread, expired, refill
+
+    def _needs_thread(self) -> bool:
+        with self._lock:
+            if self._closed or len(self._threads) >= self.size:
+                self._refilling = False
+                return False
+            return True
+
+    def _add(self, thread: Any) -> bool:
+        with self._lock:
+            if not self._closed:
+                self._threads.append((time.monotonic(), thread))
+                return True
+        return False
+
+    def _stop_refilling(self) -> None:
+        with self._lock:
+            self._refilling = False
+
+    def fill(self, client: Any) -> None:
+        """Start filling the pool in the background, with a sync client."""
+        self._acquire(client, take=False)
+
+    def acquire(self, client: Any) -> Any:
+        """Return a ready thread, or None if there aren't any right now."""
+        return self._acquire(client)
+
+    def _acquire(self, client: Any, take: bool = True) -> Any:
+        if self._client is None:
+            atexit.register(self.close)
+        thread, expired, refill = self._take(client, take)
+        if expired or refill:
+            threading.Thread(
+                target=self._maintain,
+                args=(expired, refill),
+                name="ez_openai_thread_pool",
+                daemon=True,
+            ).start()
+        return thread
+
+    def _maintain(self, expired: list[Any], refill: bool) -> None:
+        for thread in expired:
+            self._delete(thread.id)
+        if not refill:
+            return
+        try:
+            while self._needs_thread():
+                thread = self._client.beta.threads.create()
+                if not self._add(thread):
+                    # The pool was closed in the meantime.
+                    self._delete(thread.id)
+                    return
+        except openai.APIError:
+            # We'll try again the next time a thread is taken.
+            self._stop_refilling()
+
+    def _delete(self, thread_id: str) -> None:
+        try:
+            self._client.beta.threads.delete(thread_id)
+        except openai.APIError:
+            pass
+
+    def close(self) -> None:
+        """Delete the threads that weren't used, and stop refilling the pool."""
+        with self._lock:
+            self._closed = True
+            threads = [thread for _, thread in self._threads]
+            self._threads.clear()
+        for thread in threads:
+            self._delete(thread.id)
+
+    def afill(self, client: Any) -> None:
+        """
+        Start filling the pool in the background, with an async client.
+
+        Outside an event loop, this does nothing, and the pool is filled when it's
+        first used.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._aacquire(client, take=False)
+
+    async def aacquire(self, client: Any) -> Any:
+        """The async version of `acquire()`."""
+        return self._aacquire(client)
+
+    def _aacquire(self, client: Any, take: bool = True) -> Any:
+        thread, expired, refill = self._take(client, take)
+        if expired or refill:
+            # Keep a reference to the task, so it doesn't get garbage-collected.
+            self._task = asyncio.get_running_loop().create_task(
+                self._amaintain(expired, refill)
+            )
+        return thread
+
+    async def _amaintain(self, expired: list[Any], refill: bool) -> None:
+        for thread in expired:
+            await self._adelete(thread.id)
+        if not refill:
+            return
+        try:
+            while self._needs_thread():
+                thread = await self._client.beta.threads.create()
+                if not self._add(thread):
+                    await self._adelete(thread.id)
+                    return
+        except openai.APIError:
+            self._stop_refilling()
+
+    async def _adelete(self, thread_id: str) -> None:
+        try:
+            await self._client.beta.threads.delete(thread_id)
+        except openai.APIError:
+            pass
+
+    async def aclose(self) -> None:
+        """The async version of `close()`."""
+        with self._lock:
+            self._closed = True
+            threads = [thread for _, thread in self._threads]
+            self._threads.clear()
+        if self._task is not None:
+            await asyncio.gather(self._task, return_exceptions=True)
+        for thread in threads:
+            await self._adelete(thread.id)
@@ -0,0 +1,304 @@
+import asyncio
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any
+from typing import Callable
+from typing import Mapping
+
+import openai
+
+# The calls that run the model, and so use up tokens.
+RUN_ENDPOINTS = (
+    "chat.completions.create",
+    "beta.threads.create_and_run",
+    "beta.threads.create_and_run_stream",
+    "beta.threads.runs.create",
+    "beta.threads.runs.stream",
+    "beta.threads.runs.submit_tool_outputs",
+    "beta.threads.runs.submit_tool_outputs_stream",
+)
+
+
+def _parse_duration(value: str | None) -> float | None:
+    """Parse durations like `1s`, `6m0s` or `20ms`, as used in rate limit headers."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    units = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|s|m|h)", value)
+    if not parts:
+        return None
+    return sum(float(number) * units[unit] for number, unit in parts)
+
+
+def _header(headers: Mapping[str, str], name: str) -> float | None:
+    try:
+        return float(headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class _Bucket:
+    """A token bucket that refills continuously, up to `capacity` per minute."""
+
+    def __init__(self, per_minute: float) -> None:
+        self.capacity = per_minute
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        rate = self.capacity / 60
+        self.level = min(self.capacity, self.level + (now - self.updated) * rate)
+        self.updated = now
+
+    def wait_time(self, required: float, now: float) -> float:
+        """Return how long to wait until the bucket holds at least `required`."""
+        self.refill(now)
+        if self.level >= required:
+            return 0.0
+        return (required - self.level) / (self.capacity / 60)
+
+
+@dataclass
+class RateLimiterStats:
+    """Counters for how much a `RateLimiter` has had to hold callers back."""
+
+    calls: int = 0
+    throttled_calls: int = 0
+    throttled_seconds: float = 0.0
+    rate_limit_errors: int = 0
+
+
+class RateLimiter:
+    """
+    A client-side rate limiter for all the API calls the library makes.
+
+    It keeps a token bucket for requests per minute and one for tokens per minute, and
+    makes callers wait (rather than fail) until there's room in both. Since the number
+    of tokens a run uses isn't known until it finishes, runs only need the token bucket
+    to not be empty when they start, and their actual usage is taken out of it when they
+    complete.
+
+    The buckets are adjusted from the `x-ratelimit-*` headers the API returns, and when
+    the API responds with a 429 anyway, every caller is paused for as long as the API
+    asks before the call is retried, up to `max_retries` times. The SDK's own retries
+    are turned off for clients that use a limiter, so the limiter sees every 429, and
+    it retries the connection errors and server errors the SDK would have, as many
+    times as the client's `max_retries` allows. Streams are held back and retried when
+    they're entered, which is when their request is made.
+
+    Pass the same instance to several assistants to have them share the limits.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float | None = None,
+        tokens_per_minute: float | None = None,
+        max_retries: int = 5,
+    ) -> None:
+        self.max_retries = max_retries
+        self.stats = RateLimiterStats()
+        self._requests = _Bucket(requests_per_minute) if requests_per_minute else None
+        self._tokens = _Bucket(tokens_per_minute) if tokens_per_minute else None
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self, uses_tokens: bool) -> float:
+        """
+        Try to take a request from the buckets.
+
+        Returns 0 if that succeeded, otherwise how long to wait before trying again.
+        """
+        with self._lock:
+            now = time.monotonic()
+            wait = self._paused_until - now
+            if self._requests is not None:
+                wait = max(wait, self._requests.wait_time(1, now))
+            if uses_tokens and self._tokens is not None:
+                # Only wait until the bucket is out of debt, since we don't know how
+                # many tokens this run will need.
+                wait = max(wait, self._tokens.wait_time(1, now))
+            if wait > 0:
+                return wait
+
+            if self._requests is not None:
+                self._requests.level -= 1
+            self.stats.calls += 1
+            return 0.0
+
+    def acquire(self, uses_tokens: bool = False) -> float:
+        """Block until a request can be made, and return how long we waited."""
+        waited = 0.0
+        while wait := self._reserve(uses_tokens):
+            time.sleep(wait)
+            waited += wait
+        self._record_wait(waited)
+        return waited
+
+    async def aacquire(self, uses_tokens: bool = False) -> float:
+        """Wait until a request can be made, and return how long we waited."""
+        waited = 0.0
+        while wait := self._reserve(uses_tokens):
+            await asyncio.sleep(wait)
+            waited += wait
+        self._record_wait(waited)
+        return waited
+
+    def _record_wait(self, waited: float) -> None:
+        if waited:
+            with self._lock:
+                self.stats.throttled_calls += 1
+                self.stats.throttled_seconds += waited
+
+    def update(self, headers: Mapping[str, str]) -> None:
+        """Adjust the buckets to what the API says our limits are."""
+        with self._lock:
+            now = time.monotonic()
+            for bucket, kind in (
+                (self._requests, "requests"),
+                (self._tokens, "tokens"),
+            ):
+                if bucket is None:
+                    continue
+                limit = _header(headers, f"x-ratelimit-limit-{kind}")
+                if limit:
+                    bucket.capacity = limit
+                remaining = _header(headers, f"x-ratelimit-remaining-{kind}")
+                if remaining is not None:
+                    bucket.refill(now)
+                    bucket.level = min(bucket.level, remaining)
+
+    def record_usage(self, tokens: int) -> None:
+        """Take the tokens a finished run used out of the token bucket."""
+        if self._tokens is None:
+            return
+        with self._lock:
+            self._tokens.refill(time.monotonic())
+            self._tokens.level -= tokens
+
+    def pause(self, headers: Mapping[str, str], attempt: int) -> None:
+        """Hold back every caller after the API has told us we're going too fast."""
+        delay = (_header(headers, "retry-after-ms") or 0) / 1000
+        if not delay:
+            delay = _parse_duration(headers.get("retry-after")) or 0.0
+        if not delay:
+            delay = max(
+                _parse_duration(headers.get("x-ratelimit-reset-requests")) or 0.0,
+                _parse_duration(headers.get("x-ratelimit-reset-tokens")) or 0.0,
+            )
+        if not delay:
+            delay = min(0.5 * 2**attempt, 30)
+
+        with self._lock:
+            self.stats.rate_limit_errors += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+
+    def _finish(self, endpoint: str, response: Any, raw: bool) -> Any:
+        if raw:
+            self.update(response.headers)
+            response = response.parse()
+        usage = getattr(response, "usage", None)
+        if usage is not None and (
+            endpoint.startswith("beta.threads") or endpoint in RUN_ENDPOINTS
+        ):
+            self.record_usage(usage.total_tokens)
+        return response
+
+    def _attempt(self, endpoint: str, request: Callable, error_retries: int) -> Any:
+        """Make a request once the limits allow, retrying it if it fails."""
+        attempt = 0
+        errors = 0
+        while True:
+            self.acquire(uses_tokens=endpoint in RUN_ENDPOINTS)
+            try:
+                return request()
+            except openai.RateLimitError as e:
+                if attempt >= self.max_retries:
+                    raise
+                self.pause(e.response.headers, attempt)
+                attempt += 1
+            except openai.APIError as e:
+                if errors >= error_retries or not _retryable(e):
+                    raise
+                time.sleep(_backoff(errors))
+                errors += 1
+
+    async def _aattempt(
+        self, endpoint: str, request: Callable, error_retries: int
+    ) -> Any:
+        """The async version of `_attempt()`."""
+        attempt = 0
+        errors = 0
+        while True:
+            await self.aacquire(uses_tokens=endpoint in RUN_ENDPOINTS)
+            try:
+                return await request()
+            except openai.RateLimitError as e:
+                if attempt >= self.max_retries:
+                    raise
+                self.pause(e.response.headers, attempt)
+                attempt += 1
+            except openai.APIError as e:
+                if errors >= error_retries or not _retryable(e):
+                    raise
+                await asyncio.sleep(_backoff(errors))
+                errors += 1
+
+    def call(
+        self,
+        endpoint: str,
+        function: Callable,
+        raw_function: Callable | None,
+        args,
+        kwargs,
+        error_retries: int = 0,
+    ) -> Any:
+        """
+        Make an API call, waiting for the limits and retrying on 429s.
+
+        Since the SDK's retries are off, other errors that it would retry are retried
+        here, up to `error_retries` times.
+        """
+        response = self._attempt(
+            endpoint, lambda: (raw_function or function)(*args, **kwargs), error_retries
+        )
+        return self._finish(endpoint, response, raw_function is not None)
+
+    async def acall(
+        self,
+        endpoint: str,
+        function: Callable,
+        raw_function: Callable | None,
+        args,
+        kwargs,
+        error_retries: int = 0,
+    ) -> Any:
+        """The async version of `call()`."""
+        response = await self._aattempt(
+            endpoint, lambda: (raw_function or function)(*args, **kwargs), error_retries
+        )
+        return self._finish(endpoint, response, raw_function is not None)
+
+
+def _retryable(e: openai.APIError) -> bool:
+    """Whether the SDK would have retried a failed request, other than for a 429."""
+    if isinstance(e, openai.APIConnectionError):
+        # This includes timeouts.
+        return True
+    if not isinstance(e, openai.APIStatusError):
+        return False
+    should_retry = e.response.headers.get("x-should-retry")
+    if should_retry in ("true", "false"):
+        return should_retry == "true"
+    return e.status_code in (408, 409) or e.status_code >= 500
+
+
+def _backoff(retry: int) -> float:
+    """How long to wait before retrying a failed request, like the SDK does."""
+    return min(0.5 * 2**retry, 8.0)
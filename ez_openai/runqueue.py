@@ -0,0 +1,327 @@
+import abc
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from contextlib import contextmanager
+from typing import Any
+from typing import AsyncIterator
+from typing import Awaitable
+from typing import Callable
+from typing import Iterator
+
+from .polling import RunTimeoutError
+
+
+def _timeout(deadline: float | None) -> float | None:
+    if deadline is None:
+        return None
+    return max(deadline - time.monotonic(), 0.0)
+
+
+class ThreadLock(abc.ABC):
+    """
+    A lock on a thread that's shared between processes, e.g. one kept in Redis.
+
+    `RunQueue` already makes runs on the same thread take turns within a process, and
+    only takes this lock once it's a run's turn, so each process holds it at most once
+    per thread at a time. `acquire()` should return False if it couldn't get the lock
+    within `timeout` seconds (or wait forever, if that's None). By default, the async
+    versions call the sync ones in a worker thread.
+    """
+
+    @abc.abstractmethod
+    def acquire(self, thread_id: str, timeout: float | None) -> bool: ...
+
+    @abc.abstractmethod
+    def release(self, thread_id: str) -> None: ...
+
+    async def aacquire(self, thread_id: str, timeout: float | None) -> bool:
+        return await asyncio.to_thread(self.acquire, thread_id, timeout)
+
+    async def arelease(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.release, thread_id)
+
+
+class _Ticket:
+    """One caller's place in a thread's queue, which any thread can wake it from."""
+
+    def __init__(self, content: Any, async_: bool) -> None:
+        self.content = content
+        self.batch: _Batch
+        self.woken = False
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._event: threading.Event | None = None
+        self._future: asyncio.Future | None = None
+        if async_:
+            self._loop = asyncio.get_running_loop()
+            self._future = self._loop.create_future()
+        else:
+            self._event = threading.Event()
+
+    def wake(self) -> None:
+        self.woken = True
+        if self._event is not None:
+            self._event.set()
+        else:
+            self._loop.call_soon_threadsafe(self._set_result)  # type: ignore[union-attr]
+
+    def _set_result(self) -> None:
+        if not self._future.done():  # type: ignore[union-attr]
+            self._future.set_result(None)  # type: ignore[union-attr]
+
+
+class _Batch:
+    """
+    The messages that will go into one run.
+
+    The first ticket's caller makes the run, and the others get its result. A batch
+    with no key can't be joined.
+    """
+
+    def __init__(self, key: Any) -> None:
+        self.key = key
+        self.tickets: list[_Ticket] = []
+        self.contents: list[Any] = []
+        self.started = False
+        self.finished = False
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+    def start(self) -> None:
+        self.started = True
+        self.contents = [ticket.content for ticket in self.tickets]
+        self.tickets[0].wake()
+
+
+class _Slot:
+    def __init__(self) -> None:
+        self.busy = False
+        self.waiting: deque[_Batch] = deque()
+
+
+class RunQueue:
+    """
+    Make runs on the same thread take turns, instead of failing because one is active.
+
+    Runs are queued per thread ID, first come, first served, across all the
+    conversations (sync or async) that use this queue. With `coalesce`, messages that
+    are asked while the thread is busy are put into the same run, if they're for the
+    same assistant and have the same additional instructions, so a burst of messages
+    costs one run, and every `ask()` in the burst returns its reply. Streams always get
+    a run of their own.
+
+    To also make processes take turns, pass a `ThreadLock`.
+    """
+
+    def __init__(self, lock: ThreadLock | None = None, coalesce: bool = True) -> None:
+        self.lock = lock
+        self.coalesce = coalesce
+        self.runs = 0
+        self.coalesced = 0
+        self._slots: dict[str, _Slot] = {}
+        self._mutex = threading.Lock()
+
+    def _enter(self, thread_id: str, ticket: _Ticket, key: Any) -> None:
+        """Add a ticket to a batch, and wake it right away if the thread is free."""
+        with self._mutex:
+            slot = self._slots.setdefault(thread_id, _Slot())
+            if (
+                key is not None
+                and self.coalesce
+                and slot.waiting
+                and slot.waiting[-1].key == key
+            ):
+                ticket.batch = slot.waiting[-1]
+                ticket.batch.tickets.append(ticket)
+                self.coalesced += 1
+                return
+
+            ticket.batch = _Batch(key)
+            ticket.batch.tickets.append(ticket)
+            self.runs += 1
+            if slot.busy:
+                slot.waiting.append(ticket.batch)
+            else:
+                slot.busy = True
+                ticket.batch.start()
+
+    def _next(self, thread_id: str) -> None:
+        """Give the thread to the next batch, under the mutex."""
+        slot = self._slots[thread_id]
+        if slot.waiting:
+            slot.waiting.popleft().start()
+        else:
+            del self._slots[thread_id]
+
+    def _abandon(self, thread_id: str, ticket: _Ticket) -> bool:
+        """
+        Take a ticket out of the queue, because its caller stopped waiting.
+
+        Returns False if it was woken in the meantime, so the caller should carry on.
+        """
+        with self._mutex:
+            if ticket.woken:
+                return False
+            batch = ticket.batch
+            batch.tickets.remove(ticket)
+            if not batch.started and not batch.tickets:
+                self._slots[thread_id].waiting.remove(batch)
+            return True
+
+    def _hand_over(self, thread_id: str, ticket: _Ticket) -> None:
+        """Pass the turn on, because its caller was cancelled before making the run."""
+        with self._mutex:
+            batch = ticket.batch
+            if batch.finished:
+                return
+            batch.tickets.remove(ticket)
+            if batch.tickets:
+                batch.start()
+            else:
+                self._next(thread_id)
+
+    def _done(
+        self,
+        thread_id: str,
+        batch: _Batch,
+        result: Any = None,
+        error: BaseException | None = None,
+    ) -> None:
+        with self._mutex:
+            batch.finished = True
+            batch.result = result
+            batch.error = error
+            for ticket in batch.tickets[1:]:
+                ticket.wake()
+            self._next(thread_id)
+
+    def _outcome(self, batch: _Batch) -> Any:
+        if batch.error is not None:
+            raise batch.error
+        return batch.result
+
+    def _wait(self, thread_id: str, content: Any, key: Any, deadline: float | None):
+        ticket = _Ticket(content, async_=False)
+        self._enter(thread_id, ticket, key)
+        if not ticket._event.wait(_timeout(deadline)):  # type: ignore[union-attr]
+            if self._abandon(thread_id, ticket):
+                raise RunTimeoutError(None)
+        return ticket.batch
+
+    @contextmanager
+    def _locked(self, thread_id: str, deadline: float | None) -> Iterator[None]:
+        if self.lock is None:
+            yield
+            return
+        if not self.lock.acquire(thread_id, _timeout(deadline)):
+            raise RunTimeoutError(None)
+        try:
+            yield
+        finally:
+            self.lock.release(thread_id)
+
+    def run(
+        self,
+        thread_id: str,
+        content: Any,
+        deadline: float | None,
+        fn: Callable[[list[Any]], Any],
+        key: Any = (),
+    ) -> Any:
+        """
+        Wait for the thread's turn, then call `fn` with the contents of the batch.
+
+        If this content was coalesced into someone else's batch, wait for that call to
+        finish instead, and return (or raise) what it did.
+        """
+        batch = self._wait(thread_id, content, key, deadline)
+        if batch.finished:
+            return self._outcome(batch)
+        try:
+            with self._locked(thread_id, deadline):
+                result = fn(batch.contents)
+        except BaseException as e:
+            self._done(thread_id, batch, error=e)
+            raise
+        self._done(thread_id, batch, result=result)
+        return result
+
+    @contextmanager
+    def turn(self, thread_id: str, deadline: float | None) -> Iterator[None]:
+        """Wait for the thread's turn, and hold it for the duration of the block."""
+        batch = self._wait(thread_id, None, None, deadline)
+        try:
+            with self._locked(thread_id, deadline):
+                yield
+        finally:
+            self._done(thread_id, batch)
+
+    async def _await(
+        self, thread_id: str, content: Any, key: Any, deadline: float | None
+    ):
+        ticket = _Ticket(content, async_=True)
+        self._enter(thread_id, ticket, key)
+        try:
+            await asyncio.wait_for(
+                asyncio.shield(ticket._future),  # type: ignore[arg-type]
+                _timeout(deadline),
+            )
+        except asyncio.TimeoutError:
+            if self._abandon(thread_id, ticket):
+                raise RunTimeoutError(None) from None
+        except asyncio.CancelledError:
+            if not self._abandon(thread_id, ticket):
+                self._hand_over(thread_id, ticket)
+            raise
+        return ticket.batch
+
+    @asynccontextmanager
+    async def _alocked(self, thread_id: str, deadline: float | None):
+        if self.lock is None:
+            yield
+            return
+        if not await self.lock.aacquire(thread_id, _timeout(deadline)):
+            raise RunTimeoutError(None)
+        try:
+            yield
+        finally:
+            await self.lock.arelease(thread_id)
+
+    async def arun(
+        self,
+        thread_id: str,
+        content: Any,
+        deadline: float | None,
+        fn: Callable[[list[Any]], Awaitable[Any]],
+        key: Any = (),
+    ) -> Any:
+        """The async version of `run()`."""
+        batch = await self._await(thread_id, content, key, deadline)
+        if batch.finished:
+            return self._outcome(batch)
+        try:
+            async with self._alocked(thread_id, deadline):
+                result = await fn(batch.contents)
+        except BaseException as e:
+            self._done(thread_id, batch, error=e)
+            raise
+        self._done(thread_id, batch, result=result)
+        return result
+
+    @asynccontextmanager
+    async def aturn(
+        self, thread_id: str, deadline: float | None
+    ) -> AsyncIterator[None]:
+        """The async version of `turn()`."""
+        batch = await self._await(thread_id, None, None, deadline)
+        try:
+            async with self._alocked(thread_id, deadline):
+                yield
+        finally:
+            self._done(thread_id, batch)
+
+
+# The queue assistants use unless they're given another one.
+DEFAULT_RUN_QUEUE = RunQueue()
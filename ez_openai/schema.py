@@ -0,0 +1,357 @@
+import dataclasses
+import datetime
+import enum
+import json
+import types
+import typing
+from typing import Any
+from typing import Callable
+from typing import Literal
+from typing import Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore
+
+
+def _loads(data: str | bytes) -> Any:
+    """Parse JSON, with orjson if it's installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _enum_names(obj: Any) -> Any:
+    """
+    Replace the enums in an object with their names.
+
+    Both orjson and the standard library write some enums as their values (orjson all of
+    them, json only `IntEnum`s and the like), without asking `_json_default()`, so
+    they're swapped out beforehand to come out the same either way.
+    """
+    if isinstance(obj, enum.Enum):
+        return obj.name
+    if isinstance(obj, dict):
+        return {k: _enum_names(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_enum_names(v) for v in obj]
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return {
+            f.name: _enum_names(getattr(obj, f.name)) for f in dataclasses.fields(obj)
+        }
+    return obj
+
+
+def _dumps(obj: Any) -> str:
+    """Serialize to JSON, with orjson if it's installed and can handle the object."""
+    obj = _enum_names(obj)
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=_json_default).decode()
+        except TypeError:
+            # orjson is stricter about some things (like huge ints or non-string keys),
+            # so let the standard library have a go.
+            pass
+    return json.dumps(obj, default=_json_default)
+
+
+def _json_default(obj: Any) -> Any:
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if isinstance(obj, enum.Enum):
+        return obj.name
+    if isinstance(obj, (datetime.date, datetime.time)):
+        # The same format orjson uses.
+        return obj.isoformat()
+    raise TypeError(f"Object of type {_type_name(obj)} is not JSON serializable")
+
+
+def _canonical(obj: Any) -> str:
+    """Serialize to JSON the same way every time, e.g. with the keys sorted."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS).decode()
+        except TypeError:
+            pass
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), default=_json_default)
+
+
+class _Invalid(Exception):
+    """Raised by the decoders for a value that doesn't match the annotation."""
+
+    def __init__(self, path: str, message: str) -> None:
+        super().__init__(f"{path}: {message}")
+
+
+# A function that validates (and possibly converts) a value decoded from JSON.
+Decoder = Callable[[Any, str], Any]
+
+_PRIMITIVES = {bool: "boolean", int: "integer", float: "number", str: "string"}
+
+
+def _is_typeddict(annotation) -> bool:
+    return isinstance(annotation, type) and hasattr(annotation, "__required_keys__")
+
+
+def _type_name(value) -> str:
+    return type(value).__name__
+
+
+def _nullable(schema: dict[str, Any]) -> dict[str, Any]:
+    if isinstance(schema.get("type"), str):
+        return schema | {"type": [schema["type"], "null"]}
+    return {"anyOf": [schema, {"type": "null"}]}
+
+
+def _object_fields(annotation) -> list[tuple[str, Any, bool, str | None]]:
+    """Return the (name, annotation, required, description) of a class's fields."""
+    hints = typing.get_type_hints(annotation)
+    if dataclasses.is_dataclass(annotation):
+        return [
+            (
+                field.name,
+                hints[field.name],
+                field.default is dataclasses.MISSING
+                and field.default_factory is dataclasses.MISSING,
+                field.metadata.get("description"),
+            )
+            for field in dataclasses.fields(annotation)
+            if field.init
+        ]
+    return [
+        (name, hint, name in annotation.__required_keys__, None)
+        for name, hint in hints.items()
+    ]
+
+
+def _schema(annotation) -> dict[str, Any]:
+    """Return the JSON schema for a type annotation."""
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+
+    if annotation in _PRIMITIVES:
+        return {"type": _PRIMITIVES[annotation]}
+    if isinstance(annotation, enum.EnumMeta):
+        return {"type": "string", "enum": [x.name for x in annotation]}  # type: ignore
+    if origin is Literal:
+        return {"enum": list(args)}
+    if origin in (Union, types.UnionType):
+        members = [a for a in args if a is not type(None)]
+        schema = (
+            _schema(members[0])
+            if len(members) == 1
+            else {"anyOf": [_schema(a) for a in members]}
+        )
+        return _nullable(schema) if len(members) < len(args) else schema
+    if annotation is list or origin is list:
+        return (
+            {"type": "array", "items": _schema(args[0])} if args else {"type": "array"}
+        )
+    if annotation is dict or origin is dict:
+        if len(args) == 2:
+            return {"type": "object", "additionalProperties": _schema(args[1])}
+        return {"type": "object"}
+    if dataclasses.is_dataclass(annotation) or _is_typeddict(annotation):
+        properties = {}
+        required = []
+        for name, hint, is_required, description in _object_fields(annotation):
+            properties[name] = _schema(hint)
+            if description:
+                properties[name]["description"] = description
+            if is_required:
+                required.append(name)
+        return {"type": "object", "properties": properties, "required": required}
+
+    # Anything else, we don't know much about, so pass its name along.
+    name = getattr(annotation, "__name__", str(annotation))
+    return {"type": name}
+
+
+def _decoder(annotation) -> Decoder:
+    """Compile a function that checks and converts values for the given annotation."""
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+
+    if annotation is bool:
+
+        def decode_bool(value, path):
+            if isinstance(value, bool):
+                return value
+            raise _Invalid(path, f"expected a boolean, got {_type_name(value)}")
+
+        return decode_bool
+
+    if annotation is int:
+
+        def decode_int(value, path):
+            if isinstance(value, int) and not isinstance(value, bool):
+                return value
+            if isinstance(value, float) and value.is_integer():
+                return int(value)
+            if isinstance(value, str):
+                try:
+                    return int(value)
+                except ValueError:
+                    pass
+            raise _Invalid(path, f"expected an integer, got {value!r}")
+
+        return decode_int
+
+    if annotation is float:
+
+        def decode_float(value, path):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                return float(value)
+            if isinstance(value, str):
+                try:
+                    return float(value)
+                except ValueError:
+                    pass
+            raise _Invalid(path, f"expected a number, got {value!r}")
+
+        return decode_float
+
+    if annotation is str:
+
+        def decode_str(value, path):
+            if isinstance(value, str):
+                return value
+            raise _Invalid(path, f"expected a string, got {_type_name(value)}")
+
+        return decode_str
+
+    if isinstance(annotation, enum.EnumMeta) or origin is Literal:
+        # Enum arguments are passed to the function by name, as they always have been.
+        allowed = (
+            frozenset(annotation.__members__)  # type: ignore
+            if origin is None
+            else frozenset(args)
+        )
+
+        def decode_choice(value, path):
+            try:
+                if value in allowed:
+                    return value
+            except TypeError:
+                pass
+            raise _Invalid(path, f"expected one of {sorted(map(str, allowed))}")
+
+        return decode_choice
+
+    if origin in (Union, types.UnionType):
+        optional = type(None) in args
+        members = [(a, _decoder(a)) for a in args if a is not type(None)]
+
+        def decode_union(value, path):
+            if value is None:
+                if optional:
+                    return None
+                raise _Invalid(path, "must not be null")
+            # Try the types the value already is before the ones it can be converted
+            # to, so e.g. `Union[int, str]` keeps "5" a string.
+            exact = [d for a, d in members if a not in _PRIMITIVES or type(value) is a]
+            coerced = [
+                d for a, d in members if a in _PRIMITIVES and type(value) is not a
+            ]
+            error = None
+            for decode in exact + coerced:
+                try:
+                    return decode(value, path)
+                except _Invalid as e:
+                    error = e
+            raise error  # type: ignore[misc]
+
+        return decode_union
+
+    if annotation is list or origin is list:
+        decode_item = _decoder(args[0]) if args else None
+
+        def decode_list(value, path):
+            if not isinstance(value, list):
+                raise _Invalid(path, f"expected an array, got {_type_name(value)}")
+            if decode_item is None:
+                return value
+            return [decode_item(item, f"{path}[{i}]") for i, item in enumerate(value)]
+
+        return decode_list
+
+    if annotation is dict or origin is dict:
+        decode_value = _decoder(args[1]) if len(args) == 2 else None
+
+        def decode_dict(value, path):
+            if not isinstance(value, dict):
+                raise _Invalid(path, f"expected an object, got {_type_name(value)}")
+            if decode_value is None:
+                return value
+            return {k: decode_value(v, f"{path}.{k}") for k, v in value.items()}
+
+        return decode_dict
+
+    if dataclasses.is_dataclass(annotation) or _is_typeddict(annotation):
+        fields = _object_fields(annotation)
+        decode_object = _object_decoder(
+            {name: _decoder(hint) for name, hint, _, _ in fields},
+            [name for name, _, required, _ in fields if required],
+        )
+        if _is_typeddict(annotation):
+            return decode_object
+
+        def decode_dataclass(value, path):
+            return annotation(**decode_object(value, path))
+
+        return decode_dataclass
+
+    def decode_any(value, path):
+        return value
+
+    return decode_any
+
+
+def _object_decoder(decoders: dict[str, Decoder], required: list[str]) -> Decoder:
+    def decode_object(value, path):
+        if not isinstance(value, dict):
+            raise _Invalid(path, f"expected an object, got {_type_name(value)}")
+        for name in required:
+            if name not in value:
+                raise _Invalid(f"{path}.{name}", "missing")
+        result = {}
+        for name, item in value.items():
+            decode = decoders.get(name)
+            if decode is None:
+                raise _Invalid(f"{path}.{name}", "unexpected argument")
+            result[name] = decode(item, f"{path}.{name}")
+        return result
+
+    return decode_object
+
+
+class ArgumentDecoder:
+    """
+    Parse and check the JSON arguments the AI sends for a function call.
+
+    It's compiled once from the function's signature, and converts the arguments to the
+    annotated types (e.g. objects to dataclasses), so the function doesn't need to.
+    """
+
+    def __init__(self, parameters: dict[str, Any], required: list[str]) -> None:
+        self._decode = _object_decoder(
+            {name: _decoder(hint) for name, hint in parameters.items()}, required
+        )
+
+    def decode(self, arguments: str | bytes) -> tuple[dict[str, Any], str | None]:
+        """
+        Return the keyword arguments for the function, and the error, if any.
+
+        If the arguments are invalid, the error is a message the AI can use to fix
+        them, and the arguments are empty.
+        """
+        try:
+            parsed = _loads(arguments or "{}")
+        except ValueError as e:
+            # This also catches orjson's JSONDecodeError.
+            return {}, f"The arguments are not valid JSON: {e}"
+        try:
+            return self._decode(parsed, "arguments"), None
+        except _Invalid as e:
+            return {}, f"Invalid arguments: {e}"
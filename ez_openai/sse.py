@@ -0,0 +1,115 @@
+import asyncio
+import json
+import time
+from typing import Any
+from typing import AsyncIterator
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, error: BaseException) -> None:
+        self.error = error
+
+
+def _frame(event: str, data: dict[str, Any]) -> bytes:
+    # JSON-encoding the data keeps newlines in the text from ending the frame early.
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+
+
+async def _produce(stream, queue: asyncio.Queue) -> None:
+    """Move items from the stream to the queue, waiting whenever the queue is full."""
+    try:
+        if hasattr(stream, "__aiter__"):
+            async for item in stream:
+                await queue.put(item)
+        else:
+            # A sync stream blocks while waiting for the API (and while running tools),
+            # so pull every item in a worker thread.
+            iterator = iter(stream)
+            while (item := await asyncio.to_thread(next, iterator, _DONE)) is not _DONE:
+                await queue.put(item)
+    except Exception as e:
+        await queue.put(_Failure(e))
+    await queue.put(_DONE)
+
+
+async def _cancel_run(conversation, run_id: str | None) -> None:
+    cancel = conversation._cancel_run
+    if asyncio.iscoroutinefunction(cancel):
+        await cancel(run_id)
+    else:
+        await asyncio.to_thread(cancel, run_id)
+
+
+async def sse_stream(
+    conversation,
+    message: str | None,
+    max_bytes: int = 256,
+    max_delay: float = 0.05,
+    queue_size: int = 64,
+    **kwargs,
+) -> AsyncIterator[bytes]:
+    """
+    Ask something, and stream the reply as server-sent events.
+
+    This works with both `Conversation` and `AsyncConversation`, and yields the bytes
+    to send to the client, so it can be returned from an ASGI app as is (e.g. in a
+    Starlette `StreamingResponse`). Tool calls are run as usual while streaming.
+
+    Small deltas are merged into one `delta` event until there are `max_bytes` of UTF-8
+    text or `max_delay` seconds have passed since the first one. At most `queue_size`
+    deltas are read ahead of the client. When the reply is complete, a `done` event
+    with the whole message is sent, and if anything goes wrong, an `error` event.
+
+    If the client goes away before the end (i.e. this iterator is closed or its task
+    is cancelled), the run is cancelled too, so it doesn't keep using up tokens.
+    """
+    stream = conversation.ask_stream(message, mode="text", **kwargs)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    producer = asyncio.ensure_future(_produce(stream, queue))
+
+    pending: list[str] = []
+    pending_size = 0
+    flush_at = 0.0
+    finished = False
+    try:
+        while True:
+            timeout = max(flush_at - time.monotonic(), 0) if pending else None
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                item = None
+
+            if isinstance(item, str):
+                if not pending:
+                    flush_at = time.monotonic() + max_delay
+                pending.append(item)
+                pending_size += len(item.encode())
+                if pending_size < max_bytes and time.monotonic() < flush_at:
+                    continue
+
+            if pending:
+                yield _frame("delta", {"text": "".join(pending)})
+                pending.clear()
+                pending_size = 0
+
+            if isinstance(item, _Failure):
+                finished = True
+                yield _frame("error", {"error": str(item.error)})
+                return
+            if item is _DONE:
+                finished = True
+                final = stream.value
+                yield _frame(
+                    "done",
+                    {
+                        "id": final.id if final else None,
+                        "text": final.text if final else stream.text_so_far,
+                    },
+                )
+                return
+    finally:
+        if not finished:
+            producer.cancel()
+            await _cancel_run(conversation, stream.run_id)
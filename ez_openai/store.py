@@ -0,0 +1,368 @@
+import abc
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+from typing import Any
+from typing import Iterable
+
+from .cache import TTLCache
+from .schema import _dumps
+from .schema import _loads
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None  # type: ignore
+
+
+class ChatMessage:
+    """A message in a chat conversation's history."""
+
+    __slots__ = ("id", "role", "content", "tool_calls", "tool_call_id")
+
+    def __init__(
+        self,
+        id: str,
+        role: str,
+        content: str | list[dict[str, Any]] | None,
+        tool_calls: list[dict[str, Any]] | None = None,
+        tool_call_id: str | None = None,
+    ) -> None:
+        self.id = id
+        self.role = role
+        self.content = content
+        self.tool_calls = tool_calls
+        self.tool_call_id = tool_call_id
+
+    def to_param(self) -> dict[str, Any]:
+        """Return the message as the Chat Completions API expects it."""
+        param: dict[str, Any] = {"role": self.role, "content": self.content}
+        if self.tool_calls:
+            param["tool_calls"] = self.tool_calls
+        if self.tool_call_id:
+            param["tool_call_id"] = self.tool_call_id
+        return param
+
+    def to_record(self) -> list[Any]:
+        return [self.id, self.role, self.content, self.tool_calls, self.tool_call_id]
+
+    @classmethod
+    def from_record(cls, record: list[Any]) -> "ChatMessage":
+        return cls(*record)
+
+
+def _encode(messages: Iterable[ChatMessage]) -> bytes:
+    """
+    Pack messages into bytes, as positional records rather than dicts.
+
+    The first byte says which format was used, so data written with msgpack can still be
+    read (or at least recognized) where it isn't installed, and vice versa.
+    """
+    records = [m.to_record() for m in messages]
+    if msgpack is not None:
+        return b"m" + msgpack.packb(records)
+    return b"j" + _dumps(records).encode()
+
+
+def _decode(data: bytes) -> list[ChatMessage]:
+    kind, payload = data[:1], data[1:]
+    if kind == b"m":
+        if msgpack is None:
+            raise ValueError(
+                "ERROR: This conversation was stored with msgpack, which isn't installed."
+            )
+        records = msgpack.unpackb(payload)
+    else:
+        records = _loads(payload)
+    return [ChatMessage.from_record(r) for r in records]
+
+
+def estimate_tokens(message: ChatMessage) -> int:
+    """
+    Roughly estimate how many tokens a message takes up in a request.
+
+    This goes by the usual four characters per token, plus a few for the message's
+    framing, which is close enough for deciding how much history to send.
+    """
+    size = 0
+    if isinstance(message.content, str):
+        size += len(message.content)
+    elif message.content:
+        size += sum(len(part.get("text", "")) for part in message.content)
+        # Images are billed by size, which we don't know, so assume a small one.
+        size += 4 * 85 * sum(1 for part in message.content if part["type"] != "text")
+    for call in message.tool_calls or ():
+        size += len(call["function"]["name"]) + len(call["function"]["arguments"])
+    return size // 4 + 4
+
+
+def truncate_history(
+    messages: list[ChatMessage], max_tokens: int | None
+) -> list[ChatMessage]:
+    """
+    Return the most recent messages that fit in `max_tokens`.
+
+    History is only ever cut right before a user message, so that function calls are
+    never separated from their outputs. The last user message is always kept, even if
+    it doesn't fit on its own.
+    """
+    if max_tokens is None:
+        return messages
+    total = 0
+    start = None
+    for i in range(len(messages) - 1, -1, -1):
+        total += estimate_tokens(messages[i])
+        if messages[i].role != "user":
+            continue
+        if total > max_tokens and start is not None:
+            break
+        start = i
+    return messages if start is None else messages[start:]
+
+
+class ConversationStore(abc.ABC):
+    """
+    Somewhere to keep the histories of chat conversations.
+
+    Messages are only ever appended to a conversation, a whole exchange at a time, once
+    it has finished successfully. Subclasses must be thread-safe.
+    """
+
+    @abc.abstractmethod
+    def create(self, id: str) -> None: ...
+
+    @abc.abstractmethod
+    def load(self, id: str) -> list[ChatMessage] | None:
+        """Return the messages of a conversation, or None if it doesn't exist."""
+
+    @abc.abstractmethod
+    def append(self, id: str, messages: list[ChatMessage]) -> None:
+        """Add messages to a conversation, raising `ValueError` if it doesn't exist."""
+
+    @abc.abstractmethod
+    def delete(self, id: str) -> None: ...
+
+
+class MemoryStore(ConversationStore):
+    """
+    Keep conversations in memory, in this process only.
+
+    The least recently used conversations are dropped once there are more than
+    `maxsize`, and, if `ttl` is given, conversations that aren't used for that many
+    seconds expire.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float | None = None) -> None:
+        self._conversations: TTLCache[list[ChatMessage]] = TTLCache(maxsize, ttl)
+        self._lock = threading.Lock()
+
+    def create(self, id: str) -> None:
+        self._conversations.set(id, [])
+
+    def load(self, id: str) -> list[ChatMessage] | None:
+        with self._lock:
+            messages = self._conversations.get(id)
+            if messages is None:
+                return None
+            # Setting it again restarts its time-to-live.
+            self._conversations.set(id, messages)
+            return list(messages)
+
+    def append(self, id: str, messages: list[ChatMessage]) -> None:
+        with self._lock:
+            existing = self._conversations.get(id)
+            if existing is None:
+                raise ValueError(f"ERROR: There is no chat conversation with ID {id}.")
+            existing.extend(messages)
+            self._conversations.set(id, existing)
+
+    def delete(self, id: str) -> None:
+        self._conversations.pop(id)
+
+
+class SQLiteStore(ConversationStore):
+    """Keep conversations in an SQLite database, one row per message."""
+
+    def __init__(self, path: str | os.PathLike) -> None:
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS conversations (id TEXT PRIMARY KEY)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS messages "
+                "(conversation TEXT NOT NULL, data BLOB NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS messages_conversation "
+                "ON messages (conversation)"
+            )
+
+    def create(self, id: str) -> None:
+        with self._lock, self._db:
+            self._db.execute("INSERT OR IGNORE INTO conversations VALUES (?)", (id,))
+
+    def load(self, id: str) -> list[ChatMessage] | None:
+        with self._lock:
+            if not self._db.execute(
+                "SELECT 1 FROM conversations WHERE id = ?", (id,)
+            ).fetchone():
+                return None
+            rows = self._db.execute(
+                "SELECT data FROM messages WHERE conversation = ? ORDER BY rowid",
+                (id,),
+            ).fetchall()
+        return [message for (data,) in rows for message in _decode(data)]
+
+    def append(self, id: str, messages: list[ChatMessage]) -> None:
+        with self._lock, self._db:
+            if not self._db.execute(
+                "SELECT 1 FROM conversations WHERE id = ?", (id,)
+            ).fetchone():
+                raise ValueError(f"ERROR: There is no chat conversation with ID {id}.")
+            self._db.executemany(
+                "INSERT INTO messages VALUES (?, ?)",
+                [(id, _encode([m])) for m in messages],
+            )
+
+    def delete(self, id: str) -> None:
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM messages WHERE conversation = ?", (id,))
+            self._db.execute("DELETE FROM conversations WHERE id = ?", (id,))
+
+    def close(self) -> None:
+        self._db.close()
+
+
+# Each log record is a header (the kind of record, and the lengths of the conversation
+# ID and the payload), then the ID, then the payload.
+_HEADER = struct.Struct("<BHI")
+_CREATE, _APPEND, _DELETE = range(3)
+
+
+class LogStore(ConversationStore):
+    """
+    Keep conversations in an append-only log file.
+
+    Appending is a single write to the end of the file, and the file is memory-mapped
+    for reading, with an in-memory index of where each conversation's records are, so
+    loading a conversation doesn't read anything else. Deleted conversations stay in
+    the file until `compact()` is called.
+    """
+
+    def __init__(self, path: str | os.PathLike) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a+b")
+        self._map: mmap.mmap | None = None
+        self._index: dict[str, list[tuple[int, int]]] = {}
+        self._scan()
+
+    def _remap(self) -> mmap.mmap | None:
+        size = os.fstat(self._file.fileno()).st_size
+        if self._map is None or len(self._map) < size:
+            if self._map is not None:
+                self._map.close()
+            self._map = (
+                mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                if size
+                else None
+            )
+        return self._map
+
+    def _scan(self) -> None:
+        """Build the index from the records in the file."""
+        data = self._remap()
+        offset = 0
+        size = len(data) if data is not None else 0
+        while offset + _HEADER.size <= size:
+            kind, id_length, length = _HEADER.unpack_from(data, offset)  # type: ignore[arg-type]
+            start = offset + _HEADER.size
+            end = start + id_length + length
+            if end > size:
+                # A write that didn't finish, e.g. because of a crash.
+                break
+            id = data[start : start + id_length].decode()  # type: ignore[index]
+            self._apply(kind, id, start + id_length, length)
+            offset = end
+        if offset < size:
+            self._map.close()  # type: ignore[union-attr]
+            self._map = None
+            self._file.truncate(offset)
+
+    def _apply(self, kind: int, id: str, offset: int, length: int) -> None:
+        if kind == _CREATE:
+            self._index[id] = []
+        elif kind == _APPEND:
+            self._index.setdefault(id, []).append((offset, length))
+        else:
+            self._index.pop(id, None)
+
+    def _write(self, kind: int, id: str, payload: bytes = b"") -> None:
+        encoded_id = id.encode()
+        self._file.seek(0, os.SEEK_END)
+        offset = self._file.tell() + _HEADER.size + len(encoded_id)
+        self._file.write(
+            _HEADER.pack(kind, len(encoded_id), len(payload)) + encoded_id + payload
+        )
+        self._file.flush()
+        self._apply(kind, id, offset, len(payload))
+
+    def create(self, id: str) -> None:
+        with self._lock:
+            self._write(_CREATE, id)
+
+    def load(self, id: str) -> list[ChatMessage] | None:
+        with self._lock:
+            records = self._index.get(id)
+            if records is None:
+                return None
+            data = self._remap()
+            chunks = [data[o : o + n] for o, n in records]  # type: ignore[index]
+        return [message for chunk in chunks for message in _decode(chunk)]
+
+    def append(self, id: str, messages: list[ChatMessage]) -> None:
+        with self._lock:
+            if id not in self._index:
+                raise ValueError(f"ERROR: There is no chat conversation with ID {id}.")
+            self._write(_APPEND, id, _encode(messages))
+
+    def delete(self, id: str) -> None:
+        with self._lock:
+            if id in self._index:
+                self._write(_DELETE, id)
+
+    def compact(self) -> None:
+        """Rewrite the log without the deleted conversations."""
+        with self._lock:
+            data = self._remap()
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "wb") as tmp:
+                for id, records in self._index.items():
+                    encoded_id = id.encode()
+                    tmp.write(_HEADER.pack(_CREATE, len(encoded_id), 0) + encoded_id)
+                    for offset, length in records:
+                        tmp.write(
+                            _HEADER.pack(_APPEND, len(encoded_id), length)
+                            + encoded_id
+                            + data[offset : offset + length]  # type: ignore[index]
+                        )
+            self._close()
+            os.replace(tmp_path, self.path)
+            self._file = open(self.path, "a+b")
+            self._index = {}
+            self._scan()
+
+    def _close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def close(self) -> None:
+        with self._lock:
+            self._close()
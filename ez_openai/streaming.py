@@ -0,0 +1,65 @@
+from typing import Any
+from typing import Literal
+
+from .polling import RunStats
+
+StreamMode = Literal["message", "delta", "text"]
+
+
+class EZDelta:
+    """A lightweight piece of a streamed message: just the message ID and the new text."""
+
+    __slots__ = ("id", "text")
+
+    def __init__(self, id: str, text: str) -> None:
+        self.id = id
+        self.text = text
+
+    def __str__(self) -> str:
+        return self.text
+
+    def __repr__(self) -> str:
+        return f"EZDelta(id={self.id!r}, text={self.text!r})"
+
+
+class TextBuffer:
+    """
+    Accumulate streamed text chunks.
+
+    Chunks are only joined when the text is asked for, and the result is kept, so
+    reading the text as it streams doesn't keep re-concatenating the whole thing.
+    """
+
+    __slots__ = ("_chunks",)
+
+    def __init__(self) -> None:
+        self._chunks: list[str] = []
+
+    def append(self, chunk: str) -> None:
+        if chunk:
+            self._chunks.append(chunk)
+
+    @property
+    def text(self) -> str:
+        if len(self._chunks) > 1:
+            self._chunks[:] = ["".join(self._chunks)]
+        return self._chunks[0] if self._chunks else ""
+
+
+class _StreamState:
+    """What a stream generator shares with the object that wraps it."""
+
+    __slots__ = ("buffer", "run_id", "stats")
+
+    def __init__(self) -> None:
+        self.buffer = TextBuffer()
+        self.run_id: str | None = None
+        self.stats = RunStats()
+
+
+def _delta_text(delta: Any) -> str:
+    """Get the text out of a message delta."""
+    for content in delta.content or ():
+        if content.type == "text":
+            return content.text.value or ""
+    return ""
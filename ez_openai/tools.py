@@ -0,0 +1,225 @@
+import asyncio
+import importlib
+import inspect
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures import wait
+from typing import Any
+from typing import Callable
+
+from .schema import _dumps
+
+# A tool call to make: (tool call ID, function, keyword arguments).
+ToolCall = tuple[str, Callable, dict[str, Any]]
+
+
+def _output(tool_call_id: str, result: Any) -> dict[str, str]:
+    return {"tool_call_id": tool_call_id, "output": _dumps(result)}
+
+
+def _error_output(tool_call_id: str, e: BaseException | str) -> dict[str, str]:
+    """Format an error as a tool output, so the model can see what went wrong."""
+    if isinstance(e, str):
+        error = e
+    elif isinstance(e, (TimeoutError, FutureTimeoutError, asyncio.TimeoutError)):
+        error = "The function call timed out."
+    else:
+        error = f"{type(e).__name__}: {e}"
+    return _output(tool_call_id, {"error": error})
+
+
+def _run_sync(function: Callable, arguments: dict[str, Any]) -> Any:
+    """Call a function from a worker thread, running it to completion if it's async."""
+    r = function(**arguments)
+    if inspect.isawaitable(r):
+        r = asyncio.run(_await(r))
+    return r
+
+
+async def _await(awaitable):
+    return await awaitable
+
+
+class ToolExecutor:
+    """
+    Run the tool calls of a single run concurrently.
+
+    Sync conversations run the functions in a thread pool, async conversations run
+    them on the event loop (with regular functions going to a worker thread). At most
+    `max_workers` calls run at once, and a call that isn't done `timeout` seconds after
+    it was made (including any wait for a free worker), or raises, is reported back to
+    the model as an error instead of failing the whole run. The outputs are always
+    returned in the same order as the calls.
+    """
+
+    def __init__(self, max_workers: int = 8, timeout: float | None = None) -> None:
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._pool: ThreadPoolExecutor | None = None
+
+    @property
+    def pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="ez_openai_tool"
+            )
+        return self._pool
+
+    def run(self, calls: list[ToolCall]) -> list[dict[str, str]]:
+        """Run the given tool calls in the thread pool and return their outputs."""
+        futures = [
+            (tool_call_id, self.pool.submit(_run_sync, function, arguments))
+            for tool_call_id, function, arguments in calls
+        ]
+        # Wait for them all at once, so every call gets `timeout` from when it was
+        # submitted, rather than the later ones getting extra time.
+        wait([future for _, future in futures], timeout=self.timeout)
+
+        tool_outputs = []
+        for tool_call_id, future in futures:
+            if not future.done():
+                future.cancel()
+                tool_outputs.append(_error_output(tool_call_id, FutureTimeoutError()))
+                continue
+            try:
+                r = future.result()
+            except Exception as e:
+                tool_outputs.append(_error_output(tool_call_id, e))
+            else:
+                tool_outputs.append(_output(tool_call_id, r))
+        return tool_outputs
+
+    async def arun(self, calls: list[ToolCall]) -> list[dict[str, str]]:
+        """Run the given tool calls concurrently on the event loop."""
+        semaphore = asyncio.Semaphore(self.max_workers)
+
+        async def call(function, arguments):
+            async with semaphore:
+                if inspect.iscoroutinefunction(function):
+                    return await function(**arguments)
+                return await asyncio.to_thread(_run_sync, function, arguments)
+
+        async def output(tool_call_id, function, arguments):
+            # Like in `run()`, the wait for a free worker counts towards the timeout.
+            try:
+                r = await asyncio.wait_for(call(function, arguments), self.timeout)
+            except Exception as e:
+                return _error_output(tool_call_id, e)
+            return _output(tool_call_id, r)
+
+        return list(await asyncio.gather(*(output(*c) for c in calls)))
+
+    def shutdown(self) -> None:
+        """Shut down the thread pool, if one was started."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+def _call_in_worker(module: str, qualname: str, args, kwargs) -> Any:
+    """
+    Call a decorated function's original function, in a worker process.
+
+    The function is looked up by name, rather than pickled, because the decorator
+    replaces it in its module, which pickle doesn't allow.
+    """
+    function: Any = importlib.import_module(module)
+    for name in qualname.split("."):
+        function = getattr(function, name)
+    r = function.__wrapped__(*args, **kwargs)
+    if inspect.isawaitable(r):
+        r = asyncio.run(_await(r))
+    return r
+
+
+class ProcessToolPool:
+    """
+    Run CPU-heavy functions in worker processes, so they don't hold up everything else.
+
+    Pass it (or `"process"`, for the shared default pool) as `executor=` to
+    `openai_function()`. The function is then called in one of up to `max_workers`
+    processes, and each process is replaced after `max_tasks_per_child` calls (on Python
+    3.11 and later), to keep leaks in check. Only the function's name and its arguments
+    are sent to the worker, so the function must be defined at the top level of a
+    module, and its arguments and result must be picklable.
+
+    A call that takes longer than `timeout` seconds raises `TimeoutError`. Since a call
+    can't be stopped once it has started, the pool's processes are then killed and
+    replaced, which fails any other calls that were running at the time.
+    """
+
+    def __init__(
+        self,
+        max_workers: int | None = None,
+        max_tasks_per_child: int | None = 100,
+        timeout: float | None = None,
+    ) -> None:
+        self.max_workers = max_workers
+        self.max_tasks_per_child = max_tasks_per_child
+        self.timeout = timeout
+        self._pool: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                kwargs: dict[str, Any] = {}
+                if sys.version_info >= (3, 11):
+                    # Older versions can't replace worker processes.
+                    kwargs["max_tasks_per_child"] = self.max_tasks_per_child
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers, **kwargs)
+            return self._pool
+
+    def _submit(self, function: Callable, args, kwargs):
+        pool = self.pool
+        future = pool.submit(
+            _call_in_worker, function.__module__, function.__qualname__, args, kwargs
+        )
+        return pool, future
+
+    def _restart(self, pool: ProcessPoolExecutor) -> None:
+        """Kill a pool's processes, because one of them is stuck on a call."""
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        processes = list((getattr(pool, "_processes", None) or {}).values())
+        pool.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.kill()
+
+    def call(self, function: Callable, args, kwargs) -> Any:
+        """Call a decorated function in a worker process, and wait for the result."""
+        pool, future = self._submit(function, args, kwargs)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            self._restart(pool)
+            raise TimeoutError(
+                f"{function.__name__} did not finish in {self.timeout} seconds."
+            ) from None
+
+    async def acall(self, function: Callable, args, kwargs) -> Any:
+        """The async version of `call()`."""
+        pool, future = self._submit(function, args, kwargs)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            self._restart(pool)
+            raise TimeoutError(
+                f"{function.__name__} did not finish in {self.timeout} seconds."
+            ) from None
+
+    def shutdown(self) -> None:
+        """Shut down the worker processes, if any were started."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+# The pool that functions decorated with `executor="process"` use.
+DEFAULT_PROCESS_POOL = ProcessToolPool()
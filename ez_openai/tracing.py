@@ -0,0 +1,253 @@
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any
+
+# For endpoints that take an ID as their first positional argument, which ID that is.
+_POSITIONAL_IDS = {
+    "beta.assistants": "assistant_id",
+    "beta.threads": "thread_id",
+    "beta.threads.messages": "thread_id",
+    "beta.threads.runs": "run_id",
+    "files": "file_id",
+}
+_ID_KWARGS = ("assistant_id", "thread_id", "run_id", "file_id")
+# What the ID in the response of a create call refers to.
+_CREATED_IDS = {
+    "beta.assistants.create": "assistant_id",
+    "beta.threads.create": "thread_id",
+    "beta.threads.create_and_run": "run_id",
+    "beta.threads.messages.create": "message_id",
+    "beta.threads.runs.create": "run_id",
+    "files.create": "file_id",
+}
+
+
+def _call_ids(endpoint: str, args: tuple, kwargs: dict[str, Any]) -> dict[str, str]:
+    """Find the IDs of the objects an API call is about in its arguments."""
+    ids = {k: kwargs[k] for k in _ID_KWARGS if isinstance(kwargs.get(k), str)}
+    if args and isinstance(args[0], str):
+        key = _POSITIONAL_IDS.get(endpoint.rpartition(".")[0])
+        if key is not None:
+            ids.setdefault(key, args[0])
+    return ids
+
+
+def _response_ids(endpoint: str, response: Any, ids: dict[str, str]) -> None:
+    """Add the ID of whatever a create call created to `ids`."""
+    key = _CREATED_IDS.get(endpoint)
+    id = getattr(response, "id", None)
+    if key is not None and isinstance(id, str):
+        ids.setdefault(key, id)
+    if endpoint == "beta.threads.create_and_run":
+        thread_id = getattr(response, "thread_id", None)
+        if isinstance(thread_id, str):
+            ids.setdefault("thread_id", thread_id)
+
+
+class Instrumentation:
+    """
+    Hooks that get called around every API call the library makes.
+
+    `call_started()` is called before each call with the dotted name of the endpoint
+    (e.g. `beta.threads.runs.retrieve`) and the IDs of the assistant, thread, run or
+    file involved, and can return anything. That is passed back to `call_finished()`,
+    along with the IDs (including the ones of anything the call created), how long the
+    call took, and the exception if it failed.
+
+    Subclass this and override either method. Since the hooks are called inline, they
+    should be quick.
+    """
+
+    def call_started(self, endpoint: str, ids: dict[str, str]) -> Any:
+        return None
+
+    def call_finished(
+        self,
+        context: Any,
+        endpoint: str,
+        ids: dict[str, str],
+        duration: float,
+        error: BaseException | None,
+    ) -> None:
+        pass
+
+
+@dataclass
+class CallRecord:
+    endpoint: str
+    ids: dict[str, str]
+    duration: float
+    error: BaseException | None = None
+
+
+class CallRecorder(Instrumentation):
+    """
+    Keep a record of every API call, to see where the time goes.
+
+    ```
+    recorder = CallRecorder()
+    assistant = Assistant.get("asst_...", instrumentation=recorder)
+    assistant.conversation.create().ask("Hello!")
+    recorder.summary()  # {'beta.threads.runs.retrieve': (3, 0.41), ...}
+    ```
+    """
+
+    def __init__(self) -> None:
+        self.calls: list[CallRecord] = []
+        self._lock = threading.Lock()
+
+    def call_finished(self, context, endpoint, ids, duration, error) -> None:
+        with self._lock:
+            self.calls.append(CallRecord(endpoint, ids, duration, error))
+
+    def summary(self) -> dict[str, tuple[int, float]]:
+        """Return the number of calls and the total time spent, per endpoint."""
+        totals: dict[str, tuple[int, float]] = defaultdict(lambda: (0, 0.0))
+        with self._lock:
+            for call in self.calls:
+                count, duration = totals[call.endpoint]
+                totals[call.endpoint] = (count + 1, duration + call.duration)
+        return dict(totals)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.calls.clear()
+
+
+class OpenTelemetryInstrumentation(Instrumentation):
+    """
+    Make an OpenTelemetry span for every API call.
+
+    The spans are named after the endpoint and have the IDs as `openai.*` attributes.
+    If no `tracer` is given, one is obtained from the global tracer provider, which
+    needs the `opentelemetry-api` package.
+    """
+
+    def __init__(self, tracer: Any = None) -> None:
+        if tracer is None:
+            try:
+                from opentelemetry import trace
+            except ImportError:
+                raise ImportError(
+                    "ERROR: OpenTelemetryInstrumentation needs the opentelemetry-api "
+                    "package, or a tracer to be passed in."
+                ) from None
+            tracer = trace.get_tracer("ez_openai")
+        self.tracer = tracer
+
+    def call_started(self, endpoint, ids):
+        return self.tracer.start_span(
+            f"openai {endpoint}",
+            attributes={"openai.endpoint": endpoint}
+            | {f"openai.{k}": v for k, v in ids.items()},
+        )
+
+    def call_finished(self, span, endpoint, ids, duration, error) -> None:
+        for key, value in ids.items():
+            span.set_attribute(f"openai.{key}", value)
+        if error is not None:
+            span.record_exception(error)
+        span.end()
+
+
+def _traced_call(instrumentation, endpoint, call, args, kwargs):
+    ids = _call_ids(endpoint, args, kwargs)
+    context = instrumentation.call_started(endpoint, ids)
+    start = time.perf_counter()
+    try:
+        response = call(*args, **kwargs)
+    except BaseException as e:
+        instrumentation.call_finished(
+            context, endpoint, ids, time.perf_counter() - start, e
+        )
+        raise
+    _response_ids(endpoint, response, ids)
+    instrumentation.call_finished(
+        context, endpoint, ids, time.perf_counter() - start, None
+    )
+    return response
+
+
+async def _atraced_call(instrumentation, endpoint, call, args, kwargs):
+    ids = _call_ids(endpoint, args, kwargs)
+    context = instrumentation.call_started(endpoint, ids)
+    start = time.perf_counter()
+    try:
+        response = await call(*args, **kwargs)
+    except BaseException as e:
+        instrumentation.call_finished(
+            context, endpoint, ids, time.perf_counter() - start, e
+        )
+        raise
+    _response_ids(endpoint, response, ids)
+    instrumentation.call_finished(
+        context, endpoint, ids, time.perf_counter() - start, None
+    )
+    return response
+
+
+class _TracedStream:
+    """
+    Stands in for a stream manager, to report the stream as one call.
+
+    The manager only makes its request when it's entered, so the call is timed from then
+    until the stream is closed, and the IDs of the run it streamed are added at the end.
+    """
+
+    def __init__(self, instrumentation, endpoint, manager, args, kwargs) -> None:
+        self._instrumentation = instrumentation
+        self._endpoint = endpoint
+        self._manager = manager
+        self._ids = _call_ids(endpoint, args, kwargs)
+        self._stream: Any = None
+        self._context: Any = None
+        self._start = 0.0
+
+    def _started(self) -> None:
+        self._context = self._instrumentation.call_started(self._endpoint, self._ids)
+        self._start = time.perf_counter()
+
+    def _finished(self, error: BaseException | None) -> None:
+        run = getattr(self._stream, "current_run", None)
+        if run is not None:
+            self._ids.setdefault("run_id", run.id)
+            self._ids.setdefault("thread_id", run.thread_id)
+        self._instrumentation.call_finished(
+            self._context,
+            self._endpoint,
+            self._ids,
+            time.perf_counter() - self._start,
+            error,
+        )
+
+    def __enter__(self):
+        self._started()
+        try:
+            self._stream = self._manager.__enter__()
+        except BaseException as e:
+            self._finished(e)
+            raise
+        return self._stream
+
+    def __exit__(self, exc_type, exc, traceback):
+        try:
+            return self._manager.__exit__(exc_type, exc, traceback)
+        finally:
+            self._finished(exc)
+
+    async def __aenter__(self):
+        self._started()
+        try:
+            self._stream = await self._manager.__aenter__()
+        except BaseException as e:
+            self._finished(e)
+            raise
+        return self._stream
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        try:
+            return await self._manager.__aexit__(exc_type, exc, traceback)
+        finally:
+            self._finished(exc)
@@ -0,0 +1,212 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any
+
+from .cache import TTLCache
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+def _file_hash(path: str | os.PathLike) -> str:
+    """Hash a file's contents, without reading it all into memory."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class _Upload:
+    """A file we've uploaded, and the client to delete it with."""
+
+    def __init__(self, file_id: str, client: Any, expires_at: float) -> None:
+        self.file_id = file_id
+        self.client = client
+        self.expires_at = expires_at
+
+
+class UploadCache:
+    """
+    Reuse uploaded files when the same file contents are sent again.
+
+    Files are keyed by the SHA-256 of their contents, and kept for `ttl` seconds after
+    they were uploaded. When an upload drops out of the cache, because it expired or
+    because the cache was full, the file is deleted from OpenAI (unless `delete` is
+    false), so keep the TTL longer than you need images in old conversations to stay
+    around.
+
+    If `index_path` is given, the cache is also saved there as JSON, so that it survives
+    restarts. Uploads are specific to an API key/organization, so don't share a cache
+    (or an index) between them. Files from a previous run are deleted with the last
+    client the cache was used with, so ones that expired while the program wasn't
+    running are deleted once it's used again.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 24 * 60 * 60,
+        maxsize: int = 1024,
+        index_path: str | os.PathLike | None = None,
+        delete: bool = True,
+    ) -> None:
+        self.ttl = ttl
+        self.delete = delete
+        self.index_path = Path(index_path) if index_path is not None else None
+        self._cache: TTLCache[_Upload] = TTLCache(
+            maxsize=maxsize, ttl=ttl, on_evict=self._evicted
+        )
+        self._index_lock = threading.Lock()
+        # The last client we were used with, to delete files from previous runs with.
+        self._client: Any = None
+        # Files that need deleting, but that we haven't had a client for yet.
+        self._orphans: list[_Upload] = []
+        # Async deletions, kept so they don't get garbage-collected mid-flight.
+        self._tasks: set[asyncio.Task] = set()
+        # The uploads that are happening, so the same file isn't uploaded twice at once.
+        self._in_flight: dict[str, Future] = {}
+        self._in_flight_lock = threading.Lock()
+        self._load_index()
+
+    def _load_index(self) -> None:
+        if self.index_path is None or not self.index_path.exists():
+            return
+        now = time.time()
+        with self.index_path.open() as f:
+            for digest, entry in json.load(f).items():
+                upload = _Upload(entry["file_id"], None, entry["expires_at"])
+                if upload.expires_at > now:
+                    self._cache.set(digest, upload, ttl=upload.expires_at - now)
+                else:
+                    self._orphans.append(upload)
+
+    def _save_index(self) -> None:
+        if self.index_path is None:
+            return
+        uploads = [*self._cache.items(), *((None, u) for u in self._orphans)]
+        index = {
+            # Orphans are keyed by file ID, as they've already expired and won't be
+            # looked up again.
+            digest or upload.file_id: {
+                "file_id": upload.file_id,
+                "expires_at": upload.expires_at,
+            }
+            for digest, upload in uploads
+        }
+        with self._index_lock:
+            temp_path = self.index_path.with_suffix(".tmp")
+            temp_path.write_text(json.dumps(index))
+            os.replace(temp_path, self.index_path)
+
+    def _evicted(self, digest: str, upload: _Upload) -> None:
+        if self.delete:
+            client = upload.client or self._client
+            if client is None:
+                self._orphans.append(upload)
+            else:
+                self._delete(client, upload.file_id)
+        self._save_index()
+
+    def _delete(self, client: Any, file_id: str) -> None:
+        try:
+            result = client.files.delete(file_id)
+            if asyncio.iscoroutine(result):
+                task = asyncio.get_running_loop().create_task(result)
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+        except Exception:
+            # The file might already be gone, or there might be no loop to delete it
+            # with. Either way, there's nothing more we can do.
+            pass
+
+    def _use(self, client: Any) -> None:
+        """Remember the client, and delete any files that were waiting for one."""
+        self._client = client
+        if not self._orphans:
+            return
+        orphans, self._orphans = self._orphans, []
+        for upload in orphans:
+            self._delete(client, upload.file_id)
+        self._save_index()
+
+    def _new_upload(self, file_id: str, client: Any) -> _Upload:
+        return _Upload(file_id, client, time.time() + self.ttl)
+
+    def _start(self, digest: str) -> tuple[Future, bool]:
+        """Return the future for an upload, and whether the caller should upload it."""
+        with self._in_flight_lock:
+            future = self._in_flight.get(digest)
+            if future is not None:
+                return future, False
+            future = Future()
+            # The file might have been uploaded since the caller looked.
+            upload = self._cache.get(digest)
+            if upload is not None:
+                future.set_result(upload.file_id)
+                return future, False
+            self._in_flight[digest] = future
+            return future, True
+
+    def _finish(
+        self, digest: str, future: Future, upload: _Upload | None, error
+    ) -> None:
+        if upload is not None:
+            self._cache.set(digest, upload)
+            self._save_index()
+            future.set_result(upload.file_id)
+        else:
+            future.set_exception(error)
+        with self._in_flight_lock:
+            del self._in_flight[digest]
+
+    def file_id(self, client: Any, path: str | os.PathLike) -> str:
+        """Return the ID of an uploaded file with the same contents, uploading it if needed."""
+        self._use(client)
+        self._cache.expire()
+        digest = _file_hash(path)
+        upload = self._cache.get(digest)
+        if upload is not None:
+            return upload.file_id
+
+        # Only upload each file once, even if it's asked for again meanwhile.
+        future, leader = self._start(digest)
+        if not leader:
+            return future.result()
+        try:
+            with open(path, "rb") as f:
+                file_id = client.files.create(file=f, purpose="assistants").id
+        except BaseException as e:
+            self._finish(digest, future, None, e)
+            raise
+        self._finish(digest, future, self._new_upload(file_id, client), None)
+        return file_id
+
+    async def afile_id(self, client: Any, path: str | os.PathLike) -> str:
+        """The async version of `file_id()`."""
+        self._use(client)
+        self._cache.expire()
+        digest = await asyncio.to_thread(_file_hash, path)
+        upload = self._cache.get(digest)
+        if upload is not None:
+            return upload.file_id
+
+        future, leader = self._start(digest)
+        if not leader:
+            return await asyncio.wrap_future(future)
+        try:
+            with open(path, "rb") as f:
+                file = await client.files.create(file=f, purpose="assistants")
+        except BaseException as e:
+            self._finish(digest, future, None, e)
+            raise
+        self._finish(digest, future, self._new_upload(file.id, client), None)
+        return file.id
+
+    def clear(self) -> None:
+        """Forget all the uploads, deleting the files."""
+        self._cache.clear()
@@ -0,0 +1,12 @@
+import pytest
+
+from .fake_server import FakeOpenAI
+
+
+@pytest.fixture()
+def fake_openai(monkeypatch):
+    """Point the OpenAI client at a local fake of the Assistants API."""
+    with FakeOpenAI() as fake:
+        monkeypatch.setenv("OPENAI_BASE_URL", fake.base_url)
+        monkeypatch.setenv("OPENAI_API_KEY", "sk-fake")
+        yield fake
@@ -0,0 +1,636 @@
+"""
+A small, local stand-in for the OpenAI Assistants API.
+
+It implements just enough of the threads/messages/runs endpoints for ez_openai to talk
+to it, so the library's own behaviour and overhead can be tested without a network or
+an API key. Every request takes `latency` seconds, and runs complete `run_duration`
+seconds after they're created, replying with whatever `reply` returns for the last user
+message (a list makes several messages).
+
+If `tool_calls` is given, it's called with the last user message and returns the rounds
+of function calls the run should ask for before replying, each a list of
+`(name, arguments)` tuples. Streamed runs send their reply a word at a time, at
+`token_rate` words per second if set.
+
+To point something other than the tests at it, run it with
+`python -m tests.fake_server --port 8000` and use `http://127.0.0.1:8000/v1` as the
+base URL.
+"""
+
+import argparse
+import itertools
+import json
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from typing import Any
+from typing import Callable
+from typing import Iterator
+from urllib.parse import parse_qs
+from urllib.parse import urlparse
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # Lots of clients connect at once in the concurrency tests.
+    request_queue_size = 128
+
+
+def _echo(text: str) -> str:
+    return f"You said: {text}"
+
+
+ToolCallScript = Callable[[str], list[list[tuple[str, dict[str, Any]]]]]
+
+
+@dataclass
+class _EventStream:
+    """A response that's sent as server-sent events, as they're generated."""
+
+    events: Iterator[tuple[str | None, Any]]
+    # Chat completion streams don't name their events.
+    terminator: bytes = b"event: done\ndata: [DONE]\n\n"
+
+
+def _tokens(text: str) -> list[str]:
+    """Split text into word-sized pieces that join back into it."""
+    return re.findall(r"\s*\S+\s*|\s+", text)
+
+
+class FakeOpenAI:
+    def __init__(
+        self,
+        latency: float = 0.0,
+        run_duration: float = 0.0,
+        reply: Callable[[str], str | list[str]] = _echo,
+        tool_calls: ToolCallScript | None = None,
+        token_rate: float | None = None,
+        port: int = 0,
+    ) -> None:
+        self.latency = latency
+        self.run_duration = run_duration
+        self.reply = reply
+        self.tool_calls = tool_calls
+        self.token_rate = token_rate
+
+        self.requests: Counter[str] = Counter()
+        self.tool_outputs: list[list[dict[str, Any]]] = []
+        self.assistants: dict[str, dict[str, Any]] = {}
+        self.threads: dict[str, list[dict[str, Any]]] = {}
+        self.runs: dict[str, dict[str, Any]] = {}
+        self.files: dict[str, bytes] = {}
+        self.deleted_files: list[str] = []
+        # How many of the next requests get a 429, and how long they say to wait.
+        self.rate_limited = 0
+        self.retry_after = 0.05
+        # How many of the next requests fail with a 500.
+        self.server_errors = 0
+
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._server = _Server(("127.0.0.1", port), self._handler())
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, args=(0.05,), daemon=True
+        )
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        if isinstance(host, bytes):
+            host = host.decode()
+        return f"http://{host}:{port}/v1"
+
+    def __enter__(self) -> "FakeOpenAI":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _id(self, prefix: str) -> str:
+        return f"{prefix}_{next(self._ids)}"
+
+    def _message(self, thread_id, role, text, run_id=None) -> dict[str, Any]:
+        return {
+            "id": self._id("msg"),
+            "object": "thread.message",
+            "created_at": int(time.time()),
+            "thread_id": thread_id,
+            "role": role,
+            "status": "completed",
+            "run_id": run_id,
+            "assistant_id": None,
+            "attachments": [],
+            "metadata": {},
+            "content": [{"type": "text", "text": {"value": text, "annotations": []}}],
+        }
+
+    def _last_prompt(self, thread_id: str) -> str:
+        messages = self.threads[thread_id]
+        last_user = next(m for m in reversed(messages) if m["role"] == "user")
+        return last_user["content"][0]["text"]["value"]
+
+    def _refresh_run(self, run: dict[str, Any]) -> dict[str, Any]:
+        """Move a run along, depending on how much time has passed."""
+        if run["status"] == "queued" and time.monotonic() >= run["_done_at"]:
+            if run["_rounds"]:
+                run["status"] = "requires_action"
+                run["required_action"] = {
+                    "type": "submit_tool_outputs",
+                    "submit_tool_outputs": {
+                        "tool_calls": [
+                            {
+                                "id": self._id("call"),
+                                "type": "function",
+                                "function": {
+                                    "name": name,
+                                    "arguments": json.dumps(arguments),
+                                },
+                            }
+                            for name, arguments in run["_rounds"].pop(0)
+                        ]
+                    },
+                }
+                return run
+
+            messages = self.threads[run["thread_id"]]
+            prompt = self._last_prompt(run["thread_id"])
+            try:
+                reply = self.reply(prompt)
+            except Exception as e:
+                run["status"] = "failed"
+                run["last_error"] = {"code": "server_error", "message": str(e)}
+                return run
+            replies = [reply] if isinstance(reply, str) else reply
+            run["_messages"] = [
+                self._message(run["thread_id"], "assistant", text, run["id"])
+                for text in replies
+            ]
+            messages.extend(run["_messages"])
+            prompt_tokens = len(prompt.split())
+            completion_tokens = sum(len(r.split()) for r in replies)
+            run["status"] = "completed"
+            run["usage"] = {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            }
+        return run
+
+    def _create_thread(self, body: dict[str, Any] | None) -> dict[str, Any]:
+        thread_id = self._id("thread")
+        self.threads[thread_id] = []
+        for message in (body or {}).get("messages") or ():
+            self._add_message(thread_id, message)
+        return {
+            "id": thread_id,
+            "object": "thread",
+            "created_at": int(time.time()),
+            "metadata": {},
+        }
+
+    def _add_message(self, thread_id: str, body: dict[str, Any]) -> dict[str, Any]:
+        content = body["content"]
+        if not isinstance(content, str):
+            content = " ".join(c["text"] for c in content if c["type"] == "text")
+        message = self._message(thread_id, body.get("role", "user"), content)
+        self.threads[thread_id].append(message)
+        return message
+
+    def _active_run(self, thread_id: str) -> bool:
+        """Whether a run on the thread is still going, so it can't take new messages."""
+        return any(
+            run["thread_id"] == thread_id
+            and run["status"] in ("queued", "in_progress", "requires_action")
+            for run in self.runs.values()
+        )
+
+    def _create_run(self, thread_id: str, body: dict[str, Any]) -> tuple[int, Any]:
+        run = {
+            "id": self._id("run"),
+            "object": "thread.run",
+            "created_at": int(time.time()),
+            "thread_id": thread_id,
+            "assistant_id": body["assistant_id"],
+            "status": "queued",
+            "instructions": "",
+            "model": "gpt-4o",
+            "tools": [],
+            "parallel_tool_calls": True,
+            "_done_at": time.monotonic() + self.run_duration,
+            "_rounds": (
+                self.tool_calls(self._last_prompt(thread_id)) if self.tool_calls else []
+            ),
+        }
+        self.runs[run["id"]] = run
+        if body.get("stream"):
+            return 200, _EventStream(self._stream_run(run, created=True))
+        return 200, self._public(self._refresh_run(run))
+
+    def handle(self, method: str, path: str, query, body) -> tuple[int, Any]:
+        """Route a request, returning the status code and the JSON response."""
+        with self._lock:
+            if method == "POST" and path == "/assistants":
+                assistant = {
+                    "id": self._id("asst"),
+                    "object": "assistant",
+                    "created_at": int(time.time()),
+                    "model": body.get("model", "gpt-4o"),
+                    "name": body.get("name"),
+                    "instructions": body.get("instructions"),
+                    "tools": body.get("tools", []),
+                    "temperature": body.get("temperature"),
+                    "response_format": body.get("response_format", "auto"),
+                    "metadata": {},
+                }
+                self.assistants[assistant["id"]] = assistant
+                return 200, assistant
+
+            if m := re.fullmatch(r"/assistants/(\w+)", path):
+                if m.group(1) not in self.assistants:
+                    return 404, {"error": {"message": "No such assistant."}}
+                if method == "DELETE":
+                    del self.assistants[m.group(1)]
+                    return 200, {
+                        "id": m.group(1),
+                        "object": "assistant.deleted",
+                        "deleted": True,
+                    }
+                if method == "POST":
+                    self.assistants[m.group(1)].update(body)
+                return 200, self.assistants[m.group(1)]
+
+            if method == "POST" and path == "/files":
+                file: dict[str, Any] = {
+                    "id": self._id("file"),
+                    "object": "file",
+                    "bytes": len(body),
+                    "created_at": int(time.time()),
+                    "filename": "upload",
+                    "purpose": "assistants",
+                    "status": "processed",
+                }
+                self.files[file["id"]] = body
+                return 200, file
+
+            if m := re.fullmatch(r"/files/(\w+)", path):
+                if m.group(1) not in self.files:
+                    return 404, {"error": {"message": "No such file."}}
+                if method == "DELETE":
+                    del self.files[m.group(1)]
+                    self.deleted_files.append(m.group(1))
+                    return 200, {"id": m.group(1), "object": "file", "deleted": True}
+
+            if method == "POST" and path == "/threads":
+                return 200, self._create_thread(body)
+
+            if method == "POST" and path == "/threads/runs":
+                thread = self._create_thread(body.get("thread"))
+                return self._create_run(thread["id"], body)
+
+            if m := re.fullmatch(r"/threads/(\w+)", path):
+                thread_id = m.group(1)
+                if thread_id not in self.threads:
+                    return 404, {"error": {"message": "No such thread."}}
+                if method == "DELETE":
+                    del self.threads[thread_id]
+                    return 200, {
+                        "id": thread_id,
+                        "object": "thread.deleted",
+                        "deleted": True,
+                    }
+                return 200, {
+                    "id": thread_id,
+                    "object": "thread",
+                    "created_at": int(time.time()),
+                    "metadata": {},
+                }
+
+            if m := re.fullmatch(r"/threads/(\w+)/messages", path):
+                messages = self.threads[m.group(1)]
+                if method == "POST":
+                    if self._active_run(m.group(1)):
+                        return 400, {
+                            "error": {"message": "Thread already has an active run."}
+                        }
+                    return 200, self._add_message(m.group(1), body)
+
+                data = list(messages)
+                if query.get("order", ["desc"])[0] == "desc":
+                    data.reverse()
+                for cursor, offset in (("after", 1), ("before", 0)):
+                    if cursor in query:
+                        ids = [d["id"] for d in data]
+                        index = ids.index(query[cursor][0])
+                        data = data[index + 1 :] if offset else data[:index]
+                if "run_id" in query:
+                    data = [d for d in data if d["run_id"] == query["run_id"][0]]
+                limit = int(query.get("limit", ["20"])[0])
+                page = data[:limit]
+                return 200, {
+                    "object": "list",
+                    "data": page,
+                    "first_id": page[0]["id"] if page else None,
+                    "last_id": page[-1]["id"] if page else None,
+                    "has_more": len(data) > limit,
+                }
+
+            if m := re.fullmatch(r"/threads/(\w+)/runs", path):
+                if self._active_run(m.group(1)):
+                    return 400, {
+                        "error": {"message": "Thread already has an active run."}
+                    }
+                for message in body.get("additional_messages") or ():
+                    self._add_message(m.group(1), message)
+                return self._create_run(m.group(1), body)
+
+            if m := re.fullmatch(r"/threads/(\w+)/runs/(\w+)", path):
+                run = self.runs[m.group(2)]
+                return 200, self._public(self._refresh_run(run))
+
+            if m := re.fullmatch(
+                r"/threads/(\w+)/runs/(\w+)/submit_tool_outputs", path
+            ):
+                run = self.runs[m.group(2)]
+                if run["status"] != "requires_action":
+                    return 400, {"error": {"message": "Run does not require action."}}
+                self.tool_outputs.append(body["tool_outputs"])
+                run["status"] = "queued"
+                run["required_action"] = None
+                run["_done_at"] = time.monotonic() + self.run_duration
+                if body.get("stream"):
+                    return 200, _EventStream(self._stream_run(run, created=False))
+                return 200, self._public(self._refresh_run(run))
+
+            if method == "POST" and path == "/chat/completions":
+                return self._chat_completion(body)
+
+            if m := re.fullmatch(r"/threads/(\w+)/runs/(\w+)/cancel", path):
+                run = self.runs[m.group(2)]
+                if run["status"] not in ("queued", "in_progress", "requires_action"):
+                    return 400, {"error": {"message": "Run cannot be cancelled."}}
+                run["status"] = "cancelled"
+                return 200, self._public(run)
+
+        return 404, {"error": {"message": f"Not found: {method} {path}"}}
+
+    def _chat_completion(self, body: dict[str, Any]) -> tuple[int, Any]:
+        """Reply to a chat completion request, scripted the same way as runs."""
+        messages = body["messages"]
+        last_user = max(i for i, m in enumerate(messages) if m["role"] == "user")
+        content = messages[last_user]["content"]
+        prompt = (
+            content
+            if isinstance(content, str)
+            else " ".join(c["text"] for c in content if c["type"] == "text")
+        )
+        since_prompt = messages[last_user + 1 :]
+        if since_prompt and since_prompt[-1]["role"] == "tool":
+            outputs: list[dict[str, Any]] = []
+            for message in reversed(since_prompt):
+                if message["role"] != "tool":
+                    break
+                outputs.insert(
+                    0,
+                    {
+                        "tool_call_id": message["tool_call_id"],
+                        "output": message["content"],
+                    },
+                )
+            self.tool_outputs.append(outputs)
+
+        rounds = self.tool_calls(prompt) if self.tool_calls else []
+        done = sum(1 for m in since_prompt if m.get("tool_calls"))
+        tool_calls = None
+        if done < len(rounds):
+            tool_calls = [
+                {
+                    "id": self._id("call"),
+                    "type": "function",
+                    "function": {"name": name, "arguments": json.dumps(arguments)},
+                }
+                for name, arguments in rounds[done]
+            ]
+            text = None
+        else:
+            try:
+                reply = self.reply(prompt)
+            except Exception as e:
+                return 500, {"error": {"message": str(e)}}
+            text = reply if isinstance(reply, str) else "\n\n".join(reply)
+
+        completion_tokens = len(text.split()) if text else 0
+        prompt_tokens = sum(
+            len(m["content"].split())
+            for m in messages
+            if isinstance(m.get("content"), str)
+        )
+        completion = {
+            "id": self._id("chatcmpl"),
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body["model"],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+        finish_reason = "tool_calls" if tool_calls else "stop"
+        if body.get("stream"):
+            events = self._stream_chat(completion, text, tool_calls, finish_reason)
+            return 200, _EventStream(
+                ((None, chunk) for chunk in events), terminator=b"data: [DONE]\n\n"
+            )
+
+        reply_message: dict[str, Any] = {"role": "assistant", "content": text}
+        if tool_calls:
+            reply_message["tool_calls"] = tool_calls
+        return 200, completion | {
+            "choices": [
+                {"index": 0, "message": reply_message, "finish_reason": finish_reason}
+            ]
+        }
+
+    def _stream_chat(self, completion, text, tool_calls, finish_reason):
+        """Yield the chunks of a streamed chat completion."""
+        usage = completion.pop("usage")
+        completion["object"] = "chat.completion.chunk"
+
+        def chunk(delta, finish_reason=None):
+            return completion | {
+                "choices": [
+                    {"index": 0, "delta": delta, "finish_reason": finish_reason}
+                ]
+            }
+
+        if self.run_duration:
+            time.sleep(self.run_duration)
+        yield chunk({"role": "assistant", "content": ""})
+        for token in _tokens(text or ""):
+            if self.token_rate:
+                time.sleep(1 / self.token_rate)
+            yield chunk({"content": token})
+        for index, call in enumerate(tool_calls or ()):
+            yield chunk({"tool_calls": [call | {"index": index}]})
+        yield chunk({}, finish_reason)
+        yield completion | {"choices": [], "usage": usage}
+
+    def _stream_run(self, run: dict[str, Any], created: bool):
+        """Yield the events of a run as it progresses, like the streaming API does."""
+        with self._lock:
+            snapshot = self._public(run)
+        if created:
+            yield "thread.run.created", snapshot
+        yield "thread.run.queued", snapshot
+
+        delay = run["_done_at"] - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        yield "thread.run.in_progress", snapshot | {"status": "in_progress"}
+
+        with self._lock:
+            self._refresh_run(run)
+            snapshot = self._public(run)
+        if run["status"] != "completed":
+            yield f"thread.run.{run['status']}", snapshot
+            return
+
+        for message in run["_messages"]:
+            text = message["content"][0]["text"]["value"]
+            yield (
+                "thread.message.created",
+                message | {"status": "in_progress", "content": []},
+            )
+            for token in _tokens(text):
+                if self.token_rate:
+                    time.sleep(1 / self.token_rate)
+                if run["status"] == "cancelled":
+                    yield "thread.run.cancelled", self._public(run)
+                    return
+                yield (
+                    "thread.message.delta",
+                    {
+                        "id": message["id"],
+                        "object": "thread.message.delta",
+                        "delta": {
+                            "content": [
+                                {
+                                    "index": 0,
+                                    "type": "text",
+                                    "text": {"value": token, "annotations": []},
+                                }
+                            ]
+                        },
+                    },
+                )
+            yield "thread.message.completed", message
+        yield "thread.run.completed", snapshot
+
+    @staticmethod
+    def _public(obj: dict[str, Any]) -> dict[str, Any]:
+        return {k: v for k, v in obj.items() if not k.startswith("_")}
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def _respond(self):
+                url = urlparse(self.path)
+                path = url.path.removeprefix("/v1")
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length)
+                if not self.headers.get("Content-Type", "").startswith("multipart/"):
+                    # Uploads are kept as the raw form data.
+                    body = json.loads(body or b"null")
+
+                endpoint = re.sub(r"_\d+", "", path)
+                with fake._lock:
+                    fake.requests[f"{self.command} {endpoint}"] += 1
+                if fake.latency:
+                    time.sleep(fake.latency)
+
+                with fake._lock:
+                    rate_limited = fake.rate_limited > 0
+                    fake.rate_limited -= rate_limited
+                    server_error = not rate_limited and fake.server_errors > 0
+                    fake.server_errors -= server_error
+                headers = {}
+                if rate_limited:
+                    status, response = 429, {"error": {"message": "Slow down."}}
+                    headers["retry-after-ms"] = str(int(fake.retry_after * 1000))
+                elif server_error:
+                    status, response = 500, {"error": {"message": "Oops."}}
+                else:
+                    try:
+                        status, response = fake.handle(
+                            self.command, path, parse_qs(url.query), body
+                        )
+                    except Exception as e:
+                        status, response = 500, {"error": {"message": repr(e)}}
+                if isinstance(response, _EventStream):
+                    self._stream(response)
+                    return
+                payload = json.dumps(response).encode()
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _stream(self, stream: _EventStream):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                try:
+                    for event, data in stream.events:
+                        frame = f"data: {json.dumps(data)}\n\n"
+                        if event is not None:
+                            frame = f"event: {event}\n{frame}"
+                        self.wfile.write(frame.encode())
+                        self.wfile.flush()
+                    self.wfile.write(stream.terminator)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client went away.
+                    pass
+
+            do_GET = do_POST = do_DELETE = _respond
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--run-duration", type=float, default=0.0)
+    parser.add_argument("--token-rate", type=float, default=None)
+    args = parser.parse_args()
+
+    with FakeOpenAI(
+        latency=args.latency,
+        run_duration=args.run_duration,
+        token_rate=args.token_rate,
+        port=args.port,
+    ) as fake:
+        sys.stderr.write(f"Serving a fake OpenAI API on {fake.base_url}\n")
+        try:
+            fake._thread.join()
+        except KeyboardInterrupt:
+            pass
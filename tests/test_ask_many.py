@@ -0,0 +1,75 @@
+import asyncio
+import time
+
+from ez_openai import Assistant
+from ez_openai import AsyncAssistant
+from ez_openai import PollStrategy
+
+FAST_POLLING = PollStrategy(initial=0.01, max_interval=0.05, jitter=0)
+
+
+def test_ask_many_keeps_input_order(fake_openai):
+    fake_openai.run_duration = 0.05
+    assistant = Assistant.create(name="Batcher", poll_strategy=FAST_POLLING)
+    prompts = [f"Prompt {i}" for i in range(20)]
+
+    results = list(assistant.ask_many(prompts, concurrency=5))
+
+    assert [r.index for r in results] == list(range(20))
+    assert [r.message.text for r in results] == [f"You said: {p}" for p in prompts]
+    assert all(r.error is None and r.attempts == 1 for r in results)
+
+
+def test_ask_many_retries_and_reports_errors(fake_openai):
+    def reply(text):
+        if text == "bad":
+            raise RuntimeError("Can't reply to that.")
+        return text
+
+    fake_openai.reply = reply
+    assistant = Assistant.create(name="Batcher", poll_strategy=FAST_POLLING)
+
+    results = list(
+        assistant.ask_many(["good", "bad"], retries=1, retry_delay=0, ordered=False)
+    )
+
+    results.sort(key=lambda r: r.index)
+    assert results[0].message.text == "good"
+    assert results[1].message is None
+    assert results[1].error is not None
+    assert results[1].attempts == 2
+
+
+def test_async_ask_many(fake_openai):
+    async def main():
+        assistant = await AsyncAssistant.create(
+            name="Batcher", poll_strategy=FAST_POLLING
+        )
+        return [r async for r in assistant.ask_many(["a", "b", "c"], concurrency=2)]
+
+    results = asyncio.run(main())
+    assert [r.message.text for r in results] == [
+        "You said: a",
+        "You said: b",
+        "You said: c",
+    ]
+
+
+def test_ask_many_throughput(fake_openai, record_property):
+    """Concurrency should hide the per-request latency of the API."""
+    fake_openai.latency = 0.01
+    fake_openai.run_duration = 0.05
+    assistant = Assistant.create(name="Batcher", poll_strategy=FAST_POLLING)
+    prompts = [f"Prompt {i}" for i in range(20)]
+
+    throughput = {}
+    for concurrency in (1, 10):
+        start = time.perf_counter()
+        results = list(assistant.ask_many(prompts, concurrency=concurrency))
+        throughput[concurrency] = len(results) / (time.perf_counter() - start)
+        assert all(r.error is None for r in results)
+        record_property(
+            f"asks_per_second_concurrency_{concurrency}", throughput[concurrency]
+        )
+
+    assert throughput[10] > throughput[1] * 3
@@ -0,0 +1,111 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from ez_openai import AsyncAssistant
+from ez_openai import PollStrategy
+from ez_openai import openai_function
+
+
+@openai_function(descriptions={"name": "Name of the user"})
+async def say_goodbye(name: str):
+    """Says goodbye to the user."""
+    await asyncio.sleep(0)
+    return f"Bye bye {name}!!!11"
+
+
+@openai_function(descriptions={"name": "Name of the user"})
+def say_hello(name: str):
+    """Says hello to the user."""
+    return f"Hello {name}"
+
+
+def _message(text):
+    return SimpleNamespace(
+        id="msg_1",
+        role="assistant",
+        content=[SimpleNamespace(type="text", text=SimpleNamespace(value=text))],
+    )
+
+
+def _tool_call(id, name, arguments):
+    return SimpleNamespace(
+        id=id,
+        function=SimpleNamespace(name=name, arguments=json.dumps(arguments)),
+    )
+
+
+class FakeRuns:
+    def __init__(self):
+        self.submitted = []
+        self.messages = []
+
+    async def create(self, thread_id, assistant_id, additional_messages, **kwargs):
+        self.messages.extend(additional_messages)
+        return SimpleNamespace(id="run_1", status="queued")
+
+    async def retrieve(self, thread_id, run_id, **kwargs):
+        if self.submitted:
+            return SimpleNamespace(id=run_id, status="completed", usage=None)
+        return SimpleNamespace(
+            id=run_id,
+            status="requires_action",
+            required_action=SimpleNamespace(
+                submit_tool_outputs=SimpleNamespace(
+                    tool_calls=[
+                        _tool_call("call_1", "say_goodbye", {"name": "Stavros"}),
+                        _tool_call("call_2", "say_hello", {"name": "George"}),
+                    ]
+                )
+            ),
+        )
+
+    async def submit_tool_outputs(self, thread_id, run_id, tool_outputs, **kwargs):
+        self.submitted.extend(tool_outputs)
+        return SimpleNamespace(id=run_id, status="in_progress")
+
+
+class FakeMessages:
+    def __init__(self, runs):
+        self.runs = runs
+
+    async def create(self, thread_id, role, content):
+        return SimpleNamespace(id="msg_0")
+
+    async def list(self, thread_id, **kwargs):
+        return SimpleNamespace(data=[_message(self.runs.submitted[0]["output"])])
+
+
+def test_async_ask_with_tools():
+    runs = FakeRuns()
+    assistant = AsyncAssistant(
+        api_key="sk-test",
+        functions=[say_goodbye, say_hello],
+        poll_strategy=PollStrategy(initial=0, jitter=0),
+    )
+    assistant._client = SimpleNamespace(  # type: ignore
+        beta=SimpleNamespace(
+            threads=SimpleNamespace(runs=runs, messages=FakeMessages(runs))
+        )
+    )
+    assistant._assistant = SimpleNamespace(id="asst_1")
+    conversation = assistant.conversation
+    conversation._thread = SimpleNamespace(id="thread_1")
+
+    message = asyncio.run(conversation.ask("Goodbye."))
+
+    assert runs.submitted == [
+        {"tool_call_id": "call_1", "output": json.dumps("Bye bye Stavros!!!11")},
+        {"tool_call_id": "call_2", "output": json.dumps("Hello George")},
+    ]
+    assert message.text == json.dumps("Bye bye Stavros!!!11")
+    assert message.stats.polls == 2
+    assert runs.messages == [
+        {"role": "user", "content": [{"type": "text", "text": "Goodbye."}]}
+    ]
+
+
+def test_openai_function_keeps_coroutines():
+    assert asyncio.iscoroutinefunction(say_goodbye)
+    assert not asyncio.iscoroutinefunction(say_hello)
+    assert say_goodbye._openai_fn["function"]["name"] == "say_goodbye"
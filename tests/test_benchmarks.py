@@ -0,0 +1,203 @@
+"""
+Benchmarks of the library's own overhead, against the local fake API.
+
+Each benchmark runs a few conversations and reports, per conversation, the number of
+requests made, the wall and CPU time, and the peak memory allocated. The numbers are
+recorded as test properties (see `--junitxml`), and if pytest-benchmark is installed,
+the benchmarks use its `benchmark` fixture and add them to its `extra_info`, so they
+can be compared across versions with `--benchmark-compare`.
+
+The request counts are also asserted, so changes that add round-trips show up as
+failures.
+"""
+
+import asyncio
+import time
+import tracemalloc
+
+import pytest
+
+from ez_openai import Assistant
+from ez_openai import AsyncAssistant
+from ez_openai import PollStrategy
+from ez_openai import ToolExecutor
+from ez_openai import openai_function
+
+CONVERSATIONS = 10
+FAST_POLLING = PollStrategy(initial=0.005, max_interval=0.02, jitter=0)
+
+
+@openai_function(descriptions={"city": "The city to get the weather for."})
+def get_weather(city: str):
+    """Get the weather for a city."""
+    return {"city": city, "temperature": 26}
+
+
+@pytest.fixture()
+def report(request, fake_openai, record_property):
+    """
+    Return a function that benchmarks running `CONVERSATIONS` conversations.
+
+    It takes a function that runs one conversation, and returns the per-conversation
+    measurements.
+    """
+    try:
+        benchmark = request.getfixturevalue("benchmark")
+    except pytest.FixtureLookupError:
+        benchmark = None
+
+    def run_all(function):
+        for _ in range(CONVERSATIONS):
+            function()
+
+    def measure(function) -> dict[str, float]:
+        # Warm up the connections, so we measure the steady state.
+        function()
+
+        requests = fake_openai.requests.total()
+        wall, cpu = time.perf_counter(), time.process_time()
+        if benchmark is not None:
+            benchmark.pedantic(run_all, args=(function,), rounds=1, iterations=1)
+        else:
+            run_all(function)
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        requests = fake_openai.requests.total() - requests
+
+        # Tracing allocations slows everything down, so do it in a separate pass.
+        tracemalloc.start()
+        try:
+            function()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        results = {
+            "requests": requests / CONVERSATIONS,
+            "wall_seconds": wall / CONVERSATIONS,
+            "cpu_seconds": cpu / CONVERSATIONS,
+            "peak_memory_kb": peak / 1024,
+        }
+        for name, value in results.items():
+            record_property(name, value)
+            if benchmark is not None:
+                benchmark.extra_info[name] = value
+        return results
+
+    return measure
+
+
+def test_benchmark_ask(fake_openai, report):
+    assistant = Assistant.create("Bench", "Echo.", poll_strategy=FAST_POLLING)
+
+    def ask():
+        assistant.conversation.create().ask("How are you?")
+
+    results = report(ask)
+    # Creating the thread, starting the run with the message, and fetching the reply.
+    assert results["requests"] == 3
+
+
+def test_benchmark_ask_lazy(fake_openai, report):
+    assistant = Assistant.create("Bench", "Echo.", poll_strategy=FAST_POLLING)
+
+    def ask():
+        message = assistant.conversation.create(lazy=True).ask("How are you?")
+        assert message.stats.requests == 2
+
+    results = report(ask)
+    # Creating the thread with the message and the run, and fetching the reply.
+    assert results["requests"] == 2
+
+
+def test_benchmark_ask_with_polling(fake_openai, report):
+    fake_openai.run_duration = 0.02
+    assistant = Assistant.create("Bench", "Echo.", poll_strategy=FAST_POLLING)
+
+    def ask():
+        assistant.conversation.create().ask("How are you?")
+
+    results = report(ask)
+    assert 5 <= results["requests"] <= 8
+
+
+def test_benchmark_ask_stream(fake_openai, report):
+    assistant = Assistant.create("Bench", "Echo.")
+
+    def ask_stream():
+        stream = assistant.conversation.create().ask_stream(
+            "Tell me a long story " * 20, mode="text"
+        )
+        for _ in stream:
+            pass
+        assert stream.stats.deltas > 100
+
+    results = report(ask_stream)
+    # Creating the thread, and the streamed run with the message.
+    assert results["requests"] == 2
+
+
+def test_benchmark_ask_stream_lazy(fake_openai, report):
+    assistant = Assistant.create("Bench", "Echo.")
+
+    def ask_stream():
+        conversation = assistant.conversation.create(lazy=True)
+        stream = conversation.ask_stream("Tell me a long story " * 20, mode="text")
+        for _ in stream:
+            pass
+        assert conversation.id.startswith("thread_")
+        assert stream.stats.requests == 1
+
+    results = report(ask_stream)
+    assert results["requests"] == 1
+
+
+def test_benchmark_tool_calls(fake_openai, report):
+    fake_openai.tool_calls = lambda prompt: [
+        [("get_weather", {"city": city}) for city in ("Athens", "Thessaloniki")]
+    ]
+    assistant = Assistant.create(
+        "Bench",
+        "Echo.",
+        functions=[get_weather],
+        poll_strategy=FAST_POLLING,
+        tool_executor=ToolExecutor(max_workers=2),
+    )
+
+    def ask():
+        assistant.conversation.create().ask("What's the weather?")
+
+    results = report(ask)
+    # As for `ask()`, plus submitting the tool outputs.
+    assert results["requests"] == 4
+    assert len(fake_openai.tool_outputs[-1]) == 2
+
+
+def test_benchmark_ask_many(fake_openai, report):
+    fake_openai.latency = 0.005
+    fake_openai.run_duration = 0.02
+    assistant = Assistant.create("Bench", "Echo.", poll_strategy=FAST_POLLING)
+    prompts = [f"Prompt {i}" for i in range(10)]
+
+    def ask_many():
+        results = list(assistant.ask_many(prompts, concurrency=10))
+        assert all(r.error is None for r in results)
+
+    results = report(ask_many)
+    assert results["requests"] >= 3 * len(prompts)
+
+
+def test_benchmark_async_ask(fake_openai, report):
+    loop = asyncio.new_event_loop()
+    assistant = loop.run_until_complete(
+        AsyncAssistant.create("Bench", "Echo.", poll_strategy=FAST_POLLING)
+    )
+
+    async def ask():
+        conversation = await assistant.conversation.create()
+        await conversation.ask("How are you?")
+
+    try:
+        results = report(lambda: loop.run_until_complete(ask()))
+    finally:
+        loop.close()
+    assert results["requests"] == 3
@@ -0,0 +1,132 @@
+import asyncio
+import time
+
+from openai.types.beta import Assistant as AssistantObject
+
+from ez_openai import ASSISTANT_CACHE
+from ez_openai import Assistant
+from ez_openai import AsyncAssistant
+from ez_openai import openai_function
+from ez_openai.assistant import _modify_params
+from ez_openai.assistant import _needs_update
+from ez_openai.cache import TTLCache
+
+
+@openai_function(descriptions={"city": "The city to get the weather for."})
+def get_weather(city: str):
+    """Get the weather for a given city."""
+    return {"temperature": 26}
+
+
+def test_ttl_cache_expires_and_evicts():
+    evicted = []
+    cache = TTLCache(maxsize=2, ttl=0.05, on_evict=lambda k, v: evicted.append(k))
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    # "b" was the least recently used.
+    assert evicted == ["b"]
+    assert "a" in cache and "c" in cache
+
+    time.sleep(0.06)
+    assert cache.get("a") is None
+    cache.expire()
+    assert sorted(evicted) == ["a", "b", "c"]
+    assert len(cache) == 0
+
+
+def test_get_uses_the_cache(fake_openai):
+    ASSISTANT_CACHE.clear()
+    assistant = Assistant.create(name="Cached")
+
+    Assistant.get(assistant.id)
+    assert fake_openai.requests["GET /assistants/asst"] == 0
+
+    Assistant.get(assistant.id, cache=False)
+    assert fake_openai.requests["GET /assistants/asst"] == 1
+
+    ASSISTANT_CACHE.clear()
+    assert Assistant.get(assistant.id, trusted=True).id == assistant.id
+    assert fake_openai.requests["GET /assistants/asst"] == 1
+
+
+def test_get_and_modify_only_updates_changes(fake_openai):
+    ASSISTANT_CACHE.clear()
+    assistant = Assistant.create(
+        name="Weatherperson", instructions="Be nice.", functions=[get_weather]
+    )
+    ASSISTANT_CACHE.clear()
+
+    def modify(**kwargs):
+        params = {
+            "name": "Weatherperson",
+            "instructions": "Be nice.",
+            "functions": [get_weather],
+        }
+        params.update(kwargs)
+        return Assistant.get_and_modify(assistant.id, **params)
+
+    modify()
+    assert fake_openai.requests["GET /assistants/asst"] == 1
+    assert fake_openai.requests["POST /assistants/asst"] == 0
+
+    modify(instructions="Be mean.")
+    assert fake_openai.requests["POST /assistants/asst"] == 1
+
+    modify(instructions="Be mean.")
+    modify(instructions="Be mean.", trusted=True)
+    assert fake_openai.requests["GET /assistants/asst"] == 1
+    assert fake_openai.requests["POST /assistants/asst"] == 1
+
+
+def test_needs_update_ignores_api_defaults():
+    # What the API returns for an assistant created with `get_weather`, and no
+    # instructions.
+    function = get_weather._openai_fn["function"]
+    existing = AssistantObject.model_validate(
+        {
+            "id": "asst_1",
+            "object": "assistant",
+            "created_at": 0,
+            "name": "Weatherperson",
+            "description": None,
+            "instructions": None,
+            "model": "gpt-4o",
+            "metadata": {},
+            "temperature": 1.0,
+            "top_p": 1.0,
+            "response_format": "auto",
+            "tools": [{"type": "function", "function": {**function, "strict": False}}],
+        }
+    )
+
+    def params(**kwargs):
+        args = dict(
+            name="Weatherperson",
+            instructions="",
+            model="gpt-4o",
+            temperature=None,
+            response_format=None,
+            functions={"get_weather": get_weather},
+        )
+        args.update(kwargs)
+        return _modify_params(**args)
+
+    assert not _needs_update(existing, params())
+    assert _needs_update(existing, params(instructions="Be nice."))
+    assert _needs_update(existing, params(functions={}))
+    assert "strict" not in get_weather._openai_fn["function"]
+
+
+def test_async_create_caches_the_assistant(fake_openai):
+    ASSISTANT_CACHE.clear()
+
+    async def main():
+        assistant = await AsyncAssistant.create(name="Cached")
+        await AsyncAssistant.get(assistant.id)
+        return assistant
+
+    assistant = asyncio.run(main())
+    assert ASSISTANT_CACHE.get(assistant.id) is assistant._assistant
+    assert fake_openai.requests["GET /assistants/asst"] == 0
@@ -0,0 +1,159 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import openai
+import pytest
+
+from ez_openai import AsyncChatAssistant
+from ez_openai import ChatAssistant
+from ez_openai import RateLimiter
+from ez_openai import openai_function
+
+
+@openai_function(descriptions={"city": "The city to get the weather for."})
+def get_weather(city: str):
+    """Get the weather for a city."""
+    return {"city": city, "temperature": 26}
+
+
+def weather_script(prompt):
+    if "weather" not in prompt:
+        return []
+    return [[("get_weather", {"city": "Athens"}), ("get_weather", {"city": "Paris"})]]
+
+
+def test_chat_ask(fake_openai):
+    fake_openai.tool_calls = weather_script
+    ass = ChatAssistant.create(instructions="Be helpful.", functions=[get_weather])
+    conversation = ass.conversation.create()
+
+    reply = conversation.ask("What's the weather like?")
+    assert reply.text == "You said: What's the weather like?"
+    assert len(fake_openai.tool_outputs[0]) == 2
+    assert '"Paris"' in fake_openai.tool_outputs[0][1]["output"]
+    assert len(reply.stats.tool_rounds) == 1
+    assert reply.stats.total_tokens > 0
+    assert reply.stats.requests == 2
+
+    # The history is kept locally, so each request only costs a completion.
+    conversation.ask("Thanks!")
+    assert fake_openai.requests["POST /chat/completions"] == 3
+    assert sum(fake_openai.requests.values()) == 3
+
+    again = ass.conversation.get(conversation.id)
+    assert [m.text for m in again.history()] == [
+        "What's the weather like?",
+        "You said: What's the weather like?",
+        "Thanks!",
+        "You said: Thanks!",
+    ]
+    conversation.delete()
+    with pytest.raises(ValueError):
+        ass.conversation.get(conversation.id)
+
+
+def test_chat_failure_rolls_back(fake_openai):
+    def reply(prompt):
+        raise RuntimeError("Nope")
+
+    fake_openai.reply = reply
+    conversation = ChatAssistant.create().conversation.create()
+    with pytest.raises(Exception):
+        conversation.ask("Hi")
+    assert list(conversation.history()) == []
+
+
+def test_chat_stream(fake_openai):
+    fake_openai.tool_calls = weather_script
+    ass = ChatAssistant.create(functions=[get_weather])
+    conversation = ass.conversation.create()
+
+    stream = conversation.ask_stream("What's the weather like?", mode="text")
+    chunks = list(stream)
+    assert len(chunks) > 1
+    assert "".join(chunks) == stream.text_so_far == stream.value.text
+    assert stream.value.text == "You said: What's the weather like?"
+    assert len(fake_openai.tool_outputs[0]) == 2
+    assert stream.stats.deltas == len(chunks)
+    assert stream.stats.total_tokens > 0
+    assert stream.stats.requests == 2
+
+
+def test_async_chat(fake_openai):
+    async def main():
+        ass = await AsyncChatAssistant.create(functions=[get_weather])
+        conversation = await ass.conversation.create()
+        reply = await conversation.ask("What's the weather like?")
+
+        stream = conversation.ask_stream("Hello", mode="delta")
+        deltas = [delta async for delta in stream]
+        history = [m.text async for m in conversation.history()]
+        return reply, deltas, stream.value, history
+
+    fake_openai.tool_calls = weather_script
+    reply, deltas, final, history = asyncio.run(main())
+    assert reply.text == "You said: What's the weather like?"
+    assert reply.stats.requests == 2
+    assert final.stats.requests == 1
+    assert "".join(d.text for d in deltas) == final.text == "You said: Hello"
+    assert len(history) == 4
+
+
+def test_chat_stream_is_closed_when_abandoned(fake_openai, monkeypatch):
+    closed = []
+    close = openai.Stream.close
+
+    def record_close(self):
+        closed.append(self)
+        close(self)
+
+    monkeypatch.setattr(openai.Stream, "close", record_close)
+    conversation = ChatAssistant.create().conversation.create()
+    chunks = iter(conversation.ask_stream("Hello there", mode="text"))
+    assert next(chunks) == "You "
+    chunks.close()
+    assert len(closed) == 1
+    assert list(conversation.history()) == []
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_chat_uses_the_token_budget(fake_openai, stream):
+    limiter = RateLimiter(tokens_per_minute=600)
+    conversation = ChatAssistant.create(rate_limiter=limiter).conversation.create()
+    if stream:
+        generator = conversation.ask_stream("Hi there")
+        list(generator)
+        stats = generator.stats
+    else:
+        stats = conversation.ask("Hi there").stats
+
+    assert stats.total_tokens > 0
+    assert limiter._tokens is not None
+    # The bucket refills at 10 tokens a second, so allow for a little of that.
+    assert limiter._tokens.level < 600 - stats.total_tokens + 1
+
+
+def test_concurrent_chat_asks_take_turns(fake_openai):
+    fake_openai.tool_calls = weather_script
+    fake_openai.latency = 0.02
+    conversation = ChatAssistant.create(functions=[get_weather]).conversation.create()
+
+    with ThreadPoolExecutor(4) as executor:
+        replies = list(
+            executor.map(
+                lambda i: conversation.ask(f"What's the weather like in {i}?"),
+                range(4),
+            )
+        )
+    assert all(r.text.startswith("You said: What's the weather") for r in replies)
+
+    messages = conversation._thread.messages
+    assert sum(m.role == "user" for m in messages) == 4
+    for i, m in enumerate(messages):
+        if m.tool_calls:
+            ids = [c["id"] for c in m.tool_calls]
+            following = messages[i + 1 : i + 1 + len(ids)]
+            assert [o.tool_call_id for o in following] == ids
+    assert [m.id for m in ChatAssistant.create().store.load(conversation.id)] == [
+        m.id for m in messages
+    ]
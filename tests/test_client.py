@@ -0,0 +1,62 @@
+import asyncio
+
+import openai
+
+from ez_openai import Assistant
+from ez_openai import AsyncAssistant
+from ez_openai import ClientRegistry
+
+
+def test_assistants_share_clients():
+    registry = ClientRegistry()
+    first = Assistant(api_key="sk-1", client_registry=registry)
+    second = Assistant(api_key="sk-1", client_registry=registry)
+    other_key = Assistant(api_key="sk-2", client_registry=registry)
+    other_url = Assistant(
+        api_key="sk-1", base_url="http://localhost/v1", client_registry=registry
+    )
+
+    assert first._client is second._client
+    assert first._client is not other_key._client
+    assert first._client is not other_url._client
+    registry.close()
+
+
+def test_pool_settings_are_applied():
+    registry = ClientRegistry(max_connections=3, keepalive_expiry=5)
+    limits = registry._limits()
+    assert limits.max_connections == 3
+    assert limits.keepalive_expiry == 5
+
+
+def test_injected_client_is_used():
+    client = openai.OpenAI(api_key="sk-injected")
+    assert Assistant(client=client)._client is client
+
+
+def test_async_clients_are_shared_per_loop():
+    registry = ClientRegistry()
+
+    async def client():
+        first = AsyncAssistant(api_key="sk-1", client_registry=registry)
+        second = AsyncAssistant(api_key="sk-1", client_registry=registry)
+        assert first._client is second._client
+        return first._client
+
+    assert asyncio.run(client()) is not asyncio.run(client())
+
+
+def test_aclose_closes_async_clients():
+    registry = ClientRegistry()
+
+    async def close():
+        client = AsyncAssistant(api_key="sk-1", client_registry=registry)._client
+        await registry.aclose()
+        assert client.is_closed()
+        assert (
+            AsyncAssistant(api_key="sk-1", client_registry=registry)._client
+            is not client
+        )
+        await registry.aclose()
+
+    asyncio.run(close())
@@ -0,0 +1,51 @@
+from ez_openai import Assistant
+from ez_openai import PollStrategy
+
+
+def test_history_pages_and_caches(fake_openai, monkeypatch):
+    monkeypatch.setattr("ez_openai.assistant.PAGE_SIZE", 4)
+    assistant = Assistant.create(
+        name="Historian", poll_strategy=PollStrategy(initial=0, jitter=0)
+    )
+    conversation = assistant.conversation.create()
+    for i in range(3):
+        conversation.ask(f"Message {i}")
+
+    def list_calls():
+        return fake_openai.requests["GET /threads/thread/messages"]
+
+    before = list_calls()
+    texts = [m.text for m in conversation.history()]
+    assert texts == [
+        "Message 0",
+        "You said: Message 0",
+        "Message 1",
+        "You said: Message 1",
+        "Message 2",
+        "You said: Message 2",
+    ]
+    assert list_calls() - before == 2
+
+    # Cached messages don't need any requests, and the rest is fetched lazily.
+    before = list_calls()
+    next(conversation.history())
+    assert list_calls() == before
+
+    conversation.ask("Message 3")
+    before = list_calls()
+    texts = [m.text for m in conversation.history()]
+    assert texts[-2:] == ["Message 3", "You said: Message 3"]
+    assert len(texts) == 8
+    assert list_calls() - before == 1
+
+
+def test_ask_only_returns_the_runs_messages(fake_openai):
+    fake_openai.reply = lambda text: ["Let me think.", f"The answer to {text} is 42."]
+    assistant = Assistant.create(
+        name="Thinker", poll_strategy=PollStrategy(initial=0, jitter=0)
+    )
+    conversation = assistant.conversation.create()
+
+    messages = conversation.ask_all("life")
+    assert [m.text for m in messages] == ["Let me think.", "The answer to life is 42."]
+    assert conversation.ask("everything").text == "The answer to everything is 42."
@@ -0,0 +1,63 @@
+"""
+Checks that importing the package stays cheap.
+
+Imports are timed in a fresh interpreter with `python -X importtime`, and the total
+time is recorded as a test property (see `--junitxml`), like the other benchmarks.
+"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import ez_openai
+
+ROOT = Path(__file__).parent.parent
+
+# Packages that take a while to import, and that the decorator doesn't need.
+HEAVY = {"openai", "httpx", "pydantic", "anyio"}
+
+
+def _import_times(code: str) -> dict[str, float]:
+    """Run some code in a new interpreter, and return how long each import took."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "cumulative" not in line:
+            _, cumulative, name = line.split("|")
+            # Top-level imports are indented by one space, nested ones by more.
+            times[name.rstrip()] = int(cumulative) / 1e6
+    return times
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        "import ez_openai",
+        "from ez_openai import openai_function, ToolCache, ToolExecutor",
+        "from ez_openai import PollStrategy, RunQueue, MemoryStore",
+    ],
+)
+def test_import_doesnt_load_the_sdk(code, record_property):
+    times = _import_times(code)
+    top_level = [t for name, t in times.items() if not name.startswith("  ")]
+    record_property("import_time", sum(top_level))
+    modules = {name.strip() for name in times}
+    assert not {name.split(".")[0] for name in modules} & HEAVY
+    assert "ez_openai.assistant" not in modules
+
+
+def test_names_are_loaded_on_first_use():
+    from ez_openai.assistant import Assistant
+
+    assert ez_openai.Assistant is Assistant
+    assert "Assistant" in dir(ez_openai)
+    with pytest.raises(AttributeError):
+        ez_openai.NoSuchThing
@@ -0,0 +1,115 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from ez_openai import Assistant
+from ez_openai import ToolCache
+from ez_openai import openai_function
+
+
+def test_cache_hits_and_misses():
+    calls = []
+
+    @openai_function(
+        descriptions={"city": "The city.", "unit": "The unit."}, cache=True
+    )
+    def weather(city: str, unit: str = "c"):
+        """Get the weather."""
+        calls.append(city)
+        return {"city": city, "unit": unit}
+
+    cache = weather._openai_cache
+    assert weather(city="Athens") == {"city": "Athens", "unit": "c"}
+    # The same call, however it's spelled, is a hit.
+    assert weather("Athens", unit="c") == {"city": "Athens", "unit": "c"}
+    assert weather(city="Athens", unit="f") == {"city": "Athens", "unit": "f"}
+    assert calls == ["Athens", "Athens"]
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_cache_expires_and_skips_errors():
+    calls = []
+
+    @openai_function(descriptions={"n": "A number."}, cache=ToolCache(ttl=0.05))
+    def check(n: int):
+        """Check a number."""
+        calls.append(n)
+        if n < 0:
+            raise ValueError("Negative")
+        return n
+
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            check(n=-1)
+    check(n=1)
+    check(n=1)
+    time.sleep(0.1)
+    check(n=1)
+    assert calls == [-1, -1, 1, 1]
+
+
+def test_single_flight():
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    @openai_function(descriptions={"query": "What to look up."}, cache=True)
+    def lookup(query: str):
+        """Look something up."""
+        calls.append(query)
+        started.set()
+        release.wait(1)
+        return query.upper()
+
+    with ThreadPoolExecutor(4) as pool:
+        first = pool.submit(lookup, query="hi")
+        started.wait(1)
+        rest = [pool.submit(lookup, query="hi") for _ in range(3)]
+        time.sleep(0.05)
+        release.set()
+        results = [f.result() for f in [first, *rest]]
+
+    assert results == ["HI"] * 4
+    assert calls == ["hi"]
+    assert (lookup._openai_cache.hits, lookup._openai_cache.misses) == (3, 1)
+
+
+def test_async_single_flight():
+    calls = []
+
+    @openai_function(descriptions={"query": "What to look up."}, cache=True)
+    async def lookup(query: str):
+        """Look something up."""
+        calls.append(query)
+        await asyncio.sleep(0.05)
+        return query.upper()
+
+    async def main():
+        return await asyncio.gather(*(lookup(query="hi") for _ in range(5)))
+
+    assert asyncio.run(main()) == ["HI"] * 5
+    assert calls == ["hi"]
+
+
+def test_call_tools_uses_the_cache(fake_openai):
+    calls = []
+
+    @openai_function(descriptions={"city": "The city."}, cache=True)
+    def get_weather(city: str):
+        """Get the weather."""
+        calls.append(city)
+        return {"temperature": 26}
+
+    fake_openai.tool_calls = lambda prompt: [[("get_weather", {"city": "Athens"})]]
+    assistant = Assistant.create("test", "Echo.", functions=[get_weather])
+    for _ in range(3):
+        assistant.conversation.create().ask("What's the weather?")
+
+    assert calls == ["Athens"]
+    assert [outputs[0]["output"] for outputs in fake_openai.tool_outputs] == [
+        '{"temperature":26}'
+    ] * 3
+    assert get_weather._openai_cache.hits == 2
@@ -0,0 +1,229 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from ez_openai import Assistant
+from ez_openai import AsyncAssistant
+from ez_openai import PollStrategy
+from ez_openai import RunError
+from ez_openai import RunTimeoutError
+from ez_openai import openai_function
+from ez_openai.polling import RunStats
+
+
+def test_delays_back_off_up_to_the_cap():
+    strategy = PollStrategy(
+        initial=0.1, fast_polls=2, factor=2, max_interval=0.5, jitter=0
+    )
+    delays = strategy.delays()
+    assert [next(delays) for _ in range(6)] == [0.1, 0.1, 0.2, 0.4, 0.5, 0.5]
+
+
+def test_delays_stop_at_deadline():
+    strategy = PollStrategy(initial=0.01, jitter=0, timeout=0)
+    assert list(strategy.delays(strategy.deadline())) == []
+
+
+def test_jitter_stays_in_bounds():
+    strategy = PollStrategy(initial=1, fast_polls=100, jitter=0.2)
+    delays = strategy.delays()
+    for _ in range(100):
+        assert 0.8 <= next(delays) <= 1.2
+
+
+def _conversation(statuses, poll_strategy):
+    runs = iter(SimpleNamespace(id="run_1", status=status) for status in statuses)
+    cancelled = []
+    client = SimpleNamespace(
+        beta=SimpleNamespace(
+            threads=SimpleNamespace(
+                runs=SimpleNamespace(
+                    retrieve=lambda thread_id, run_id, timeout: next(runs),
+                    cancel=lambda run_id, thread_id: cancelled.append(run_id),
+                )
+            )
+        )
+    )
+    client.with_options = lambda max_retries: client
+    assistant = Assistant(api_key="sk-test", poll_strategy=poll_strategy)
+    assistant._client = client  # type: ignore
+    conversation = assistant.conversation
+    conversation._thread = SimpleNamespace(id="thread_1")
+    conversation.cancelled = cancelled  # type: ignore
+    return conversation
+
+
+def test_wait_for_run_counts_polls():
+    strategy = PollStrategy(initial=0, jitter=0)
+    conversation = _conversation(["in_progress", "completed"], strategy)
+    stats = RunStats()
+    run = conversation._wait_for_run(
+        SimpleNamespace(id="run_1", status="queued"), None, stats
+    )
+    assert run.status == "completed"
+    assert stats.polls == 2
+
+
+def test_wait_for_run_does_not_poll_finished_runs():
+    conversation = _conversation([], PollStrategy())
+    stats = RunStats()
+    conversation._wait_for_run(
+        SimpleNamespace(id="run_1", status="completed"), None, stats
+    )
+    assert stats.polls == 0
+
+
+def test_wait_for_run_times_out():
+    strategy = PollStrategy(initial=0.01, jitter=0, timeout=0.05)
+    conversation = _conversation(["in_progress"] * 100, strategy)
+    start = time.monotonic()
+    with pytest.raises(RunTimeoutError) as e:
+        conversation._wait_for_run(
+            SimpleNamespace(id="run_1", status="queued"),
+            strategy.deadline(),
+            RunStats(),
+        )
+    assert time.monotonic() - start < 1
+    assert e.value.run_id == "run_1"
+    assert conversation.cancelled == ["run_1"]  # type: ignore
+
+
+def test_wait_for_run_waits_while_cancelling():
+    conversation = _conversation(["cancelling", "expired"], PollStrategy(initial=0))
+    run = conversation._wait_for_run(
+        SimpleNamespace(id="run_1", status="in_progress"), None, RunStats()
+    )
+    assert run.status == "expired"
+
+
+def test_ask_timeout_cancels_run(fake_openai):
+    fake_openai.run_duration = 5
+    conversation = Assistant.create(
+        "test", poll_strategy=PollStrategy(initial=0.01, jitter=0)
+    ).conversation.create()
+
+    start = time.monotonic()
+    with pytest.raises(RunTimeoutError):
+        conversation.ask("Hi", timeout=0.1)
+    assert time.monotonic() - start < 2
+    assert fake_openai.requests["POST /threads/thread/runs/run/cancel"] == 1
+    assert [run["status"] for run in fake_openai.runs.values()] == ["cancelled"]
+
+
+def test_async_ask_timeout_cancels_run(fake_openai):
+    async def main():
+        assistant = await AsyncAssistant.create(
+            "test", poll_strategy=PollStrategy(initial=0.01, jitter=0)
+        )
+        conversation = await assistant.conversation.create()
+        await conversation.ask("Hi", timeout=0.1)
+
+    fake_openai.run_duration = 5
+    with pytest.raises(RunTimeoutError):
+        asyncio.run(main())
+    assert fake_openai.requests["POST /threads/thread/runs/run/cancel"] == 1
+
+
+def test_slow_requests_count_towards_the_timeout(fake_openai):
+    conversation = Assistant.create("test").conversation.create()
+    fake_openai.latency = 0.5
+
+    start = time.monotonic()
+    with pytest.raises(RunTimeoutError) as e:
+        conversation.ask("Hi", timeout=0.2)
+    assert time.monotonic() - start < 0.45
+    assert e.value.run_id is None
+    # The SDK didn't retry the request past the deadline.
+    assert fake_openai.requests["POST /threads/thread/runs"] == 1
+
+
+def test_slow_requests_cancel_the_run(fake_openai):
+    @openai_function(descriptions={})
+    def slow_down():
+        """Makes the API slow."""
+        fake_openai.latency = 0.5
+        fake_openai.run_duration = 5
+
+    fake_openai.tool_calls = lambda prompt: [[("slow_down", {})]]
+    conversation = Assistant.create(
+        "test",
+        functions=[slow_down],
+        poll_strategy=PollStrategy(initial=0.01, jitter=0),
+    ).conversation.create()
+
+    with pytest.raises(RunTimeoutError) as e:
+        conversation.ask("Hi", timeout=0.3)
+    [run] = fake_openai.runs.values()
+    assert e.value.run_id == run["id"]
+    assert (
+        fake_openai.requests["POST /threads/thread/runs/run/submit_tool_outputs"] == 1
+    )
+    assert run["status"] == "cancelled"
+
+
+def test_async_slow_requests_count_towards_the_timeout(fake_openai):
+    async def main():
+        assistant = await AsyncAssistant.create("test")
+        conversation = await assistant.conversation.create()
+        fake_openai.latency = 0.5
+        await conversation.ask("Hi", timeout=0.2)
+
+    start = time.monotonic()
+    with pytest.raises(RunTimeoutError):
+        asyncio.run(main())
+    assert time.monotonic() - start < 1
+    assert fake_openai.requests["POST /threads/thread/runs"] == 1
+
+
+def test_ask_stream_timeout_cancels_run(fake_openai):
+    fake_openai.token_rate = 20
+    fake_openai.reply = lambda prompt: "word " * 100
+    conversation = Assistant.create("test").conversation.create()
+
+    stream = conversation.ask_stream("Hi", mode="text", timeout=0.3)
+    with pytest.raises(RunTimeoutError) as e:
+        for _ in stream:
+            pass
+    assert e.value.run_id == stream.run_id
+    assert 0 < len(stream.text_so_far) < len("word " * 100)
+    assert fake_openai.requests["POST /threads/thread/runs/run/cancel"] == 1
+
+
+def test_failed_runs_raise(fake_openai):
+    def reply(prompt):
+        raise RuntimeError("The server is on fire")
+
+    fake_openai.reply = reply
+    conversation = Assistant.create(
+        "test", poll_strategy=PollStrategy(initial=0.01, jitter=0)
+    ).conversation.create()
+
+    with pytest.raises(RunError, match="on fire") as e:
+        conversation.ask("Hi")
+    assert e.value.status == "failed"
+    with pytest.raises(RunError, match="on fire"):
+        list(conversation.ask_stream("Hi"))
+
+
+def test_ask_records_stats_and_calls_hook(fake_openai):
+    fake_openai.run_duration = 0.05
+    seen = []
+    assistant = Assistant.create(
+        "test",
+        "Echo things back.",
+        poll_strategy=PollStrategy(initial=0.01, jitter=0),
+        stats_hook=seen.append,
+    )
+    message = assistant.conversation.create().ask("Three little words")
+
+    stats = message.stats
+    assert seen == [stats]
+    assert stats.polls >= 1
+    assert stats.queue_time is not None
+    assert stats.duration is not None and stats.duration >= stats.queue_time
+    assert stats.tool_rounds == []
+    assert stats.prompt_tokens == 3
+    assert stats.completion_tokens == len(message.text.split())
+    assert stats.total_tokens == stats.prompt_tokens + stats.completion_tokens
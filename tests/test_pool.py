@@ -0,0 +1,82 @@
+import asyncio
+import time
+
+import pytest
+
+from ez_openai import Assistant
+from ez_openai import AsyncAssistant
+from ez_openai import WarmThreadPool
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_low_watermark_must_be_below_size():
+    with pytest.raises(ValueError):
+        WarmThreadPool(size=2, low_watermark=2)
+
+
+def test_pool_hands_out_threads_and_refills(fake_openai):
+    pool = WarmThreadPool(size=3, low_watermark=1)
+    assistant = Assistant.create("test", thread_pool=pool)
+    wait_for(lambda: len(pool) == 3)
+    assert fake_openai.requests["POST /threads"] == 3
+
+    first = assistant.conversation.create()
+    assert first.id in fake_openai.threads
+    # Still above the low watermark, so nothing has been created since.
+    assert len(pool) == 2
+    assert fake_openai.requests["POST /threads"] == 3
+    assert first.ask("Hi").text == "You said: Hi"
+
+    # Dropping to the low watermark refills the pool.
+    second = assistant.conversation.create()
+    assert first.id != second.id
+    wait_for(lambda: len(pool) == 3)
+    assert fake_openai.requests["POST /threads"] == 5
+    assert (pool.hits, pool.misses) == (2, 0)
+
+    pool.close()
+    assert len(pool) == 0
+    assert fake_openai.requests["DELETE /threads/thread"] == 3
+    # A closed pool doesn't hand out threads, so they're created as usual.
+    assert assistant.conversation.create().id in fake_openai.threads
+    assert pool.misses == 1
+
+
+def test_pool_expires_threads(fake_openai):
+    pool = WarmThreadPool(size=2, low_watermark=0, ttl=0.05)
+    assistant = Assistant.create("test", thread_pool=pool)
+    wait_for(lambda: len(pool) == 2)
+    time.sleep(0.1)
+
+    conversation = assistant.conversation.create()
+    assert conversation.id in fake_openai.threads
+    assert pool.misses == 1
+    # The expired threads are deleted, and replaced.
+    wait_for(lambda: fake_openai.requests["DELETE /threads/thread"] == 2)
+    wait_for(lambda: len(pool) == 2)
+    pool.close()
+
+
+def test_async_pool(fake_openai):
+    pool = WarmThreadPool(size=2, low_watermark=0)
+
+    async def main():
+        assistant = await AsyncAssistant.create("test", thread_pool=pool)
+        while len(pool) < 2:
+            await asyncio.sleep(0.01)
+        created = fake_openai.requests["POST /threads"]
+        conversation = await assistant.conversation.create()
+        reply = await conversation.ask("Hi")
+        await pool.aclose()
+        return created, reply
+
+    created, reply = asyncio.run(main())
+    assert created == 2
+    assert reply.text == "You said: Hi"
+    assert fake_openai.requests["DELETE /threads/thread"] == 1
@@ -0,0 +1,173 @@
+import asyncio
+import time
+
+import openai
+import pytest
+
+from ez_openai import Assistant
+from ez_openai import AsyncAssistant
+from ez_openai import PollStrategy
+from ez_openai import RateLimiter
+from ez_openai.ratelimit import _parse_duration
+
+
+@pytest.mark.parametrize(
+    "value,seconds",
+    [("1s", 1), ("6m0s", 360), ("20ms", 0.02), ("1m30.5s", 90.5), ("2", 2)],
+)
+def test_parse_duration(value, seconds):
+    assert _parse_duration(value) == pytest.approx(seconds)
+
+
+def test_acquire_waits_for_the_request_bucket():
+    limiter = RateLimiter(requests_per_minute=6000)
+    assert limiter.acquire() == 0
+
+    limiter.update({"x-ratelimit-remaining-requests": "0"})
+    assert limiter.acquire() == pytest.approx(0.01, abs=0.005)
+    assert limiter.stats.calls == 2
+    assert limiter.stats.throttled_calls == 1
+
+
+def test_runs_wait_until_token_debt_is_paid():
+    limiter = RateLimiter(tokens_per_minute=60000)
+    limiter.record_usage(60100)
+
+    # Only runs need tokens.
+    assert limiter.acquire() == 0
+    assert limiter.acquire(uses_tokens=True) == pytest.approx(0.101, abs=0.01)
+
+
+def test_pause_holds_everyone_back():
+    limiter = RateLimiter()
+    limiter.pause({"retry-after-ms": "50"}, attempt=0)
+    start = time.monotonic()
+    limiter.acquire()
+    assert time.monotonic() - start >= 0.05
+    assert limiter.stats.rate_limit_errors == 1
+
+
+def test_assistant_calls_go_through_the_limiter(fake_openai):
+    limiter = RateLimiter(requests_per_minute=10000)
+    assistant = Assistant.create(
+        name="Limited",
+        rate_limiter=limiter,
+        poll_strategy=PollStrategy(initial=0.01, jitter=0),
+    )
+    message = assistant.conversation.create().ask("Hi")
+
+    assert message.text == "You said: Hi"
+    assert limiter.stats.calls == sum(fake_openai.requests.values())
+
+
+def test_async_assistant_calls_go_through_the_limiter(fake_openai):
+    limiter = RateLimiter(requests_per_minute=10000)
+
+    async def main():
+        assistant = await AsyncAssistant.create(
+            name="Limited",
+            rate_limiter=limiter,
+            poll_strategy=PollStrategy(initial=0.01, jitter=0),
+        )
+        conversation = await assistant.conversation.create()
+        message = await conversation.ask("Hi")
+        chunks = [c async for c in conversation.ask_stream("Again", mode="text")]
+        return message, "".join(chunks)
+
+    message, streamed = asyncio.run(main())
+    assert message.text == "You said: Hi"
+    assert streamed == "You said: Again"
+    assert limiter.stats.calls == sum(fake_openai.requests.values())
+
+
+def test_the_limiter_retries_rate_limited_calls(fake_openai):
+    limiter = RateLimiter()
+    assistant = Assistant.create(name="Limited", rate_limiter=limiter)
+    fake_openai.rate_limited = 2
+    start = time.monotonic()
+    conversation = assistant.conversation.create()
+
+    assert conversation.id in fake_openai.threads
+    # The SDK didn't retry them itself, so the limiter saw both and waited.
+    assert limiter.stats.rate_limit_errors == 2
+    assert fake_openai.requests["POST /threads"] == 3
+    assert time.monotonic() - start >= 0.1
+
+
+def test_the_limiter_retries_streams(fake_openai):
+    limiter = RateLimiter()
+    conversation = Assistant.create(
+        name="Limited", rate_limiter=limiter
+    ).conversation.create()
+    fake_openai.rate_limited = 1
+
+    assert "".join(conversation.ask_stream("Hi", mode="text")) == "You said: Hi"
+    assert limiter.stats.rate_limit_errors == 1
+    assert fake_openai.requests["POST /threads/thread/runs"] == 2
+
+
+def test_async_streams_wait_on_the_event_loop(fake_openai):
+    limiter = RateLimiter()
+    fake_openai.retry_after = 0.3
+    ticks = 0
+
+    async def tick():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.02)
+            ticks += 1
+
+    async def main():
+        assistant = await AsyncAssistant.create(name="Limited", rate_limiter=limiter)
+        conversation = await assistant.conversation.create()
+        ticker = asyncio.create_task(tick())
+        fake_openai.rate_limited = 1
+        chunks = [c async for c in conversation.ask_stream("Hi", mode="text")]
+        ticker.cancel()
+        return "".join(chunks)
+
+    assert asyncio.run(main()) == "You said: Hi"
+    assert limiter.stats.rate_limit_errors == 1
+    # The ticker kept running while the stream waited out the 429.
+    assert ticks >= 5
+
+
+def test_the_limiter_retries_server_errors(fake_openai):
+    limiter = RateLimiter()
+    assistant = Assistant.create(name="Limited", rate_limiter=limiter)
+    fake_openai.server_errors = 1
+
+    assert assistant.conversation.create().id in fake_openai.threads
+    assert fake_openai.requests["POST /threads"] == 2
+    assert limiter.stats.rate_limit_errors == 0
+
+    # As many times as the client would have retried them itself.
+    fake_openai.server_errors = 3
+    with pytest.raises(openai.InternalServerError):
+        assistant.conversation.create()
+    assert fake_openai.requests["POST /threads"] == 5
+
+
+@pytest.mark.parametrize("is_async", [False, True])
+def test_streams_use_the_token_budget(fake_openai, is_async):
+    limiter = RateLimiter(tokens_per_minute=600)
+
+    async def astream():
+        assistant = await AsyncAssistant.create(name="Limited", rate_limiter=limiter)
+        conversation = await assistant.conversation.create()
+        generator = conversation.ask_stream("Hi there")
+        [_ async for _ in generator]
+        return generator.stats
+
+    if is_async:
+        stats = asyncio.run(astream())
+    else:
+        assistant = Assistant.create(name="Limited", rate_limiter=limiter)
+        generator = assistant.conversation.create().ask_stream("Hi there")
+        list(generator)
+        stats = generator.stats
+
+    assert stats.total_tokens > 0
+    assert limiter._tokens is not None
+    # The bucket refills at 10 tokens a second, so allow for a little of that.
+    assert limiter._tokens.level < 600 - stats.total_tokens + 1
@@ -0,0 +1,200 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from ez_openai import Assistant
+from ez_openai import AsyncAssistant
+from ez_openai import AsyncChatAssistant
+from ez_openai import PollStrategy
+from ez_openai import RunQueue
+from ez_openai import RunTimeoutError
+from ez_openai import ThreadLock
+
+FAST = PollStrategy(initial=0.01, jitter=0)
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+class RecordingLock(ThreadLock):
+    def __init__(self, available=True):
+        self.available = available
+        self.calls = []
+
+    def acquire(self, thread_id, timeout):
+        self.calls.append(("acquire", thread_id))
+        return self.available
+
+    def release(self, thread_id):
+        self.calls.append(("release", thread_id))
+
+
+def test_concurrent_asks_take_turns_and_coalesce(fake_openai):
+    fake_openai.run_duration = 0.2
+    queue = RunQueue()
+    assistant = Assistant.create("test", poll_strategy=FAST, run_queue=queue)
+    conversation = assistant.conversation.create()
+    replies = {}
+
+    def ask(message):
+        # Each request gets its own conversation object, as it would in a web app.
+        other = assistant.conversation.get(conversation.id)
+        replies[message] = other.ask(message)
+
+    first = threading.Thread(target=ask, args=("one",))
+    first.start()
+    wait_for(lambda: fake_openai.requests["POST /threads/thread/runs"] == 1)
+    later = [threading.Thread(target=ask, args=(m,)) for m in ("two", "three")]
+    for thread in later:
+        thread.start()
+        # Make sure they're queued in order.
+        wait_for(lambda: queue.runs + queue.coalesced == 2 + later.index(thread))
+    for thread in [first, *later]:
+        thread.join()
+
+    # The two messages sent while the first run was active went into one run.
+    assert fake_openai.requests["POST /threads/thread/runs"] == 2
+    assert (queue.runs, queue.coalesced) == (2, 1)
+    assert replies["one"].text == "You said: one"
+    assert replies["two"].id == replies["three"].id
+    assert replies["three"].text == "You said: three"
+    user_messages = [
+        m["content"][0]["text"]["value"]
+        for m in fake_openai.threads[conversation.id]
+        if m["role"] == "user"
+    ]
+    assert user_messages == ["one", "two", "three"]
+    assert not queue._slots
+
+
+def test_asks_from_other_assistants_are_not_coalesced(fake_openai):
+    fake_openai.run_duration = 0.2
+    queue = RunQueue()
+    first = Assistant.create("first", poll_strategy=FAST, run_queue=queue)
+    second = Assistant.create("second", poll_strategy=FAST, run_queue=queue)
+    conversation = first.conversation.create()
+    replies = {}
+
+    def ask(assistant, message):
+        other = assistant.conversation.get(conversation.id)
+        replies[message] = other.ask(message)
+
+    threads = [
+        threading.Thread(target=ask, args=(assistant, message))
+        for assistant, message in (
+            (first, "one"),
+            (first, "two"),
+            (second, "from second"),
+        )
+    ]
+    threads[0].start()
+    wait_for(lambda: fake_openai.requests["POST /threads/thread/runs"] == 1)
+    for i, thread in enumerate(threads[1:], 2):
+        thread.start()
+        wait_for(lambda: queue.runs + queue.coalesced == i)
+    for thread in threads:
+        thread.join()
+
+    assert (queue.runs, queue.coalesced) == (3, 0)
+    assert replies["from second"].text == "You said: from second"
+    assert [run["assistant_id"] for run in fake_openai.runs.values()] == [
+        first.id,
+        first.id,
+        second.id,
+    ]
+
+
+def test_streams_wait_their_turn(fake_openai):
+    fake_openai.run_duration = 0.2
+    assistant = Assistant.create("test", poll_strategy=FAST, run_queue=RunQueue())
+    conversation = assistant.conversation.create()
+
+    asking = threading.Thread(target=conversation.ask, args=("one",))
+    asking.start()
+    wait_for(lambda: fake_openai.requests["POST /threads/thread/runs"] == 1)
+    gen = conversation.ask_stream("two", mode="text")
+    assert "".join(gen) == "You said: two"
+    asking.join()
+
+
+def test_queue_wait_counts_towards_the_timeout(fake_openai):
+    fake_openai.run_duration = 0.5
+    queue = RunQueue()
+    assistant = Assistant.create("test", poll_strategy=FAST, run_queue=queue)
+    conversation = assistant.conversation.create()
+
+    asking = threading.Thread(target=conversation.ask, args=("one",))
+    asking.start()
+    wait_for(lambda: fake_openai.requests["POST /threads/thread/runs"] == 1)
+    with pytest.raises(RunTimeoutError):
+        conversation.ask("two", timeout=0.05)
+    asking.join()
+    # The message that timed out was never sent.
+    assert fake_openai.requests["POST /threads/thread/runs"] == 1
+    assert not queue._slots
+
+
+def test_thread_lock(fake_openai):
+    lock = RecordingLock()
+    assistant = Assistant.create("test", run_queue=RunQueue(lock=lock))
+    conversation = assistant.conversation.create()
+    conversation.ask("Hi")
+    assert lock.calls == [("acquire", conversation.id), ("release", conversation.id)]
+
+    lock.available = False
+    with pytest.raises(RunTimeoutError):
+        conversation.ask("Hi again")
+
+
+def test_async_asks_coalesce(fake_openai):
+    fake_openai.run_duration = 0.2
+    queue = RunQueue()
+
+    async def main():
+        assistant = await AsyncAssistant.create(
+            "test", poll_strategy=FAST, run_queue=queue
+        )
+        conversation = await assistant.conversation.create()
+        first = asyncio.create_task(conversation.ask("one"))
+        while fake_openai.requests["POST /threads/thread/runs"] < 1:
+            await asyncio.sleep(0.01)
+        return await asyncio.gather(
+            first, conversation.ask("two"), conversation.ask("three")
+        )
+
+    replies = asyncio.run(main())
+    assert fake_openai.requests["POST /threads/thread/runs"] == 2
+    assert [r.text for r in replies] == [
+        "You said: one",
+        "You said: three",
+        "You said: three",
+    ]
+    assert not queue._slots
+
+
+@pytest.mark.parametrize("assistant_class", [AsyncAssistant, AsyncChatAssistant])
+def test_async_streams_give_up_their_turn(fake_openai, assistant_class):
+    queue = RunQueue()
+
+    async def main():
+        if assistant_class is AsyncAssistant:
+            assistant = await AsyncAssistant.create(
+                "test", poll_strategy=FAST, run_queue=queue
+            )
+        else:
+            assistant = await AsyncChatAssistant.create(run_queue=queue)
+        conversation = await assistant.conversation.create()
+        stream = conversation.ask_stream("one", mode="text")
+        text = "".join([chunk async for chunk in stream])
+        # The stream is still referenced, but its turn is over.
+        assert not queue._slots
+        reply = await conversation.ask("two", timeout=3)
+        return text, stream.value.text, reply.text
+
+    assert asyncio.run(main()) == ("You said: one", "You said: one", "You said: two")
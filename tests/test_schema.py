@@ -0,0 +1,219 @@
+import datetime
+import enum
+import json
+from dataclasses import dataclass
+from dataclasses import field
+from types import SimpleNamespace
+from typing import Literal
+from typing import Optional
+from typing import TypedDict
+from typing import Union
+
+import pytest
+
+from ez_openai import Assistant
+from ez_openai import openai_function
+from ez_openai.schema import _decoder
+from ez_openai.schema import _dumps
+
+
+@dataclass
+class Point:
+    x: float
+    y: float = field(default=0.0, metadata={"description": "The height."})
+
+
+class Place(TypedDict):
+    name: str
+    points: list[Point]
+
+
+Unit = enum.Enum("Unit", ["c", "f"])
+
+
+@openai_function(
+    descriptions={
+        "places": "The places.",
+        "unit": "The unit.",
+        "limit": "How many.",
+        "mode": "The mode.",
+        "tags": "Some tags.",
+    }
+)
+def measure(
+    places: list[Place],
+    unit: Unit,
+    limit: Optional[int] = None,
+    mode: Literal["fast", "slow"] = "fast",
+    tags: dict[str, bool] | None = None,
+):
+    """Measure some places."""
+    return places, unit, limit, mode, tags
+
+
+def test_schema():
+    parameters = measure._openai_fn["function"]["parameters"]
+    assert parameters["required"] == ["places", "unit"]
+    properties = parameters["properties"]
+    assert properties["places"] == {
+        "type": "array",
+        "items": {
+            "type": "object",
+            "properties": {
+                "name": {"type": "string"},
+                "points": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "x": {"type": "number"},
+                            "y": {"type": "number", "description": "The height."},
+                        },
+                        "required": ["x"],
+                    },
+                },
+            },
+            "required": ["name", "points"],
+        },
+        "description": "The places.",
+    }
+    assert properties["unit"] == {
+        "type": "string",
+        "enum": ["c", "f"],
+        "description": "The unit.",
+    }
+    assert properties["limit"] == {
+        "type": ["integer", "null"],
+        "description": "How many.",
+    }
+    assert properties["mode"] == {"enum": ["fast", "slow"], "description": "The mode."}
+    assert properties["tags"] == {
+        "type": ["object", "null"],
+        "additionalProperties": {"type": "boolean"},
+        "description": "Some tags.",
+    }
+
+
+def test_decode_converts_nested_types():
+    arguments, error = measure._openai_decoder.decode(
+        json.dumps(
+            {
+                "places": [{"name": "Home", "points": [{"x": 1, "y": 2.5}, {"x": 3}]}],
+                "unit": "c",
+                "limit": "5",
+                "tags": {"nice": True},
+            }
+        )
+    )
+    assert error is None
+    assert arguments == {
+        "places": [{"name": "Home", "points": [Point(1.0, 2.5), Point(3.0)]}],
+        "unit": "c",
+        "limit": 5,
+        "tags": {"nice": True},
+    }
+    assert isinstance(arguments["places"][0]["points"][0].x, float)
+
+
+@pytest.mark.parametrize(
+    "arguments, message",
+    [
+        ("{not json", "not valid JSON"),
+        ("[]", "arguments: expected an object, got list"),
+        ('{"unit": "c"}', "arguments.places: missing"),
+        ('{"places": [], "unit": "k"}', "arguments.unit: expected one of"),
+        (
+            '{"places": [{"name": "A", "points": [{"y": 1}]}], "unit": "c"}',
+            "arguments.places[0].points[0].x: missing",
+        ),
+        ('{"places": [], "unit": "c", "limit": 1.5}', "arguments.limit"),
+        ('{"places": [], "unit": "c", "extra": 1}', "arguments.extra: unexpected"),
+    ],
+)
+def test_decode_rejects_bad_arguments(arguments, message):
+    decoded, error = measure._openai_decoder.decode(arguments)
+    assert decoded == {}
+    assert error is not None and message in error
+
+
+def test_bad_calls_are_reported_without_calling():
+    calls = []
+
+    @openai_function(descriptions={"n": "A number."})
+    def double(n: int):
+        """Double a number."""
+        calls.append(n)
+        return n * 2
+
+    assistant = Assistant(api_key="sk-test", functions=[double])
+    run = SimpleNamespace(
+        required_action=SimpleNamespace(
+            submit_tool_outputs=SimpleNamespace(
+                tool_calls=[
+                    SimpleNamespace(
+                        id=f"call_{i}",
+                        function=SimpleNamespace(name=name, arguments=arguments),
+                    )
+                    for i, (name, arguments) in enumerate(
+                        [
+                            ("double", '{"n": 2}'),
+                            ("double", '{"n": "two"}'),
+                            ("triple", '{"n": 2}'),
+                        ]
+                    )
+                ]
+            )
+        )
+    )
+
+    outputs = {
+        o["tool_call_id"]: json.loads(o["output"])
+        for o in assistant.conversation._call_tools(
+            run.required_action.submit_tool_outputs.tool_calls
+        )
+    }
+    assert calls == [2]
+    assert outputs["call_0"] == 4
+    assert "arguments.n: expected an integer" in outputs["call_1"]["error"]
+    assert outputs["call_2"] == {"error": "There is no function triple."}
+
+
+@pytest.mark.parametrize("masked", [False, True])
+def test_results_serialize_with_and_without_orjson(monkeypatch, masked):
+    if masked:
+        monkeypatch.setattr("ez_openai.schema.orjson", None)
+
+    @dataclass
+    class Result:
+        when: datetime.datetime
+        day: datetime.date
+
+    result = Result(datetime.datetime(2024, 1, 2, 3, 4, 5), datetime.date(2024, 1, 2))
+    assert json.loads(_dumps(result)) == {
+        "when": "2024-01-02T03:04:05",
+        "day": "2024-01-02",
+    }
+
+    class Level(enum.IntEnum):
+        LOW = 1
+
+    assert json.loads(_dumps({"unit": Unit.c, "levels": (Level.LOW,)})) == {
+        "unit": "c",
+        "levels": ["LOW"],
+    }
+
+
+@pytest.mark.parametrize(
+    "annotation, value, expected",
+    [
+        (Union[int, str], "5", "5"),
+        (Union[int, str], 5, 5),
+        (Union[str, int], 5, 5),
+        (Union[float, str], 5, 5.0),
+        (Union[int, str], 5.0, 5),
+    ],
+)
+def test_unions_prefer_exact_types(annotation, value, expected):
+    decoded = _decoder(annotation)(value, "value")
+    assert decoded == expected
+    assert type(decoded) is type(expected)
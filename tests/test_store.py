@@ -0,0 +1,176 @@
+import time
+
+import pytest
+
+from ez_openai import ChatAssistant
+from ez_openai import LogStore
+from ez_openai import MemoryStore
+from ez_openai import SQLiteStore
+from ez_openai.store import ChatMessage
+from ez_openai.store import _decode
+from ez_openai.store import _encode
+from ez_openai.store import truncate_history
+
+
+def message(role, content, **kwargs):
+    return ChatMessage(f"msg_{role}_{content}", role, content, **kwargs)
+
+
+@pytest.fixture(params=["memory", "sqlite", "log"])
+def make_store(request, tmp_path):
+    def make():
+        if request.param == "memory":
+            return MemoryStore()
+        if request.param == "sqlite":
+            return SQLiteStore(tmp_path / "conversations.db")
+        return LogStore(tmp_path / "conversations.log")
+
+    return make
+
+
+def test_store(make_store):
+    store = make_store()
+    assert store.load("chat_1") is None
+    store.create("chat_1")
+    store.create("chat_2")
+    assert store.load("chat_1") == []
+
+    call = {
+        "id": "call_1",
+        "type": "function",
+        "function": {"name": "f", "arguments": "{}"},
+    }
+    store.append(
+        "chat_1", [message("user", "Hi"), message("assistant", None, tool_calls=[call])]
+    )
+    store.append("chat_1", [message("tool", "42", tool_call_id="call_1")])
+    store.append("chat_2", [message("user", [{"type": "text", "text": "Hey"}])])
+
+    loaded = store.load("chat_1")
+    assert [m.role for m in loaded] == ["user", "assistant", "tool"]
+    assert loaded[1].tool_calls == [call]
+    assert loaded[2].to_param() == {
+        "role": "tool",
+        "content": "42",
+        "tool_call_id": "call_1",
+    }
+    assert store.load("chat_2")[0].content == [{"type": "text", "text": "Hey"}]
+
+    store.delete("chat_1")
+    assert store.load("chat_1") is None
+    assert len(store.load("chat_2")) == 1
+
+    # Every store refuses to add to a conversation that doesn't exist.
+    for id in ("chat_1", "chat_3"):
+        with pytest.raises(ValueError):
+            store.append(id, [message("user", "Hi")])
+    assert store.load("chat_1") is None
+
+
+def test_memory_store_ttl_restarts_on_use():
+    store = MemoryStore(ttl=0.1)
+    store.create("chat_1")
+    time.sleep(0.06)
+    assert store.load("chat_1") == []
+    time.sleep(0.06)
+    store.append("chat_1", [message("user", "Hi")])
+    time.sleep(0.06)
+    assert len(store.load("chat_1")) == 1
+    time.sleep(0.15)
+    assert store.load("chat_1") is None
+
+
+def test_stores_persist(tmp_path):
+    for store_class, path in (
+        (SQLiteStore, tmp_path / "conversations.db"),
+        (LogStore, tmp_path / "conversations.log"),
+    ):
+        store = store_class(path)
+        store.create("chat_1")
+        store.append("chat_1", [message("user", "Hi")])
+        store.close()
+
+        store = store_class(path)
+        assert [m.content for m in store.load("chat_1")] == ["Hi"]
+        store.close()
+
+
+def test_log_store_recovery_and_compaction(tmp_path):
+    path = tmp_path / "conversations.log"
+    store = LogStore(path)
+    for id in ("chat_1", "chat_2"):
+        store.create(id)
+        store.append(id, [message("user", "Hi")])
+    store.delete("chat_1")
+    store.close()
+
+    # A write that was cut short is dropped when the log is opened again.
+    with open(path, "ab") as f:
+        f.write(b"\x01\x06\x00")
+    store = LogStore(path)
+    assert store.load("chat_1") is None
+    store.append("chat_2", [message("assistant", "Hello")])
+
+    size = path.stat().st_size
+    store.compact()
+    assert path.stat().st_size < size
+    assert [m.content for m in store.load("chat_2")] == ["Hi", "Hello"]
+    store.close()
+
+
+def test_encoding():
+    messages = [message("user", "Hi"), message("assistant", "Hello")]
+    decoded = _decode(_encode(messages))
+    assert [m.to_record() for m in decoded] == [m.to_record() for m in messages]
+
+
+def test_truncate_history():
+    call = {
+        "id": "call_1",
+        "type": "function",
+        "function": {"name": "f", "arguments": "{}"},
+    }
+    messages = [
+        message("user", "a" * 400),
+        message("assistant", "b" * 400),
+        message("user", "What's f?"),
+        message("assistant", None, tool_calls=[call]),
+        message("tool", "42", tool_call_id="call_1"),
+        message("assistant", "It's 42."),
+        message("user", "Thanks!"),
+    ]
+    assert truncate_history(messages, None) is messages
+    assert truncate_history(messages, 10_000) == messages
+    # Tool calls aren't separated from their outputs.
+    assert truncate_history(messages, 50) == messages[2:]
+    # The last message is kept, however long it is.
+    assert truncate_history(messages, 1) == messages[-1:]
+
+
+def test_chat_assistant_store(fake_openai, tmp_path):
+    store = SQLiteStore(tmp_path / "conversations.db")
+    conversation = ChatAssistant.create(store=store).conversation.create()
+    conversation.ask("Hi")
+
+    # Another assistant (e.g. in another process) can pick the conversation up.
+    other = ChatAssistant.create(store=store, max_history_tokens=5)
+    again = other.conversation.get(conversation.id)
+    assert [m.text for m in again.history()] == ["Hi", "You said: Hi"]
+    assert again.ask("Bye").text == "You said: Bye"
+    assert len(store.load(conversation.id)) == 4
+    # Only the latest exchange fits in the budget.
+    assert [m["content"] for m in again._params(None)["messages"]] == [
+        "Bye",
+        "You said: Bye",
+    ]
+
+
+def test_failed_store_append_rolls_back_history(fake_openai):
+    store = MemoryStore()
+    conversation = ChatAssistant.create(store=store).conversation.create()
+    conversation.ask("Hi")
+    store.delete(conversation.id)
+
+    with pytest.raises(ValueError):
+        conversation.ask("Bye")
+    assert [m.text for m in conversation.history()] == ["Hi", "You said: Hi"]
@@ -0,0 +1,155 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from ez_openai import Assistant
+from ez_openai import EZDelta
+from ez_openai import sse_stream
+from ez_openai.streaming import TextBuffer
+
+
+def _event(event, data):
+    return SimpleNamespace(event=event, data=data)
+
+
+def _delta(text):
+    return SimpleNamespace(
+        content=[SimpleNamespace(type="text", text=SimpleNamespace(value=text))]
+    )
+
+
+class FakeStreamManager:
+    def __init__(self, events):
+        self.events = events
+
+    def __enter__(self):
+        return iter(self.events)
+
+    def __exit__(self, *args):
+        return False
+
+
+def _conversation(chunks):
+    events = [_event("thread.run.created", SimpleNamespace(id="run_1"))]
+    events += [
+        _event("thread.message.delta", SimpleNamespace(id="msg_1", delta=_delta(c)))
+        for c in chunks
+    ]
+    completed = SimpleNamespace(id="msg_1", **vars(_delta("".join(chunks))))
+    events.append(_event("thread.message.completed", completed))
+    cancelled = []
+    runs = SimpleNamespace(
+        stream=lambda **kwargs: FakeStreamManager(events),
+        cancel=lambda run_id, thread_id: cancelled.append(run_id),
+    )
+    messages = SimpleNamespace(create=lambda *args, **kwargs: None)
+
+    assistant = Assistant(api_key="sk-test")
+    assistant._client = SimpleNamespace(  # type: ignore
+        beta=SimpleNamespace(threads=SimpleNamespace(runs=runs, messages=messages))
+    )
+    assistant._assistant = SimpleNamespace(id="asst_1")
+    conversation = assistant.conversation
+    conversation._thread = SimpleNamespace(id="thread_1")
+    conversation.cancelled = cancelled  # type: ignore
+    return conversation
+
+
+def test_text_buffer():
+    buffer = TextBuffer()
+    assert buffer.text == ""
+    for chunk in ("Hel", "", "lo", " there"):
+        buffer.append(chunk)
+    assert buffer.text == "Hello there"
+    buffer.append("!")
+    assert buffer.text == "Hello there!"
+
+
+@pytest.mark.parametrize(
+    "mode, expected",
+    [("text", str), ("delta", EZDelta)],
+)
+def test_stream_modes(mode, expected):
+    conversation = _conversation(["Hel", "lo", "!"])
+    stream = conversation.ask_stream("Hi", mode=mode)
+
+    seen = []
+    for item in stream:
+        assert isinstance(item, expected)
+        seen.append(str(item))
+        assert stream.text_so_far == "".join(seen)
+
+    assert seen == ["Hel", "lo", "!"]
+    assert stream.value is not None
+    assert stream.value.text == "Hello!"
+
+
+def test_stream_records_stats():
+    conversation = _conversation(["Hel", "lo", "!"])
+    stream = conversation.ask_stream("Hi", mode="text")
+    list(stream)
+
+    stats = stream.stats
+    assert stats.deltas == 3
+    assert stats.time_to_first_token is not None
+    assert stats.duration is not None
+    assert stats.duration >= stats.time_to_first_token
+    assert stats.max_delta_gap <= stats.duration
+    assert stream.value is not None and stream.value.stats is stats
+
+
+def test_stream_messages_by_default():
+    conversation = _conversation(["Hi"])
+    stream = conversation.ask_stream("Hi")
+    assert [m.id for m in stream] == ["msg_1"]
+    assert stream.text_so_far == "Hi"
+
+
+def _parse(frames):
+    events = []
+    for frame in frames:
+        event, data = frame.decode().rstrip("\n").split("\n")
+        events.append((event.removeprefix("event: "), json.loads(data[6:])))
+    return events
+
+
+def test_sse_stream_coalesces_deltas():
+    conversation = _conversation(["a"] * 10 + ["\n"] * 5)
+
+    async def collect():
+        return [
+            f async for f in sse_stream(conversation, "Hi", max_bytes=4, max_delay=10)
+        ]
+
+    events = _parse(asyncio.run(collect()))
+    assert [e for e, _ in events] == ["delta"] * 4 + ["done"]
+    assert [d["text"] for _, d in events[:-1]] == ["aaaa", "aaaa", "aa\n\n", "\n\n\n"]
+    assert events[-1][1] == {"id": "msg_1", "text": "a" * 10 + "\n" * 5}
+    assert conversation.cancelled == []  # type: ignore
+
+
+def test_sse_stream_counts_bytes():
+    conversation = _conversation(["é"] * 4)
+
+    async def collect():
+        return [
+            f async for f in sse_stream(conversation, "Hi", max_bytes=4, max_delay=10)
+        ]
+
+    events = _parse(asyncio.run(collect()))
+    assert [d["text"] for _, d in events[:-1]] == ["éé", "éé"]
+
+
+def test_sse_stream_cancels_run_on_disconnect():
+    conversation = _conversation(["a"] * 10)
+
+    async def disconnect():
+        stream = sse_stream(conversation, "Hi", max_bytes=1)
+        first = await stream.__anext__()
+        await stream.aclose()
+        return first
+
+    assert _parse([asyncio.run(disconnect())]) == [("delta", {"text": "a"})]
+    assert conversation.cancelled == ["run_1"]  # type: ignore
@@ -0,0 +1,218 @@
+import asyncio
+import json
+import os
+import pickle
+import sys
+import time
+
+import pytest
+
+from ez_openai import Assistant
+from ez_openai import AsyncAssistant
+from ez_openai import ProcessToolPool
+from ez_openai import ToolExecutor
+from ez_openai import openai_function
+
+POOL = ProcessToolPool(max_workers=2, max_tasks_per_child=2, timeout=10)
+
+
+def slow(seconds: float):
+    time.sleep(seconds)
+    return seconds
+
+
+async def async_slow(seconds: float):
+    await asyncio.sleep(seconds)
+    return seconds
+
+
+def broken():
+    raise RuntimeError("Oh no")
+
+
+@openai_function(descriptions={"n": "A number"}, executor=POOL)
+def worker_pid(n: int):
+    """Returns the process ID it ran in."""
+    return [n, os.getpid()]
+
+
+@openai_function(descriptions={"n": "A number"}, executor=POOL)
+async def async_worker_pid(n: int):
+    """Returns the process ID it ran in."""
+    await asyncio.sleep(0)
+    return [n, os.getpid()]
+
+
+@openai_function(descriptions={"seconds": "How long to spin"}, executor=POOL)
+def spin(seconds: float):
+    """Keeps the CPU busy."""
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        pass
+
+
+def _outputs(tool_outputs):
+    return [
+        (output["tool_call_id"], json.loads(output["output"]))
+        for output in tool_outputs
+    ]
+
+
+def test_run_is_concurrent_and_ordered():
+    executor = ToolExecutor(max_workers=4)
+    start = time.monotonic()
+    outputs = executor.run(
+        [
+            ("call_1", slow, {"seconds": 0.3}),
+            ("call_2", slow, {"seconds": 0.1}),
+            ("call_3", async_slow, {"seconds": 0.2}),
+        ]
+    )
+    assert time.monotonic() - start < 0.5
+    assert _outputs(outputs) == [("call_1", 0.3), ("call_2", 0.1), ("call_3", 0.2)]
+    executor.shutdown()
+
+
+def test_run_reports_errors_and_timeouts():
+    executor = ToolExecutor(timeout=0.1)
+    outputs = executor.run(
+        [
+            ("call_1", broken, {}),
+            ("call_2", slow, {"seconds": 1}),
+            ("call_3", slow, {"seconds": 0}),
+        ]
+    )
+    assert _outputs(outputs) == [
+        ("call_1", {"error": "RuntimeError: Oh no"}),
+        ("call_2", {"error": "The function call timed out."}),
+        ("call_3", 0),
+    ]
+    executor.shutdown()
+
+
+def test_timeouts_count_from_when_calls_are_made():
+    calls = [(f"call_{i}", slow, {"seconds": 0.15}) for i in range(3)]
+    timed_out = [(id, {"error": "The function call timed out."}) for id, _, _ in calls]
+
+    executor = ToolExecutor(timeout=0.1)
+    start = time.monotonic()
+    assert _outputs(executor.run(calls)) == timed_out
+    assert time.monotonic() - start < 0.15
+    executor.shutdown()
+
+    # Calls waiting for a free worker use up their time too.
+    executor = ToolExecutor(max_workers=1, timeout=0.2)
+    assert _outputs(asyncio.run(executor.arun(calls))) == [
+        ("call_0", 0.15),
+        *timed_out[1:],
+    ]
+
+
+def test_arun_limits_concurrency():
+    executor = ToolExecutor(max_workers=2, timeout=1)
+    start = time.monotonic()
+    outputs = asyncio.run(
+        executor.arun(
+            [
+                ("call_1", async_slow, {"seconds": 0.2}),
+                ("call_2", slow, {"seconds": 0.2}),
+                ("call_3", async_slow, {"seconds": 0.2}),
+                ("call_4", broken, {}),
+            ]
+        )
+    )
+    assert 0.4 <= time.monotonic() - start < 0.8
+    assert _outputs(outputs) == [
+        ("call_1", 0.2),
+        ("call_2", 0.2),
+        ("call_3", 0.2),
+        ("call_4", {"error": "RuntimeError: Oh no"}),
+    ]
+
+
+def test_process_executor():
+    assert pickle.loads(pickle.dumps(worker_pid)) is worker_pid
+    results = [worker_pid(n) for n in range(3)]
+    assert [n for n, _ in results] == list(range(3))
+    assert os.getpid() not in {pid for _, pid in results}
+    if sys.version_info >= (3, 11):
+        # Workers are replaced after two calls each.
+        assert len({pid for _, pid in results}) >= 2
+
+    n, pid = asyncio.run(async_worker_pid(1))
+    assert n == 1 and pid != os.getpid()
+
+
+def test_process_executor_timeout():
+    POOL.timeout = 0.5
+    try:
+        outputs = ToolExecutor().run([("call_1", spin, {"seconds": 5})])
+        assert _outputs(outputs) == [
+            ("call_1", {"error": "The function call timed out."})
+        ]
+    finally:
+        POOL.timeout = 10
+    # The stuck worker was replaced.
+    assert worker_pid(1)[0] == 1
+
+
+@openai_function(descriptions={"n": "A number"})
+def double(n: int):
+    """Doubles a number."""
+    return n * 2
+
+
+@pytest.mark.parametrize("executor", [None, ToolExecutor()])
+def test_outputs_are_in_the_order_of_the_calls(fake_openai, executor):
+    fake_openai.tool_calls = lambda prompt: [
+        [("double", {"n": 1}), ("missing", {}), ("double", {"n": 2})]
+    ]
+    conversation = Assistant.create(
+        "test", functions=[double], tool_executor=executor
+    ).conversation.create()
+    conversation.ask("Double them")
+
+    [outputs] = fake_openai.tool_outputs
+    assert [json.loads(output["output"]) for output in outputs] == [
+        2,
+        {"error": "There is no function missing."},
+        4,
+    ]
+
+
+@pytest.mark.parametrize("is_async", [False, True])
+def test_process_timeouts_without_an_executor(fake_openai, is_async):
+    fake_openai.tool_calls = lambda prompt: [[("spin", {"seconds": 5})]]
+    POOL.timeout = 0.5
+    try:
+        if is_async:
+
+            async def main():
+                assistant = await AsyncAssistant.create("test", functions=[spin])
+                conversation = await assistant.conversation.create()
+                return await conversation.ask("Spin")
+
+            reply = asyncio.run(main())
+        else:
+            conversation = Assistant.create(
+                "test", functions=[spin]
+            ).conversation.create()
+            reply = conversation.ask("Spin")
+    finally:
+        POOL.timeout = 10
+
+    # The timeout was reported to the AI, instead of leaving the run waiting.
+    assert reply.text == "You said: Spin"
+    [[output]] = fake_openai.tool_outputs
+    assert json.loads(output["output"]) == {"error": "The function call timed out."}
+
+
+def test_process_executor_needs_a_top_level_function():
+    with pytest.raises(ValueError):
+
+        @openai_function(descriptions={}, executor="process")
+        def local():
+            """Can't be found by name."""
+
+    with pytest.raises(ValueError):
+        openai_function(descriptions={}, executor="thread")
@@ -0,0 +1,207 @@
+import asyncio
+
+import openai
+import pytest
+
+from ez_openai import Assistant
+from ez_openai import AsyncAssistant
+from ez_openai import CallRecorder
+from ez_openai import OpenTelemetryInstrumentation
+from ez_openai import PollStrategy
+from ez_openai.tracing import _call_ids
+
+
+def test_call_ids():
+    assert _call_ids("beta.threads.messages.list", ("thread_1",), {}) == {
+        "thread_id": "thread_1"
+    }
+    assert _call_ids(
+        "beta.threads.runs.retrieve", (), {"thread_id": "thread_1", "run_id": "run_1"}
+    ) == {"thread_id": "thread_1", "run_id": "run_1"}
+    assert _call_ids("beta.threads.runs.cancel", ("run_1",), {}) == {"run_id": "run_1"}
+    assert _call_ids("beta.threads.create", (), {}) == {}
+
+
+def test_recorder_sees_every_call(fake_openai):
+    fake_openai.run_duration = 0.05
+    recorder = CallRecorder()
+    assistant = Assistant.create(
+        "test",
+        "Echo things back.",
+        poll_strategy=PollStrategy(initial=0.01, jitter=0),
+        instrumentation=recorder,
+    )
+    conversation = assistant.conversation.create()
+    recorder.clear()
+
+    message = conversation.ask("Hello")
+
+    endpoints = [call.endpoint for call in recorder.calls]
+    assert endpoints[0] == "beta.threads.runs.create"
+    assert endpoints[-1] == "beta.threads.messages.list"
+    polls = endpoints.count("beta.threads.runs.retrieve")
+    assert polls == message.stats.polls
+    assert len(endpoints) == message.stats.requests
+
+    run_id = recorder.calls[0].ids["run_id"]
+    for call in recorder.calls:
+        assert call.ids["thread_id"] == conversation.id
+        assert call.duration >= 0
+        assert call.error is None
+    assert recorder.calls[0].ids["assistant_id"] == assistant.id
+    assert recorder.calls[1].ids["run_id"] == run_id
+
+    summary = recorder.summary()
+    assert summary["beta.threads.runs.retrieve"][0] == polls
+    assert sum(count for count, _ in summary.values()) == len(endpoints)
+
+
+def test_lazy_conversation_calls(fake_openai):
+    recorder = CallRecorder()
+    assistant = Assistant.create(
+        "test",
+        "Echo things back.",
+        poll_strategy=PollStrategy(initial=0.01, jitter=0),
+        instrumentation=recorder,
+    )
+    recorder.clear()
+
+    conversation = assistant.conversation.create(lazy=True)
+    with pytest.raises(ValueError):
+        conversation.id
+    assert conversation.ask("Hello").text == "You said: Hello"
+    assert recorder.calls[0].endpoint == "beta.threads.create_and_run"
+    assert recorder.calls[-1].ids["thread_id"] == conversation.id
+
+    # `create_and_run` doesn't take additional instructions, so those need two calls.
+    recorder.clear()
+    conversation = assistant.conversation.create(lazy=True)
+    conversation.ask("Hello", additional_instructions="Be brief.")
+    endpoints = [call.endpoint for call in recorder.calls]
+    assert endpoints[:2] == ["beta.threads.create", "beta.threads.runs.create"]
+    assert [m.text for m in conversation.history()] == ["Hello", "You said: Hello"]
+
+
+def test_recorder_records_errors(fake_openai):
+    recorder = CallRecorder()
+    with pytest.raises(Exception):
+        Assistant.get("asst_missing", cache=False, instrumentation=recorder)
+    (call,) = recorder.calls
+    assert call.endpoint == "beta.assistants.retrieve"
+    assert call.ids == {"assistant_id": "asst_missing"}
+    assert call.error is not None
+
+
+def test_recorder_times_async_calls(fake_openai):
+    fake_openai.latency = 0.02
+    recorder = CallRecorder()
+
+    async def main():
+        assistant = await AsyncAssistant.create(
+            "test",
+            poll_strategy=PollStrategy(initial=0.01, jitter=0),
+            instrumentation=recorder,
+        )
+        conversation = await assistant.conversation.create()
+        await conversation.ask("Hello")
+        with pytest.raises(Exception):
+            await AsyncAssistant.get(
+                "asst_missing", cache=False, instrumentation=recorder
+            )
+        return assistant, conversation
+
+    assistant, conversation = asyncio.run(main())
+    *calls, failed = recorder.calls
+    # The calls are timed until their responses arrive, not until they're started.
+    assert all(call.duration >= 0.02 for call in recorder.calls)
+    assert all(call.error is None for call in calls)
+    assert calls[0].endpoint == "beta.assistants.create"
+    assert calls[0].ids["assistant_id"] == assistant.id
+    assert calls[1].ids["thread_id"] == conversation.id
+    assert calls[2].endpoint == "beta.threads.runs.create"
+    assert "run_id" in calls[2].ids
+    assert failed.endpoint == "beta.assistants.retrieve"
+    assert failed.error is not None
+
+
+@pytest.mark.parametrize("is_async", [False, True])
+def test_recorder_times_streams(fake_openai, is_async):
+    fake_openai.latency = 0.3
+    recorder = CallRecorder()
+
+    async def astream(conversation, message):
+        return "".join([c async for c in conversation.ask_stream(message, mode="text")])
+
+    async def main():
+        assistant = await AsyncAssistant.create("test", instrumentation=recorder)
+        conversation = await assistant.conversation.create()
+        text = await astream(conversation, "Hello")
+        fake_openai.rate_limited = 10
+        with pytest.raises(openai.RateLimitError):
+            await astream(conversation, "Again")
+        return conversation, text
+
+    if is_async:
+        conversation, text = asyncio.run(main())
+    else:
+        conversation = Assistant.create(
+            "test", instrumentation=recorder
+        ).conversation.create()
+        text = "".join(conversation.ask_stream("Hello", mode="text"))
+        fake_openai.rate_limited = 10
+        with pytest.raises(openai.RateLimitError):
+            "".join(conversation.ask_stream("Again", mode="text"))
+
+    assert text == "You said: Hello"
+    streamed, failed = [c for c in recorder.calls if c.endpoint.endswith("stream")]
+    # The stream is timed from when its request is made.
+    assert streamed.duration >= 0.3
+    assert streamed.error is None
+    [run] = fake_openai.runs.values()
+    assert streamed.ids["thread_id"] == conversation.id
+    assert streamed.ids["run_id"] == run["id"]
+    assert isinstance(failed.error, openai.RateLimitError)
+
+
+class FakeSpan:
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = dict(attributes)
+        self.ended = False
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def record_exception(self, error):
+        self.attributes["error"] = error
+
+    def end(self):
+        self.ended = True
+
+
+class FakeTracer:
+    def __init__(self):
+        self.spans = []
+
+    def start_span(self, name, attributes):
+        self.spans.append(FakeSpan(name, attributes))
+        return self.spans[-1]
+
+
+def test_opentelemetry_spans(fake_openai):
+    tracer = FakeTracer()
+    assistant = Assistant.create(
+        "test",
+        "Echo things back.",
+        instrumentation=OpenTelemetryInstrumentation(tracer),
+    )
+    conversation = assistant.conversation.create()
+
+    create_assistant, create_thread = tracer.spans
+    assert create_assistant.name == "openai beta.assistants.create"
+    assert create_assistant.attributes["openai.assistant_id"] == assistant.id
+    assert create_thread.attributes == {
+        "openai.endpoint": "beta.threads.create",
+        "openai.thread_id": conversation.id,
+    }
+    assert all(span.ended for span in tracer.spans)
@@ -0,0 +1,111 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import openai
+
+from ez_openai import UploadCache
+
+
+class FakeFiles:
+    def __init__(self):
+        self.uploaded = []
+        self.deleted = []
+
+    def create(self, file, purpose):
+        self.uploaded.append(file.read())
+        return SimpleNamespace(id=f"file_{len(self.uploaded)}")
+
+    def delete(self, file_id):
+        self.deleted.append(file_id)
+
+
+def test_same_contents_are_uploaded_once(tmp_path):
+    client = SimpleNamespace(files=FakeFiles())
+    (tmp_path / "a.jpg").write_bytes(b"dog")
+    (tmp_path / "b.jpg").write_bytes(b"dog")
+    (tmp_path / "c.jpg").write_bytes(b"cat")
+
+    cache = UploadCache()
+    assert cache.file_id(client, tmp_path / "a.jpg") == "file_1"
+    assert cache.file_id(client, tmp_path / "b.jpg") == "file_1"
+    assert cache.file_id(client, tmp_path / "c.jpg") == "file_2"
+    assert client.files.uploaded == [b"dog", b"cat"]
+
+
+def test_expired_uploads_are_deleted(tmp_path):
+    client = SimpleNamespace(files=FakeFiles())
+    (tmp_path / "a.jpg").write_bytes(b"dog")
+    (tmp_path / "b.jpg").write_bytes(b"cat")
+
+    cache = UploadCache(ttl=0.05)
+    cache.file_id(client, tmp_path / "a.jpg")
+    time.sleep(0.06)
+    cache.file_id(client, tmp_path / "b.jpg")
+    assert client.files.deleted == ["file_1"]
+
+    cache.clear()
+    assert client.files.deleted == ["file_1", "file_2"]
+
+
+def test_index_survives_restarts(tmp_path):
+    client = SimpleNamespace(files=FakeFiles())
+    (tmp_path / "a.jpg").write_bytes(b"dog")
+    index_path = tmp_path / "uploads.json"
+
+    UploadCache(index_path=index_path).file_id(client, tmp_path / "a.jpg")
+    cache = UploadCache(index_path=index_path)
+    assert cache.file_id(client, tmp_path / "a.jpg") == "file_1"
+    assert len(client.files.uploaded) == 1
+
+
+def test_reloaded_uploads_are_deleted(fake_openai, tmp_path):
+    client = openai.OpenAI()
+    (tmp_path / "a.jpg").write_bytes(b"dog")
+    (tmp_path / "b.jpg").write_bytes(b"cat")
+    index_path = tmp_path / "uploads.json"
+
+    first = UploadCache(maxsize=1, index_path=index_path).file_id(
+        client, tmp_path / "a.jpg"
+    )
+    cache = UploadCache(maxsize=1, index_path=index_path)
+    cache.file_id(client, tmp_path / "b.jpg")
+    assert fake_openai.deleted_files == [first]
+
+
+def test_uploads_that_expired_between_runs_are_deleted(fake_openai, tmp_path):
+    client = openai.OpenAI()
+    (tmp_path / "a.jpg").write_bytes(b"dog")
+    index_path = tmp_path / "uploads.json"
+
+    first = UploadCache(ttl=0.05, index_path=index_path).file_id(
+        client, tmp_path / "a.jpg"
+    )
+    time.sleep(0.06)
+    cache = UploadCache(index_path=index_path)
+    assert cache.file_id(client, tmp_path / "a.jpg") != first
+    assert fake_openai.deleted_files == [first]
+    assert len(json.loads(index_path.read_text())) == 1
+
+
+def test_concurrent_uploads_of_the_same_file_are_shared(tmp_path):
+    files = FakeFiles()
+    create = files.create
+
+    def slow_create(file, purpose):
+        time.sleep(0.05)
+        return create(file, purpose)
+
+    files.create = slow_create  # type: ignore[method-assign]
+    client = SimpleNamespace(files=files)
+    (tmp_path / "a.jpg").write_bytes(b"dog")
+
+    cache = UploadCache()
+    with ThreadPoolExecutor(4) as executor:
+        ids = list(
+            executor.map(lambda _: cache.file_id(client, tmp_path / "a.jpg"), range(4))
+        )
+    assert ids == ["file_1"] * 4
+    assert files.uploaded == [b"dog"]
+    assert files.deleted == []